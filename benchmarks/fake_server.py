@@ -0,0 +1,446 @@
+"""
+Local stand-in for the provider HTTP APIs, for benchmarks and offline testing.
+
+Serves OpenAI and Azure OpenAI chat completions (plus files/batches), Anthropic messages (plus
+message batches) and Gemini generateContent over REST, including streaming. Latency, error rate
+and token usage are configurable. Run it standalone or start it from Python:
+
+    python benchmarks/fake_server.py --port 8000 --latency 0.2 --error-rate 0.01
+
+    with FakeProviderServer(latency=0.05) as server:
+        OpenAI_Grollm(api_key="fake", base_url=server.url + "/v1")
+"""
+import argparse
+import email.parser
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class FakeConfig:
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 429, completion_tokens: int = 64, token_interval: float = 0.0,
+                 prompt_tokens: int = None, cached_tokens: int = 0, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.completion_tokens = completion_tokens
+        self.token_interval = token_interval
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self.lock:
+            return self.latency * self.random.lognormvariate(0, self.jitter)
+
+    def fails(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+class _State:
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.files = {}
+        self.batches = {}
+        self.cached_contents = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def next_id(self, prefix: str) -> str:
+        with self.lock:
+            return f"{prefix}-{next(self.ids)}"
+
+class FakeHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, the client's delayed ACK would add
+    # ~40ms to every response.
+    disable_nagle_algorithm = True
+    server_version = "grollm-fake/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> FakeConfig:
+        return self.server.config
+
+    @property
+    def state(self) -> _State:
+        return self.server.state
+
+    # Routing ---------------------------------------------------------------------------------
+
+    def _route(self):
+        url = urlparse(self.path)
+        # Azure puts everything under /openai and the model in /deployments/<name>; OpenAI and
+        # Anthropic under /v1. Normalise so one route table serves all of them.
+        path = re.sub(r"^/openai(/deployments/[^/]+)?", "", url.path)
+        path = re.sub(r"^/v1(?=/)", "", path)
+        return path, parse_qs(url.query)
+
+    def do_GET(self):
+        path, query = self._route()
+        if path.startswith(("/models", "/v1beta/models")) and self.config.fails():
+            return self._error(path)
+        if path == "/models":
+            return self._json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model",
+                                                                "created": 0, "owned_by": "grollm"}]})
+        match = re.fullmatch(r"/models/([^/]+)", path)
+        if match:
+            return self._json(200, {"id": match.group(1), "object": "model", "created": 0, "owned_by": "grollm"})
+        match = re.fullmatch(r"/v1beta/models/([^/:]+)", path)
+        if match:
+            return self._json(200, {"name": f"models/{match.group(1)}", "baseModelId": match.group(1),
+                                    "version": "001", "displayName": match.group(1), "inputTokenLimit": 1048576,
+                                    "outputTokenLimit": 8192, "supportedGenerationMethods": ["generateContent"]})
+        match = re.fullmatch(r"/batches/([^/]+)", path)
+        if match:
+            return self._openai_batch(match.group(1))
+        match = re.fullmatch(r"/files/([^/]+)/content", path)
+        if match:
+            return self._raw(200, self.state.files.get(match.group(1), b""), "application/jsonl")
+        match = re.fullmatch(r"/messages/batches/([^/]+)", path)
+        if match:
+            return self._anthropic_batch(match.group(1))
+        match = re.fullmatch(r"/v1beta/(cachedContents/[^/]+)", path)
+        if match:
+            return self._cached_content(match.group(1))
+        match = re.fullmatch(r"/messages/batches/([^/]+)/results", path)
+        if match:
+            return self._raw(200, self.state.files.get(match.group(1), b""), "application/jsonl")
+        self._json(404, {"error": {"message": f"Unknown path {path}", "type": "not_found"}})
+
+    def do_POST(self):
+        path, query = self._route()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.state.lock:
+            self.state.requests += 1
+
+        if path == "/files":
+            return self._upload_file(body)
+        if path == "/batches":
+            return self._create_openai_batch(json.loads(body))
+        if path == "/messages/batches":
+            return self._create_anthropic_batch(json.loads(body))
+        if path == "/v1beta/cachedContents":
+            return self._create_cached_content(json.loads(body))
+
+        request = json.loads(body or b"{}")
+        if self.config.fails():
+            return self._error(path)
+        time.sleep(self.config.delay())
+
+        if path == "/chat/completions":
+            return self._openai(request)
+        if path == "/messages":
+            return self._anthropic(request)
+        match = re.fullmatch(r"/v1beta/models/([^:]+):(generateContent|streamGenerateContent)", path)
+        if match:
+            return self._gemini(request, stream=match.group(2) == "streamGenerateContent",
+                                sse=query.get("alt") == ["sse"])
+        self._json(404, {"error": {"message": f"Unknown path {path}", "type": "not_found"}})
+
+    def do_PATCH(self):
+        path, query = self._route()
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        match = re.fullmatch(r"/v1beta/(cachedContents/[^/]+)", path)
+        if match and match.group(1) in self.state.cached_contents:
+            ttl = float(str(body.get("ttl", "3600s")).rstrip("s"))
+            self.state.cached_contents[match.group(1)]["expires"] = time.time() + ttl
+            return self._cached_content(match.group(1))
+        self._json(404, {"error": {"code": 404, "message": "Not found.", "status": "NOT_FOUND"}})
+
+    def do_DELETE(self):
+        path, query = self._route()
+        match = re.fullmatch(r"/v1beta/(cachedContents/[^/]+)", path)
+        if match and self.state.cached_contents.pop(match.group(1), None) is not None:
+            return self._json(200, {})
+        self._json(404, {"error": {"code": 404, "message": "Not found.", "status": "NOT_FOUND"}})
+
+    # Responses -------------------------------------------------------------------------------
+
+    def _raw(self, status: int, payload: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json(self, status: int, payload: dict, headers: dict = None):
+        self._raw(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _error(self, path: str):
+        status = self.config.error_status
+        if path == "/messages":
+            payload = {"type": "error", "error": {"type": "rate_limit_error", "message": "Fake error."}}
+        else:
+            payload = {"error": {"message": "Fake error.", "type": "rate_limit_error", "code": status}}
+        self._json(status, payload, {"retry-after": "0"})
+
+    def _sse(self, events: list):
+        """
+        Sends server-sent events one by one, `token_interval` apart, on a fixed-length body so the
+        connection stays reusable.
+        """
+        chunks = [event.encode("utf-8") for event in events]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(sum(len(chunk) for chunk in chunks)))
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            if self.config.token_interval:
+                time.sleep(self.config.token_interval)
+
+    def _usage(self, request: dict) -> tuple:
+        prompt = self.config.prompt_tokens
+        if prompt is None:
+            prompt = max(1, len(json.dumps(request.get("messages") or request.get("contents") or "")) // 4)
+        return prompt, self.config.completion_tokens
+
+    def _tokens(self) -> list:
+        return ["lorem "] * self.config.completion_tokens
+
+    def _openai(self, request: dict):
+        prompt, completion = self._usage(request)
+        usage = {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion,
+                 "prompt_tokens_details": {"cached_tokens": min(self.config.cached_tokens, prompt)}}
+        base = {"id": self.state.next_id("chatcmpl"), "created": int(time.time()),
+                "model": request.get("model", "fake-model")}
+        if not request.get("stream"):
+            return self._json(200, {**base, "object": "chat.completion", "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": "".join(self._tokens())},
+                 "finish_reason": "stop"}], "usage": usage})
+
+        chunk = {**base, "object": "chat.completion.chunk"}
+        events = [f"data: {json.dumps({**chunk, 'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]})}\n\n"
+                  for token in self._tokens()]
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append(f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n")
+        events.append("data: [DONE]\n\n")
+        self._sse(events)
+
+    def _anthropic_message(self, request: dict) -> dict:
+        prompt, completion = self._usage(request)
+        cached = min(self.config.cached_tokens, prompt)
+        return {"id": self.state.next_id("msg"), "type": "message", "role": "assistant",
+                "model": request.get("model", "fake-model"), "stop_reason": "end_turn", "stop_sequence": None,
+                "content": [{"type": "text", "text": "".join(self._tokens())}],
+                "usage": {"input_tokens": prompt - cached, "output_tokens": completion,
+                          "cache_read_input_tokens": cached, "cache_creation_input_tokens": 0}}
+
+    def _anthropic(self, request: dict):
+        message = self._anthropic_message(request)
+        if not request.get("stream"):
+            return self._json(200, message)
+
+        def event(name, payload):
+            return f"event: {name}\ndata: {json.dumps({'type': name, **payload})}\n\n"
+
+        start = {**message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 1}}
+        events = [event("message_start", {"message": start}),
+                  event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})]
+        events += [event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": token}})
+                   for token in self._tokens()]
+        events += [event("content_block_stop", {"index": 0}),
+                   event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                           "usage": {"output_tokens": message["usage"]["output_tokens"]}}),
+                   event("message_stop", {})]
+        self._sse(events)
+
+    def _gemini(self, request: dict, stream: bool, sse: bool):
+        prompt, completion = self._usage(request)
+        usage = {"promptTokenCount": prompt, "candidatesTokenCount": completion,
+                 "totalTokenCount": prompt + completion}
+        if request.get("cachedContent"):
+            cached = self.state.cached_contents.get(request["cachedContent"])
+            if cached is None or cached["expires"] < time.time():
+                return self._json(404, {"error": {"code": 404, "message": "Cached content not found.",
+                                                  "status": "NOT_FOUND"}})
+            usage.update(promptTokenCount=prompt + cached["tokens"], cachedContentTokenCount=cached["tokens"],
+                         totalTokenCount=prompt + cached["tokens"] + completion)
+
+        def response(text, usage_metadata=None):
+            payload = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                       "finishReason": "STOP", "index": 0}]}
+            if usage_metadata:
+                payload["usageMetadata"] = usage_metadata
+            return payload
+
+        if not stream:
+            return self._json(200, response("".join(self._tokens()), usage))
+        tokens = self._tokens()
+        chunks = [json.dumps(response(token, usage if i == len(tokens) - 1 else None)) for i, token in enumerate(tokens)]
+        if sse:
+            return self._sse([f"data: {chunk}\r\n\r\n" for chunk in chunks])
+        # Without alt=sse the REST transport streams one JSON array, parsed incrementally.
+        self._sse(["[" + chunks[0]] + ["," + chunk for chunk in chunks[1:]] + ["]"])
+
+    def _create_cached_content(self, request: dict):
+        name = f"cachedContents/{self.state.next_id('cache')}"
+        ttl = float(str(request.get("ttl", "3600s")).rstrip("s"))
+        tokens = max(1, len(json.dumps([request.get("systemInstruction"), request.get("contents")])) // 4)
+        self.state.cached_contents[name] = {"model": request["model"], "tokens": tokens, "expires": time.time() + ttl,
+                                            "displayName": request.get("displayName", "")}
+        self._cached_content(name)
+
+    def _cached_content(self, name: str):
+        cached = self.state.cached_contents.get(name)
+        if cached is None:
+            return self._json(404, {"error": {"code": 404, "message": "Not found.", "status": "NOT_FOUND"}})
+        expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(cached["expires"]))
+        self._json(200, {"name": name, "model": cached["model"], "displayName": cached["displayName"],
+                         "createTime": expire, "updateTime": expire, "expireTime": expire,
+                         "usageMetadata": {"totalTokenCount": cached["tokens"]}})
+
+    # Batches ---------------------------------------------------------------------------------
+
+    def _upload_file(self, body: bytes):
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+        content = next((part.get_payload(decode=True) for part in message.get_payload()
+                        if part.get_filename()), b"")
+        file_id = self.state.next_id("file")
+        self.state.files[file_id] = content
+        self._json(200, {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                         "filename": "batch.jsonl", "purpose": "batch", "status": "processed"})
+
+    def _create_openai_batch(self, request: dict):
+        batch_id = self.state.next_id("batch")
+        lines = [json.loads(line) for line in self.state.files[request["input_file_id"]].splitlines() if line.strip()]
+        output = []
+        for line in lines:
+            prompt, completion = self._usage(line["body"])
+            body = {"id": self.state.next_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+                    "model": line["body"].get("model"), "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": "".join(self._tokens())},
+                         "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt, "completion_tokens": completion,
+                              "total_tokens": prompt + completion}}
+            output.append({"id": self.state.next_id("req"), "custom_id": line["custom_id"],
+                           "response": {"status_code": 200, "body": body}, "error": None})
+        output_file = self.state.next_id("file")
+        self.state.files[output_file] = "".join(json.dumps(line) + "\n" for line in output).encode("utf-8")
+        self.state.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": request["endpoint"], "input_file_id": request["input_file_id"],
+            "completion_window": request["completion_window"], "created_at": int(time.time()),
+            "status": "in_progress", "output_file_id": output_file, "ready_at": time.time() + self.config.latency,
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0}}
+        self._json(200, self._public_batch(batch_id))
+
+    def _public_batch(self, batch_id: str) -> dict:
+        batch = dict(self.state.batches[batch_id])
+        ready = time.time() >= batch.pop("ready_at")
+        batch["status"] = "completed" if ready else "in_progress"
+        if not ready:
+            batch["output_file_id"] = None
+        return batch
+
+    def _openai_batch(self, batch_id: str):
+        if batch_id not in self.state.batches:
+            return self._json(404, {"error": {"message": "No such batch.", "type": "not_found"}})
+        self._json(200, self._public_batch(batch_id))
+
+    def _create_anthropic_batch(self, request: dict):
+        batch_id = self.state.next_id("msgbatch")
+        results = [{"custom_id": item["custom_id"],
+                    "result": {"type": "succeeded", "message": self._anthropic_message(item["params"])}}
+                   for item in request["requests"]]
+        self.state.files[batch_id] = "".join(json.dumps(line) + "\n" for line in results).encode("utf-8")
+        self.state.batches[batch_id] = {"ready_at": time.time() + self.config.latency}
+        self._anthropic_batch(batch_id)
+
+    def _anthropic_batch(self, batch_id: str):
+        if batch_id not in self.state.batches:
+            return self._json(404, {"type": "error", "error": {"type": "not_found_error", "message": "No such batch."}})
+        ended = time.time() >= self.state.batches[batch_id]["ready_at"]
+        host = self.headers.get("Host")
+        self._json(200, {"id": batch_id, "type": "message_batch",
+                         "processing_status": "ended" if ended else "in_progress",
+                         "results_url": f"http://{host}/v1/messages/batches/{batch_id}/results" if ended else None})
+
+class FakeProviderServer:
+    """
+    Runs the fake provider API on a background thread. `url` is the server root; pass
+    `url + "/v1"` as base_url for OpenAI, `url` for Anthropic and as the endpoint for Azure.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **config):
+        self.httpd = ThreadingHTTPServer((host, port), FakeHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = FakeConfig(**config)
+        self.httpd.state = _State()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def config(self) -> FakeConfig:
+        return self.httpd.config
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.state.requests
+
+    def start(self) -> "FakeProviderServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="grollm-fake-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.0, help="lognormal sigma applied to latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--token-interval", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--prompt-tokens", type=int, default=None)
+    parser.add_argument("--cached-tokens", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("host", "port")}
+    server = FakeProviderServer(args.host, args.port, **config)
+    print(f"Fake provider API listening on {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Cold-start import benchmark.
+
+Each scenario runs in a fresh interpreter and reports the median wall time of the import
+statement together with which provider SDKs ended up in sys.modules. The `eager` scenario
+imports every provider module, which is what `import grollm` used to do.
+
+    python benchmarks/import_time.py --repeat 10 > import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "import_grollm": "import grollm",
+    "anthropic_only": "from grollm import Anthropic_Grollm",
+    "openai_only": "from grollm import OpenAI_Grollm",
+    "eager": "import grollm.openai_gro, grollm.anthropic_gro, grollm.gemini_gro, grollm.azureopenai_gro",
+}
+
+SDKS = ("openai", "anthropic", "google.generativeai")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "sdks": [m for m in {sdks!r} if m in sys.modules]}}))
+"""
+
+def run_once(statement: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement=statement, sdks=SDKS)],
+        check=True, capture_output=True, text=True, env=env, cwd=ROOT
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for name, statement in SCENARIOS.items():
+        runs = [run_once(statement) for _ in range(args.repeat)]
+        seconds = [run["seconds"] for run in runs]
+        results[name] = {
+            "statement": statement,
+            "median_ms": statistics.median(seconds) * 1000,
+            "min_ms": min(seconds) * 1000,
+            "sdks_loaded": runs[-1]["sdks"],
+        }
+
+    eager = results["eager"]["median_ms"]
+    for result in results.values():
+        result["speedup_vs_eager"] = eager / result["median_ms"] if result["median_ms"] else None
+
+    json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "results": results}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Throughput, latency, CPU and memory benchmark for `send_prompt` / `asend_prompt`.
+
+Every provider wrapper is pointed at the local fake provider API (benchmarks/fake_server.py),
+which runs in its own process so that its CPU time is not charged to the client. Each
+scenario (provider, client, mode, concurrency) runs in a fresh interpreter. The `sdk` client
+makes the same request through the bare provider SDK, so `overhead` in the output is what the
+wrapper layer adds per call on top of the SDK.
+
+    python benchmarks/send_prompt.py --concurrency 1 8 32 --requests 500 > send_prompt.json
+    python benchmarks/send_prompt.py --providers openai --latency 0.2 --jitter 0.5 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_ROOT = os.path.dirname(ROOT)
+
+PROVIDERS = ("openai", "azure", "anthropic", "gemini")
+CLIENTS = ("grollm", "sdk")
+MODES = ("sync", "async")
+
+MODELS = {
+    "openai": "gpt-4o-mini",
+    "azure": "gpt-4o",
+    "anthropic": "claude-3-5-sonnet-20240620",
+    "gemini": "gemini-1.5-flash",
+}
+SYSTEM_PROMPT = "You are a helpful assistant."
+# grollm's log listener shares stdout with the scenario result, which is tagged to be found again.
+RESULT_PREFIX = "BENCHMARK_RESULT "
+AZURE_API_VERSION = "2024-06-01"
+# The Gemini SDK's REST transport, the only one that can reach the fake server, has no async client.
+UNSUPPORTED = {("gemini", "async")}
+
+def _configure_gemini(url: str):
+    # The Gemini SDK has no base_url; its REST transport accepts a plain-HTTP endpoint instead.
+    import google.generativeai as gemini
+
+    gemini.configure(api_key="fake", transport="rest", client_options={"api_endpoint": url})
+    return gemini.GenerativeModel(MODELS["gemini"])
+
+def build_grollm(provider: str, url: str):
+    if provider == "openai":
+        from grollm import OpenAI_Grollm
+        return OpenAI_Grollm(api_key="fake", model=MODELS[provider], base_url=url + "/v1")
+    if provider == "azure":
+        from grollm import AzureOpenAI_Grollm
+        return AzureOpenAI_Grollm(api_key="fake", api_version=AZURE_API_VERSION, endpoint=url,
+                                  model=MODELS[provider], deployment_name=MODELS[provider])
+    if provider == "anthropic":
+        from grollm import Anthropic_Grollm
+        return Anthropic_Grollm(api_key="fake", model=MODELS[provider], base_url=url)
+    from grollm import Gemini_Grollm
+    llm = Gemini_Grollm(api_key="fake", model=MODELS[provider])
+    llm.gemini_client = _configure_gemini(url)
+    return llm
+
+def build_sdk(provider: str, url: str) -> tuple:
+    """
+    Returns (send, asend) making the request `send_prompt` would make, straight through the SDK.
+    """
+    messages = lambda prompt: [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
+
+    if provider in ("openai", "azure"):
+        import openai
+
+        if provider == "openai":
+            client = openai.OpenAI(api_key="fake", base_url=url + "/v1", max_retries=0)
+            async_client = openai.AsyncOpenAI(api_key="fake", base_url=url + "/v1", max_retries=0)
+        else:
+            client = openai.AzureOpenAI(api_key="fake", azure_endpoint=url, api_version=AZURE_API_VERSION,
+                                        max_retries=0)
+            async_client = openai.AsyncAzureOpenAI(api_key="fake", azure_endpoint=url,
+                                                   api_version=AZURE_API_VERSION, max_retries=0)
+
+        def send(prompt):
+            response = client.chat.completions.create(model=MODELS[provider], messages=messages(prompt))
+            return response.choices[0].message.content
+
+        async def asend(prompt):
+            response = await async_client.chat.completions.create(model=MODELS[provider], messages=messages(prompt))
+            return response.choices[0].message.content
+        return send, asend
+
+    if provider == "anthropic":
+        import anthropic
+
+        client = anthropic.Anthropic(api_key="fake", base_url=url, max_retries=0)
+        async_client = anthropic.AsyncAnthropic(api_key="fake", base_url=url, max_retries=0)
+        params = lambda prompt: {"model": MODELS[provider], "max_tokens": 1024, "system": SYSTEM_PROMPT,
+                                 "messages": [{"role": "user", "content": prompt}]}
+
+        def send(prompt):
+            return client.messages.create(**params(prompt)).content[0].text
+
+        async def asend(prompt):
+            return (await async_client.messages.create(**params(prompt))).content[0].text
+        return send, asend
+
+    model = _configure_gemini(url)
+
+    async def asend(prompt):
+        return (await model.generate_content_async(prompt)).text
+    return (lambda prompt: model.generate_content(prompt).text), asend
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+def _timed(send, prompt) -> tuple:
+    start = time.perf_counter()
+    try:
+        send(prompt)
+        error = None
+    except Exception as e:
+        error = type(e).__name__
+    return time.perf_counter() - start, error
+
+async def _atimed(asend, prompt, semaphore) -> tuple:
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            await asend(prompt)
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+        return time.perf_counter() - start, error
+
+class _Runner:
+    """
+    Runs passes of prompts at a fixed concurrency on one thread pool or one event loop, so that
+    connections opened by the warmup pass are reused by the measured one.
+    """
+
+    def __init__(self, mode: str, send, asend, concurrency: int):
+        self.mode = mode
+        self.send = send
+        self.asend = asend
+        self.concurrency = concurrency
+        self.pool = ThreadPoolExecutor(max_workers=concurrency) if mode == "sync" else None
+        self.loop = asyncio.new_event_loop() if mode == "async" else None
+
+    def run(self, prompts: list) -> list:
+        if self.pool is not None:
+            return list(self.pool.map(lambda prompt: _timed(self.send, prompt), prompts))
+
+        async def main():
+            semaphore = asyncio.Semaphore(self.concurrency)
+            return await asyncio.gather(*(_atimed(self.asend, prompt, semaphore) for prompt in prompts))
+        return self.loop.run_until_complete(main())
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        else:
+            self.loop.close()
+
+def _max_rss_mib() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_scenario(spec: dict) -> dict:
+    """
+    Runs one scenario in the current interpreter: a warmup pass that opens connections and fills
+    lazy imports, then the measured pass.
+    """
+    provider, client, mode, concurrency = spec["provider"], spec["client"], spec["mode"], spec["concurrency"]
+    if client == "grollm":
+        llm = build_grollm(provider, spec["url"])
+        send, asend = llm.send_prompt, llm.asend_prompt
+    else:
+        send, asend = build_sdk(provider, spec["url"])
+
+    filler = " ".join(["benchmark"] * spec["prompt_words"])
+    prompts = [f"Request {i}: {filler}" for i in range(spec["requests"])]
+    runner = _Runner(mode, send, asend, concurrency)
+    runner.run([f"Warmup {i}" for i in range(min(concurrency, len(prompts)))])
+
+    rss_before = _max_rss_mib()
+    if spec["trace_memory"]:
+        tracemalloc.start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    timings = runner.run(prompts)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    traced_peak = tracemalloc.get_traced_memory()[1] if spec["trace_memory"] else None
+    tracemalloc.stop()
+    runner.close()
+
+    latencies = sorted(seconds * 1000 for seconds, error in timings if error is None)
+    errors = [error for _, error in timings if error is not None]
+    return {
+        **{key: spec[key] for key in ("provider", "client", "mode", "concurrency", "requests")},
+        "errors": len(errors),
+        "error_types": sorted(set(errors)),
+        "seconds": wall,
+        "throughput_rps": len(timings) / wall if wall else None,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "cpu_ms_per_call": cpu * 1000 / len(timings),
+        "max_rss_mib": _max_rss_mib(),
+        "rss_growth_mib": _max_rss_mib() - rss_before,
+        "traced_peak_kib": traced_peak / 1024 if traced_peak is not None else None,
+    }
+
+def run_child(spec: dict) -> dict:
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.setdefault("GROLLM_LOG_LEVEL", "WARNING")
+    # grollm writes its log files relative to the working directory.
+    with tempfile.TemporaryDirectory() as cwd:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(spec)],
+            check=True, capture_output=True, text=True, env=env, cwd=cwd
+        ).stdout
+    line = next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX))
+    return json.loads(line[len(RESULT_PREFIX):])
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args) -> tuple:
+    port = _free_port()
+    command = [sys.executable, os.path.join(ROOT, "fake_server.py"), "--port", str(port),
+               "--latency", str(args.latency), "--jitter", str(args.jitter),
+               "--error-rate", str(args.error_rate), "--completion-tokens", str(args.completion_tokens)]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()
+    return server, f"http://127.0.0.1:{port}"
+
+def overhead(results: list) -> list:
+    """
+    Pairs every grollm scenario with its bare-SDK twin and reports the difference.
+    """
+    sdk = {(r["provider"], r["mode"], r["concurrency"]): r for r in results if r["client"] == "sdk"}
+    rows = []
+    for result in results:
+        twin = sdk.get((result["provider"], result["mode"], result["concurrency"]))
+        if result["client"] != "grollm" or twin is None:
+            continue
+        p50, twin_p50 = result["latency_ms"]["p50"], twin["latency_ms"]["p50"]
+        rows.append({
+            "provider": result["provider"], "mode": result["mode"], "concurrency": result["concurrency"],
+            "cpu_ms_per_call": result["cpu_ms_per_call"] - twin["cpu_ms_per_call"],
+            "p50_latency_ms": p50 - twin_p50 if p50 is not None and twin_p50 is not None else None,
+            "throughput_ratio": (result["throughput_rps"] / twin["throughput_rps"]
+                                 if twin["throughput_rps"] else None),
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", choices=PROVIDERS, default=list(PROVIDERS))
+    parser.add_argument("--clients", nargs="+", choices=CLIENTS, default=list(CLIENTS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--prompt-words", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="lognormal sigma applied to latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="report tracemalloc peaks (slows the measured pass down)")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(RESULT_PREFIX + json.dumps(run_scenario(json.loads(args.scenario))), flush=True)
+        return
+
+    server, url = start_server(args)
+    try:
+        results = []
+        for provider in args.providers:
+            for mode in args.modes:
+                if (provider, mode) in UNSUPPORTED:
+                    print(f"Skipping {provider} {mode}: not supported against the fake server.", file=sys.stderr)
+                    continue
+                for client in args.clients:
+                    for concurrency in args.concurrency:
+                        spec = {"provider": provider, "client": client, "mode": mode, "concurrency": concurrency,
+                                "requests": args.requests, "prompt_words": args.prompt_words, "url": url,
+                                "trace_memory": args.trace_memory}
+                        results.append(run_child(spec))
+    finally:
+        server.terminate()
+        server.wait()
+
+    server_config = {key: getattr(args, key) for key in ("latency", "jitter", "error_rate", "completion_tokens")}
+    json.dump({"python": sys.version.split()[0], "server": server_config,
+               "log_level": os.environ.get("GROLLM_LOG_LEVEL", "WARNING"), "results": results,
+               "overhead": overhead(results)}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,47 @@
-
 __version__ = "0.0.9a3"
 
-import os
-from .openai_gro import OpenAI_Grollm
-from .anthropic_gro import Anthropic_Grollm
-from .gemini_gro import Gemini_Grollm
-from .azureopenai_gro import AzureOpenAI_Grollm
+import importlib
+
+# Provider classes are resolved on first attribute access so that `import grollm` does not load
+# every provider SDK. A worker that only uses Anthropic never imports openai or google.generativeai.
+_LAZY_IMPORTS = {
+    "OpenAI_Grollm": ".openai_gro",
+    "Anthropic_Grollm": ".anthropic_gro",
+    "Gemini_Grollm": ".gemini_gro",
+    "AzureOpenAI_Grollm": ".azureopenai_gro",
+    "PromptResult": ".batch",
+    "BatchJob": ".batch_jobs",
+    "BatchResult": ".batch_jobs",
+    "Router": ".router",
+    "Hedger": ".hedging",
+    "Scheduler": ".scheduler",
+    "enable_instrumentation": ".instrumentation",
+    "disable_instrumentation": ".instrumentation",
+}
+
+def __getattr__(name):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
 
 __all__ = (
     "__version__",
-    "OpenAI_LLM",
-    "Anthropic_LLM",
-    "Gemini_LLM"
-)
\ No newline at end of file
+    "OpenAI_Grollm",
+    "Anthropic_Grollm",
+    "Gemini_Grollm",
+    "AzureOpenAI_Grollm",
+    "PromptResult",
+    "BatchJob",
+    "BatchResult",
+    "Router",
+    "Hedger",
+    "Scheduler",
+    "enable_instrumentation",
+    "disable_instrumentation",
+)
@@ -1,16 +1,22 @@
 import os
-from dotenv import load_dotenv
 
 import anthropic
 from anthropic import AnthropicError, AuthenticationError
 
 from .base import LLM_Base
 
+from .batch_jobs import (anthropic_batch_results, anthropic_parse_batch_result, anthropic_retrieve_batch,
+                         anthropic_submit_batch)
+from .cache import CacheBackend
+from .clients import ClientConfig
 from .cost_manager import CostStore
+from .ledger import UsageLedger
+from .prompt_caching import PROMPT_CACHING_BETA, add_cache_breakpoints, split_system_messages
+from .retry import RetryPolicy, http_error_is_retryable
+from .semantic_cache import SemanticCache
 
 from .logger import get_logger
-
-load_dotenv()
+from .utils import load_env
 
 LOGGER = get_logger(__name__)
 
@@ -18,118 +24,239 @@ pricing_details = {
     "claude-2.0": {
         "prompt_tokens": 8.00 / 1000000,
         "completion_tokens": 24.00 / 1000000,
+        "batch_prompt_tokens": 4.00 / 1000000,
+        "batch_completion_tokens": 12.00 / 1000000,
+        "max_context": 100000,
     },
     "claude-2.1": {
         "prompt_tokens": 8.00 / 1000000,
         "completion_tokens": 24.00 / 1000000,
+        "batch_prompt_tokens": 4.00 / 1000000,
+        "batch_completion_tokens": 12.00 / 1000000,
+        "max_context": 200000,
     },
     "claude-instant-1.2": {
         "prompt_tokens": 8.00 / 1000000,
         "completion_tokens": 2.400 / 1000000,
+        "batch_prompt_tokens": 4.00 / 1000000,
+        "batch_completion_tokens": 1.20 / 1000000,
+        "max_context": 100000,
     },
     "claude-3-5-sonnet-20240620": {
         "prompt_tokens": 3.00 / 1000000,
         "completion_tokens": 15.00 / 1000000,
+        "cached_prompt_tokens": 0.30 / 1000000,
+        "cache_write_prompt_tokens": 3.75 / 1000000,
+        "batch_prompt_tokens": 1.50 / 1000000,
+        "batch_completion_tokens": 7.50 / 1000000,
+        "max_context": 200000,
     },
     "claude-3-opus-20240229": {
         "prompt_tokens": 15.00 / 1000000,
         "completion_tokens": 75.00 / 1000000,
+        "cached_prompt_tokens": 1.50 / 1000000,
+        "cache_write_prompt_tokens": 18.75 / 1000000,
+        "batch_prompt_tokens": 7.50 / 1000000,
+        "batch_completion_tokens": 37.50 / 1000000,
+        "max_context": 200000,
     },
     "claude-3-sonnet-20240229": {
         "prompt_tokens": 3.00 / 1000000,
         "completion_tokens": 15.00 / 1000000,
+        "batch_prompt_tokens": 1.50 / 1000000,
+        "batch_completion_tokens": 7.50 / 1000000,
+        "max_context": 200000,
     },
     "claude-3-haiku-20240307": {
         "prompt_tokens": 0.25 / 1000000,
         "completion_tokens": 1.25 / 1000000,
+        "cached_prompt_tokens": 0.03 / 1000000,
+        "cache_write_prompt_tokens": 0.30 / 1000000,
+        "batch_prompt_tokens": 0.125 / 1000000,
+        "batch_completion_tokens": 0.625 / 1000000,
+        "max_context": 200000,
     }
     }
 
 cs = CostStore(pricing_details)
 
+rate_limits = {}
+
 class Anthropic_Grollm(LLM_Base):
-    
-    def __init__(self, api_key: str = os.getenv('ANTHROPIC_API_KEY'), 
-                 db_uri: str = os.getenv('MLFLOW_DB_URI'),
+
+    provider_name = "Anthropic"
+    api_error = AnthropicError
+    # Claude's tokenizer is denser than the 4 characters per token that holds for OpenAI models.
+    chars_per_token = 3.5
+
+    def __init__(self, api_key: str = None, 
+                 db_uri: str = None,
                  mlflow_flag: bool = False,
                  experiment_name: str = "LLM_Experiments_ANTHROPIC", 
                  model: str = "claude-2.1",
-                 cost_store: CostStore = cs):
-        
-        super().__init__(api_key=api_key, db_uri=db_uri, mlflow_flag=mlflow_flag, experiment_name=experiment_name)
+                 cost_store: CostStore = cs,
+                 rate_limit: dict = None,
+                 retry_policy: RetryPolicy = None,
+                 cache: CacheBackend = None,
+                 client_config: ClientConfig = None,
+                 context_policy: str = None,
+                 coalesce: bool = False,
+                 semantic_cache: SemanticCache = None,
+                 base_url: str = None,
+                 prompt_caching: bool = False,
+                 health_ttl: float = 60.0,
+                 health_refresh: float = None,
+                 ledger: UsageLedger = None,
+                 usage_scope: str = "local"):
+
+        load_env()
+        api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        super().__init__(api_key=api_key, db_uri=db_uri, mlflow_flag=mlflow_flag, experiment_name=experiment_name,
+                         rate_limit=rate_limit or rate_limits.get(model), retry_policy=retry_policy,
+                         cache=cache, client_config=client_config, context_policy=context_policy,
+                         coalesce=coalesce, semantic_cache=semantic_cache, health_ttl=health_ttl,
+                         health_refresh=health_refresh, ledger=ledger, usage_scope=usage_scope)
         self.model = model
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.base_url = base_url or os.getenv('ANTHROPIC_BASE_URL')
+        self.prompt_caching = prompt_caching
         self.cost_store = cost_store
         self._validate_cost(pricing_details.get(model, {}))
         
-    def _check_api_key_health(self) -> bool:
+    def _probe_health(self):
+        # Listing one model is free, unlike a completion. The pinned SDK has no `client.models`.
         try:
-            # Use the correct prompt format for Anthropic
-            self.client.completions.create(
-                model=self.model,
-                max_tokens_to_sample=128,
-                prompt="\n\nHuman: Test.\n\nAssistant:"
-            )
-            return True
+            self.client.get("/v1/models", cast_to=object, options={"params": {"limit": 1}})
         except AuthenticationError:
             LOGGER.error("Authentication error: Invalid API key.")
-            return False
-        except AnthropicError as e:
-            LOGGER.error(f"An error occurred while checking API key health: {e}")
-            return False
+            raise
 
-    def send_prompt(self, prompt, max_token: int = 1024, **kwargs) -> str:
+    def _format_messages(self, prompt) -> list:
         if isinstance(prompt, str):
-            messages = [
+            return [
                 {"role": "user", "content": prompt}
             ]
-        elif isinstance(prompt, list) and all(isinstance(m, dict) for m in prompt):
-            messages = prompt
-        else:
-            raise ValueError("Prompt must be a string or a list of message dictionaries.")
+        return super()._format_messages(prompt)
+
+    def _build_client(self, http_client) -> anthropic.Anthropic:
+        return anthropic.Anthropic(api_key=self.api_key, base_url=self.base_url, http_client=http_client,
+                                   max_retries=0)
+
+    def _build_async_client(self, http_client) -> anthropic.AsyncAnthropic:
+        return anthropic.AsyncAnthropic(api_key=self.api_key, base_url=self.base_url, http_client=http_client,
+                                        max_retries=0)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, anthropic.APIConnectionError):
+            return True
+        return isinstance(error, anthropic.APIStatusError) and http_error_is_retryable(error)
+
+    def _reserved_output_tokens(self, kwargs: dict) -> int:
+        return kwargs.get("max_token", 1024)
+
+    def _request_params(self, messages, max_token: int, kwargs: dict) -> dict:
+        system, messages = split_system_messages(messages)
+        params = {"model": self.model, "max_tokens": max_token, "messages": messages,
+                  **{key: value for key, value in kwargs.items() if key != "extra_headers"}}
+        if system and "system" not in kwargs:
+            params["system"] = system
+        if self.prompt_caching:
+            add_cache_breakpoints(params, self._count_message_tokens)
+        return params
+
+    def _extra_headers(self, kwargs: dict) -> dict:
+        headers = dict(kwargs.get("extra_headers") or {})
+        if self.prompt_caching:
+            headers.setdefault("anthropic-beta", PROMPT_CACHING_BETA)
+        return headers
+
+    def _create(self, messages, max_token: int = 1024, **kwargs):
+        return self.client.messages.create(
+            **self._request_params(messages, max_token, kwargs),
+            extra_headers=self._extra_headers(kwargs)
+        )
+
+    async def _acreate(self, messages, max_token: int = 1024, **kwargs):
+        return await self.async_client.messages.create(
+            **self._request_params(messages, max_token, kwargs),
+            extra_headers=self._extra_headers(kwargs)
+        )
+
+    @staticmethod
+    def _input_usage(usage) -> dict:
+        # input_tokens excludes cache reads and writes, which are reported and priced separately.
+        tokens = {'prompt_tokens': usage.input_tokens}
+        cached = getattr(usage, 'cache_read_input_tokens', None)
+        written = getattr(usage, 'cache_creation_input_tokens', None)
+        if cached:
+            tokens['cached_prompt_tokens'] = cached
+        if written:
+            tokens['cache_write_prompt_tokens'] = written
+        return tokens
+
+    def _parse_response(self, response) -> tuple:
+        return response.content[0].text, {
+            **self._input_usage(response.usage),
+            'completion_tokens': response.usage.output_tokens
+        }
+
+    def _create_stream(self, messages, max_token: int = 1024, **kwargs):
+        return self.client.messages.create(
+            **self._request_params(messages, max_token, kwargs),
+            stream=True,
+            extra_headers=self._extra_headers(kwargs)
+        )
+
+    async def _acreate_stream(self, messages, max_token: int = 1024, **kwargs):
+        return await self.async_client.messages.create(
+            **self._request_params(messages, max_token, kwargs),
+            stream=True,
+            extra_headers=self._extra_headers(kwargs)
+        )
+
+    def _parse_stream_event(self, event) -> tuple:
+        # Input tokens arrive with message_start and the output count with the final message_delta.
+        if event.type == "message_start":
+            return None, self._input_usage(event.message.usage)
+        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+            return event.delta.text, None
+        if event.type == "message_delta":
+            return None, {'completion_tokens': event.usage.output_tokens}
+        return None, None
+
+    def _submit_batch(self, requests: list, max_token: int = 1024, **kwargs) -> str:
+        return anthropic_submit_batch(self.client, [(custom_id, self._request_params(messages, max_token, kwargs))
+                                                    for custom_id, messages in requests])
+
+    def _retrieve_batch(self, batch_id: str) -> tuple:
+        return anthropic_retrieve_batch(self.client, batch_id)
+
+    def _batch_results(self, job):
+        return anthropic_batch_results(self.client, job)
+
+    def _parse_batch_result(self, body: dict) -> tuple:
+        return anthropic_parse_batch_result(body)
 
-        try:
-            LOGGER.info("Sending request to Anthropic API.")
-            LOGGER.debug(f"Model: {self.model}")
-            LOGGER.debug(f"Messages: {messages}")
-
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_token,
-                messages=messages,
-                **kwargs
-            )
-
-            response_text = response.content[0].text
-            tokens_used = self.calculate_tokens(prompt_tokens=response.usage.input_tokens, 
-                                                completion_tokens=response.usage.output_tokens)
-            self.add_to_cumulative_tokens(tokens_used)
-
-            LOGGER.info("Received response from Anthropic API.")
-            LOGGER.debug(f"Response: {response_text}")
-            return response_text
-
-        except AnthropicError as e:
-            LOGGER.error(f"An Anthropic API error occurred: {e}")
-            raise
-    
     @LLM_Base.add_to_cumulative_tokens
     def calculate_tokens(self, *args, **kwargs) -> int:
 
         prompt_tokens = kwargs.get('prompt_tokens', 0)
         completion_tokens = kwargs.get('completion_tokens', 0)
-        total_tokens = prompt_tokens + completion_tokens
+        cached_prompt_tokens = kwargs.get('cached_prompt_tokens', 0)
+        cache_write_prompt_tokens = kwargs.get('cache_write_prompt_tokens', 0)
+        total_tokens = prompt_tokens + completion_tokens + cached_prompt_tokens + cache_write_prompt_tokens
 
-        LOGGER.debug(f"Prompt tokens: {prompt_tokens}, Completion tokens: {completion_tokens}, Total tokens: {total_tokens}")
-        return {
+        LOGGER.debug("Prompt tokens: %s, Completion tokens: %s, Total tokens: %s",
+                     prompt_tokens, completion_tokens, total_tokens)
+        tokens = {
             'prompt_tokens': prompt_tokens,
             'completion_tokens': completion_tokens,
             'total_tokens': total_tokens
         }
-
-    def set_token_cost(self, cost_per_token: float):
-        cost_per_token = self._validate_cost(cost_per_token)
-        self.cost_per_token = cost_per_token
+        if cached_prompt_tokens:
+            tokens['cached_prompt_tokens'] = cached_prompt_tokens
+        if cache_write_prompt_tokens:
+            tokens['cache_write_prompt_tokens'] = cache_write_prompt_tokens
+        return tokens
 
 if __name__ == "__main__":
     al = Anthropic_Grollm()
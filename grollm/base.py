@@ -1,17 +1,85 @@
+import asyncio
+import logging
+import os
+import time
 from abc import ABC, abstractmethod
 from functools import wraps
 from collections import Counter
 
-from .utils import import_or_install, add_counters, multiply_counters
+from .batch import iter_prompts, aiter_prompts
+from .batch_jobs import BatchJob, BatchResult
+from .cache import CacheBackend, make_cache_key
+from .cost_manager import NON_PRICE_KEYS
+from .clients import DEFAULT_CLIENT_CONFIG, ClientConfig, shared_async_client, shared_client
+from .health import AUTH_ERROR_STATUSES, HealthMonitor
+from .instrumentation import current_span, instrumented
+from .ledger import LEDGER_SCOPES, UsageLedger
+from .rate_limiter import Reservation, get_rate_limiter
+from .retry import DEFAULT_RETRY_POLICY, RetryPolicy, parse_retry_after
+from .semantic_cache import SemanticCache
+from .singleflight import SingleFlight
+from .streaming import StreamTimer
+from .telemetry import get_mlflow_sink
+from .tokenizers import ContextWindowExceededError, count_estimated_tokens, truncate_messages, truncate_text
+from .usage import UsageAccumulator, flatten_usage
+from .utils import import_or_install, load_env
+
+from .logger import get_logger, setup_logging, truncated
+
+LOGGER = get_logger(__name__)
+
+BATCH_PRICE_PREFIX = "batch_"
+# Prompt-cache reads and writes are charged at the plain prompt price when a model has no
+# dedicated price for them.
+PROMPT_PRICE_FALLBACKS = ("cached_prompt_tokens", "cache_write_prompt_tokens")
 
 class LLM_Base(ABC):
 
-    def __init__(self, api_key: str, db_uri: str, mlflow_flag: bool, experiment_name: str):
+    provider_name = "LLM"
+    api_error = Exception
+    chars_per_token = 4.0
+    context_policies = (None, "error", "truncate")
+
+    def __init__(self, api_key: str, db_uri: str, mlflow_flag: bool, experiment_name: str,
+                 rate_limit: dict = None, retry_policy: RetryPolicy = None, cache: CacheBackend = None,
+                 client_config: ClientConfig = None, context_policy: str = None, coalesce: bool = False,
+                 semantic_cache: SemanticCache = None, health_ttl: float = 60.0, health_refresh: float = None,
+                 ledger: UsageLedger = None, usage_scope: str = "local"):
+        load_env()
+        setup_logging()
+        db_uri = db_uri or os.getenv('MLFLOW_DB_URI')
+
+        if context_policy not in self.context_policies:
+            raise ValueError(f"context_policy must be one of {self.context_policies}.")
+        if usage_scope not in LEDGER_SCOPES:
+            raise ValueError(f"usage_scope must be one of {LEDGER_SCOPES}.")
+        if usage_scope == "host" and ledger is None:
+            raise ValueError("usage_scope='host' requires a ledger.")
+
         self.api_key = api_key
-        self.cumulative_tokens = Counter()
-        self.cumulative_cost = Counter()
+        self.context_policy = context_policy
+        self.max_context = None
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.client_config = client_config or DEFAULT_CLIENT_CONFIG
+        self.base_url = None
+        self._client = None
+        self._async_client = None
+        self._cache_stats = UsageAccumulator()
+        self._singleflight = SingleFlight() if coalesce else None
+        self._coalesce_stats = UsageAccumulator()
+        self._stream_stats = UsageAccumulator()
+        self.last_stream_stats = {}
+        self.rate_limit = rate_limit
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self._rate_limiter = None
+        self._usage = UsageAccumulator()
+        self.ledger = ledger
+        self.usage_scope = usage_scope
+        self.cost_dict = Counter()
         self.mlflow_flag = mlflow_flag
         self.db_uri = db_uri
+        self.health = HealthMonitor(self._probe_health, self.provider_name, ttl=health_ttl, refresh=health_refresh)
 
         if self.mlflow_flag:
             global mlflow
@@ -21,7 +89,7 @@ class LLM_Base(ABC):
                 self._initialize_mlflow(db_uri=db_uri, experiment_name=experiment_name)
             else:
                 self.db_uri = "sqlite:///logs/mlflow.db"
-                self._initialize_mlflow(db_uri=db_uri, experiment_name=experiment_name)
+                self._initialize_mlflow(db_uri=self.db_uri, experiment_name=experiment_name)
 
     def _validate_cost(self, cost_dict: dict):
 
@@ -30,32 +98,630 @@ class LLM_Base(ABC):
                 if value < 0:
                     raise ValueError(f"{item} cost must be non-negative.")
                 
-            self.cost_dict = Counter(cost_dict)
+            self.max_context = cost_dict.get("max_context", self.max_context)
+            self.cost_dict = Counter({k: v for k, v in cost_dict.items() if k not in NON_PRICE_KEYS})
         else:
             self.cost_dict = Counter({})   
 
+        # Price vectors charged per request by the usage accumulator. `batch_`-prefixed entries price
+        # requests sent through the provider Batch API; keys without one fall back to the standard price.
+        self._prices = {key: value for key, value in self.cost_dict.items()
+                        if value and not key.startswith(BATCH_PRICE_PREFIX)}
+        if "prompt_tokens" in self._prices:
+            for key in PROMPT_PRICE_FALLBACKS:
+                self._prices.setdefault(key, self._prices["prompt_tokens"])
+        self._batch_prices = {**self._prices, **{key[len(BATCH_PRICE_PREFIX):]: value
+                                                 for key, value in self.cost_dict.items()
+                                                 if key.startswith(BATCH_PRICE_PREFIX)}}
+        # Prompt-cache reads and writes get the same batch discount as the prompt price.
+        if "prompt_tokens" in self._prices and "prompt_tokens" in self._batch_prices:
+            discount = self._batch_prices["prompt_tokens"] / self._prices["prompt_tokens"]
+            for key in PROMPT_PRICE_FALLBACKS:
+                if key in self._prices and BATCH_PRICE_PREFIX + key not in self.cost_dict:
+                    self._batch_prices[key] = self._prices[key] * discount
+
     @abstractmethod
-    def _check_api_key_health(self):
+    def _probe_health(self):
+        """
+        Cheapest request that proves the key works and the endpoint is reachable, raising if not.
+        Must not generate tokens.
+        """
         pass
-    
+
+    def _check_api_key_health(self) -> bool:
+        return self.health.check().healthy
+
     @property
     def is_available(self) -> bool:
+        """
+        Cached health: probes at most once per `health_ttl` seconds, and not at all while real
+        requests keep the status fresh.
+        """
         return self._check_api_key_health()
 
+    @property
+    def health_info(self) -> dict:
+        return self.health.info
+
+    @property
+    def client(self):
+        """
+        SDK client for this wrapper, shared through the client registry with every instance that
+        talks to the same endpoint with the same key and connection settings.
+        """
+        if self._client is None:
+            self._client = shared_client(self.provider_name, self._client_endpoint, self.api_key,
+                                         self._build_client, self.client_config)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def async_client(self):
+        if self._async_client is not None:
+            return self._async_client
+        return shared_async_client(self.provider_name, self._client_endpoint, self.api_key,
+                                   self._build_async_client, self.client_config)
+
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+
+    @property
+    def _client_endpoint(self):
+        return self.base_url
+
+    def _build_client(self, http_client):
+        raise NotImplementedError(f"{type(self).__name__} does not use an httpx based SDK client.")
+
+    def _build_async_client(self, http_client):
+        raise NotImplementedError(f"{type(self).__name__} does not use an httpx based SDK client.")
+
+    def _format_messages(self, prompt) -> list:
+        if isinstance(prompt, str):
+            return [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ]
+        elif isinstance(prompt, list) and all(isinstance(m, dict) for m in prompt):
+            return prompt
+        else:
+            raise ValueError("Prompt must be a string or a list of message dictionaries.")
+
+    @abstractmethod
+    def _create(self, messages, **kwargs):
+        pass
+
+    @abstractmethod
+    async def _acreate(self, messages, **kwargs):
+        pass
+
+    @abstractmethod
+    def _parse_response(self, response) -> tuple:
+        pass
+
     @abstractmethod
-    def send_prompt(self, *args, **kwargs):
+    def _create_stream(self, messages, **kwargs):
         pass
+
+    @abstractmethod
+    async def _acreate_stream(self, messages, **kwargs):
+        pass
+
+    @abstractmethod
+    def _parse_stream_event(self, event) -> tuple:
+        """
+        Returns (text_delta, usage) for one stream event, either of which may be None. Usage
+        dictionaries from successive events are merged, later ones taking precedence.
+        """
+        pass
+
+    @instrumented("send_prompt")
+    def send_prompt(self, prompt, fresh: bool = False, **kwargs) -> str:
+        """
+        With `fresh`, the response caches and request coalescing are bypassed, so the request
+        always goes to the provider.
+        """
+        messages = self._check_context(self._format_messages(prompt), kwargs)
+        cache_key, cached = (None, None) if fresh else self._cache_lookup(messages, kwargs)
+        if cached is not None:
+            return cached["response"]
+
+        try:
+            self._log_request(messages)
+            response_text, tokens_used, shared = self._coalesced_send(cache_key, messages, kwargs, fresh)
+
+        except self.api_error as e:
+            LOGGER.error(f"An {self.provider_name} API error occurred: {e}")
+            raise
+
+        if not shared:
+            self._cache_store(cache_key, response_text, tokens_used)
+        return response_text
+
+    @instrumented("send_prompt")
+    async def asend_prompt(self, prompt, fresh: bool = False, **kwargs) -> str:
+        messages = self._check_context(self._format_messages(prompt), kwargs)
+        cache_key, cached = (None, None) if fresh else self._cache_lookup(messages, kwargs)
+        if cached is not None:
+            return cached["response"]
+
+        try:
+            self._log_request(messages)
+            response_text, tokens_used, shared = await self._acoalesced_send(cache_key, messages, kwargs, fresh)
+
+        except self.api_error as e:
+            LOGGER.error(f"An {self.provider_name} API error occurred: {e}")
+            raise
+
+        if not shared:
+            self._cache_store(cache_key, response_text, tokens_used)
+        return response_text
+
+    @instrumented("stream_prompt")
+    def stream_prompt(self, prompt, **kwargs):
+        messages = self._check_context(self._format_messages(prompt), kwargs)
+        timer = StreamTimer()
+        parts, usage = [], {}
+
+        try:
+            self._log_request(messages)
+            stream, reservation = self._request(self._create_stream, messages, **kwargs)
+            try:
+                for event in stream:
+                    text, event_usage = self._parse_stream_event(event)
+                    if event_usage:
+                        usage.update(event_usage)
+                    if text:
+                        timer.tick()
+                        parts.append(text)
+                        yield text
+            except BaseException:
+                reservation.cancel()
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+                raise
+
+        except self.api_error as e:
+            LOGGER.error(f"An {self.provider_name} API error occurred: {e}")
+            raise
+
+        self._finish_stream(parts, usage, reservation, timer)
+
+    @instrumented("stream_prompt")
+    async def astream_prompt(self, prompt, **kwargs):
+        messages = self._check_context(self._format_messages(prompt), kwargs)
+        timer = StreamTimer()
+        parts, usage = [], {}
+
+        try:
+            self._log_request(messages)
+            stream, reservation = await self._arequest(self._acreate_stream, messages, **kwargs)
+            try:
+                async for event in stream:
+                    text, event_usage = self._parse_stream_event(event)
+                    if event_usage:
+                        usage.update(event_usage)
+                    if text:
+                        timer.tick()
+                        parts.append(text)
+                        yield text
+            except BaseException:
+                reservation.cancel()
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+                raise
+
+        except self.api_error as e:
+            LOGGER.error(f"An {self.provider_name} API error occurred: {e}")
+            raise
+
+        self._finish_stream(parts, usage, reservation, timer)
+
+    def _finish_stream(self, parts: list, usage: dict, reservation: Reservation, timer: StreamTimer):
+        tokens_used = self.calculate_tokens(**usage)
+        reservation.settle(self._usage_total(tokens_used))
+
+        stats = timer.stats()
+        self.last_stream_stats = stats
+        self._stream_stats.add({
+            "streams": 1,
+            "chunks": stats["chunks"],
+            "time_to_first_token": stats["time_to_first_token"] or 0.0,
+            "inter_token_latency": stats["mean_inter_token_latency"],
+        })
+
+        LOGGER.info("Received streamed response from %s API.", self.provider_name)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("Stream stats: %s", stats)
+            LOGGER.debug("Response: %s", truncated("".join(parts)))
+
+    @property
+    def stream_stats(self) -> dict:
+        return dict(self._stream_stats.snapshot()[0])
+
+    @property
+    def stream_info(self) -> dict:
+        stats = self._stream_stats.snapshot()[0]
+        streams = stats["streams"]
+        return {
+            "streams": streams,
+            "mean_time_to_first_token": stats["time_to_first_token"] / streams if streams else 0.0,
+            "mean_inter_token_latency": stats["inter_token_latency"] / streams if streams else 0.0,
+            "last": dict(self.last_stream_stats),
+        }
+
+    def _send(self, messages, **kwargs) -> tuple:
+        response, reservation = self._request(self._create, messages, **kwargs)
+        response_text, tokens_used = self._handle_response(response)
+        reservation.settle(self._usage_total(tokens_used))
+        return response_text, tokens_used
+
+    async def _asend(self, messages, **kwargs) -> tuple:
+        response, reservation = await self._arequest(self._acreate, messages, **kwargs)
+        response_text, tokens_used = self._handle_response(response)
+        reservation.settle(self._usage_total(tokens_used))
+        return response_text, tokens_used
+
+    def _request(self, create, messages, **kwargs) -> tuple:
+        """
+        Calls `create` under the rate limiter and retry policy. Returns the raw response with the
+        rate-limit reservation, which the caller settles once the real usage is known.
+        """
+        self.retry_policy.record_request()
+        attempt = 0
+        while True:
+            limiter = self.rate_limiter
+            reservation = limiter.acquire(self._estimate_prompt_tokens(messages)) if limiter else Reservation()
+
+            try:
+                response = create(messages, **kwargs)
+            except BaseException as e:
+                reservation.cancel()
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self._record_health_failure(e)
+                    raise
+            else:
+                self.health.record_success()
+                return response, reservation
+            time.sleep(delay)
+            attempt += 1
+
+    async def _arequest(self, acreate, messages, **kwargs) -> tuple:
+        self.retry_policy.record_request()
+        attempt = 0
+        while True:
+            limiter = self.rate_limiter
+            reservation = await limiter.aacquire(self._estimate_prompt_tokens(messages)) if limiter else Reservation()
+
+            try:
+                response = await acreate(messages, **kwargs)
+            except BaseException as e:
+                reservation.cancel()
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self._record_health_failure(e)
+                    raise
+            else:
+                self.health.record_success()
+                return response, reservation
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return False
+
+    def _record_health_failure(self, error: BaseException):
+        """
+        Counts failed requests against the provider's health when they point at the provider or the
+        key: authentication errors, server errors, and connection errors or timeouts (API errors
+        without a status). Rejected requests and rate limiting say nothing about availability.
+        """
+        if not isinstance(error, self.api_error):
+            return
+        status = getattr(error, "status_code", getattr(error, "code", None))
+        if not isinstance(status, int):
+            self.health.record_failure(error)
+        elif status in AUTH_ERROR_STATUSES:
+            self.health.record_failure(error, fatal=True)
+        elif status >= 500:
+            self.health.record_failure(error)
+
+    def _retry_after(self, error: Exception):
+        response = getattr(error, "response", None)
+        return parse_retry_after(getattr(response, "headers", None))
+
+    def _retry_delay(self, error: BaseException, attempt: int):
+        if not isinstance(error, Exception) or not self._is_retryable(error):
+            return None
+        if not self.retry_policy.allow_retry(attempt):
+            LOGGER.warning(f"Not retrying {self.provider_name} request after {attempt + 1} attempt(s): {error}")
+            return None
+
+        delay = self.retry_policy.backoff(attempt, self._retry_after(error))
+        self._record_stats(retries=1, backoff_seconds=delay)
+        span = current_span()
+        if span is not None:
+            span.increment("grollm.retries")
+        LOGGER.warning(f"Retrying {self.provider_name} request in {delay:.2f}s (attempt {attempt + 2}): {error}")
+        return delay
+
+    def _record_stats(self, **values):
+        self._usage.add(values)
+
+    def _cache_lookup(self, messages, kwargs: dict) -> tuple:
+        if self.cache is None and self.semantic_cache is None:
+            return None, None
+
+        key = make_cache_key(self.provider_name, self.model, messages, kwargs)
+        entry = self.cache.get(key) if self.cache is not None else None
+        result = "hit"
+        if entry is None and self.semantic_cache is not None:
+            entry = self.semantic_cache.lookup(key, self.model, messages, kwargs)
+            if entry is not None:
+                self._record_cache_stats(semantic_hits=1)
+                result = "semantic_hit"
+        span = current_span()
+        if span is not None:
+            span.set_attribute("grollm.cache", result if entry is not None else "miss")
+        if entry is None:
+            self._record_cache_stats(misses=1)
+            return key, None
+
+        LOGGER.debug("Cache hit for %s request %s.", self.provider_name, key[:12])
+        # Hits are tallied here rather than in cumulative_tokens, which only tracks real spend.
+        self._record_cache_stats(hits=1, **{f"saved_{k}": v for k, v in entry.get("usage", {}).items()
+                                            if isinstance(v, (int, float))})
+        return key, entry
+
+    def _cache_store(self, key, response_text: str, tokens_used):
+        if key is None:
+            return
+        usage = tokens_used if isinstance(tokens_used, dict) else {"total": tokens_used}
+        entry = {"response": response_text, "usage": usage}
+        if self.cache is not None:
+            self.cache.set(key, entry)
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(key, entry)
+
+    def _coalesced_send(self, key, messages, kwargs: dict, fresh: bool = False) -> tuple:
+        """
+        Sends the request, or with coalescing enabled joins an identical request already in flight.
+        Usage is charged once, by the caller that made the upstream call.
+        """
+        if self._singleflight is None or fresh:
+            return (*self._send(messages, **kwargs), False)
+        key = key or make_cache_key(self.provider_name, self.model, messages, kwargs)
+        (response_text, tokens_used), shared = self._singleflight.do(key, lambda: self._send(messages, **kwargs))
+        self._coalesce_stats.add({"requests": 1, "coalesced": int(shared)})
+        span = current_span()
+        if shared and span is not None:
+            span.set_attribute("grollm.coalesced", True)
+        return response_text, tokens_used, shared
+
+    async def _acoalesced_send(self, key, messages, kwargs: dict, fresh: bool = False) -> tuple:
+        if self._singleflight is None or fresh:
+            return (*await self._asend(messages, **kwargs), False)
+        key = key or make_cache_key(self.provider_name, self.model, messages, kwargs)
+        (response_text, tokens_used), shared = await self._singleflight.ado(key, lambda: self._asend(messages, **kwargs))
+        self._coalesce_stats.add({"requests": 1, "coalesced": int(shared)})
+        span = current_span()
+        if shared and span is not None:
+            span.set_attribute("grollm.coalesced", True)
+        return response_text, tokens_used, shared
+
+    @property
+    def coalesce_info(self) -> dict:
+        info = dict(self._coalesce_stats.snapshot()[0])
+        requests = info.get("requests", 0)
+        info["coalesce_rate"] = info.get("coalesced", 0) / requests if requests else 0.0
+        return info
+
+    @property
+    def prompt_cache_info(self) -> dict:
+        """
+        Provider-side prompt caching totals. `hit_rate` is the share of prompt tokens read from the
+        provider's prompt cache.
+        """
+        tokens = self.cumulative_tokens
+        info = {key: tokens.get(key, 0) for key in ("prompt_tokens", "cached_prompt_tokens", "cache_write_prompt_tokens")}
+        total = sum(info.values())
+        info["hit_rate"] = info["cached_prompt_tokens"] / total if total else 0.0
+        return info
+
+    def _record_cache_stats(self, **values):
+        self._cache_stats.add(values)
+
+    @property
+    def cache_stats(self) -> dict:
+        return dict(self._cache_stats.snapshot()[0])
+
+    @property
+    def cache_info(self) -> dict:
+        info = self.cache_stats
+        lookups = info.get("hits", 0) + info.get("misses", 0)
+        info["hit_rate"] = info.get("hits", 0) / lookups if lookups else 0.0
+        return info
+
+    @property
+    def rate_limiter(self):
+        if self._rate_limiter is None and self.rate_limit:
+            self._rate_limiter = get_rate_limiter(self.provider_name, self._rate_limit_scope, **self.rate_limit)
+        return self._rate_limiter
+
+    @property
+    def _rate_limit_scope(self) -> str:
+        return self.model
+
+    def _estimate_prompt_tokens(self, messages) -> int:
+        # Corrected against the real usage once the call returns.
+        return self._count_message_tokens(messages)
+
+    def count_tokens(self, prompt) -> int:
+        """
+        Offline estimate of the prompt tokens `prompt` will be billed for, without any network I/O.
+        """
+        return self._count_message_tokens(self._format_messages(prompt))
+
+    def _count_message_tokens(self, messages) -> int:
+        return count_estimated_tokens(messages, self.chars_per_token)
+
+    def _reserved_output_tokens(self, kwargs: dict) -> int:
+        return kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or 0
+
+    def _check_context(self, messages, kwargs: dict):
+        if self.context_policy is None or not self.max_context:
+            return messages
+
+        output_tokens = self._reserved_output_tokens(kwargs)
+        budget = self.max_context - output_tokens
+        prompt_tokens = self._count_message_tokens(messages)
+        if prompt_tokens <= budget:
+            return messages
+
+        if self.context_policy == "error" or budget <= 0:
+            raise ContextWindowExceededError(self.model, prompt_tokens, output_tokens, self.max_context)
+
+        LOGGER.warning("Truncating %s prompt of ~%s tokens to fit %s tokens.", self.model, prompt_tokens, budget)
+        if isinstance(messages, str):
+            return truncate_text(messages, budget, self._count_message_tokens)
+        return truncate_messages(messages, budget, self._count_message_tokens)
+
+    @staticmethod
+    def _usage_total(tokens_used) -> int:
+        if isinstance(tokens_used, dict):
+            return tokens_used.get('total_tokens') or tokens_used.get('total_token_count', 0)
+        return tokens_used
+
+    def send_prompts(self, prompts, max_concurrency: int = 8, **kwargs) -> list:
+        return list(self.iter_prompts(prompts, max_concurrency=max_concurrency, ordered=True, **kwargs))
+
+    def iter_prompts(self, prompts, max_concurrency: int = 8, ordered: bool = True, **kwargs):
+        return iter_prompts(self.send_prompt, prompts, max_concurrency=max_concurrency, ordered=ordered, **kwargs)
+
+    async def asend_prompts(self, prompts, max_concurrency: int = 64, **kwargs) -> list:
+        return [result async for result in self.aiter_prompts(prompts, max_concurrency=max_concurrency,
+                                                              ordered=True, **kwargs)]
+
+    def aiter_prompts(self, prompts, max_concurrency: int = 64, ordered: bool = True, **kwargs):
+        return aiter_prompts(self.asend_prompt, prompts, max_concurrency=max_concurrency, ordered=ordered, **kwargs)
+
+    @instrumented("submit_batch")
+    def submit_batch(self, prompts, **kwargs) -> BatchJob:
+        """
+        Submits `prompts` through the provider's asynchronous Batch API. `prompts` is either a list,
+        whose results are keyed by position, or a dict of {id: prompt}.
+        """
+        if isinstance(prompts, dict):
+            ids, prompts = list(prompts.keys()), list(prompts.values())
+        else:
+            prompts = list(prompts)
+            ids = list(range(len(prompts)))
+
+        requests = [(str(position), self._check_context(self._format_messages(prompt), kwargs))
+                    for position, prompt in enumerate(prompts)]
+        batch_id = self._submit_batch(requests, **kwargs)
+        LOGGER.info("Submitted %s batch %s with %s requests.", self.provider_name, batch_id, len(requests))
+        return BatchJob(batch_id=batch_id, ids=ids)
+
+    def poll_batch(self, job: BatchJob) -> BatchJob:
+        job.status, job.done, job.info = self._retrieve_batch(job.batch_id)
+        LOGGER.debug("Batch %s status: %s", job.batch_id, job.status)
+        return job
+
+    def wait_batch(self, job: BatchJob, poll_interval: float = 5.0, max_poll_interval: float = 300.0,
+                   timeout: float = None) -> BatchJob:
+        """
+        Polls until the batch reaches a terminal status, backing off from `poll_interval` to
+        `max_poll_interval`. Raises TimeoutError if `timeout` seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.poll_batch(job).done:
+            delay = poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Batch {job.batch_id} still {job.status} after {timeout}s.")
+                delay = min(delay, remaining)
+            time.sleep(delay)
+            poll_interval = min(poll_interval * 1.5, max_poll_interval)
+        return job
+
+    @instrumented("batch_results", first_token=False)
+    def batch_results(self, job: BatchJob):
+        """
+        Yields a BatchResult per submitted prompt, mapped back to its ID. Each result's usage is
+        charged at batch prices the first time it is read, however often the results are re-read.
+        """
+        seen = set()
+        for custom_id, body, error in self._batch_results(job):
+            position = int(custom_id)
+            seen.add(position)
+            if body is None:
+                yield BatchResult(id=job.ids[position], error=error)
+                continue
+            text, usage = self._parse_batch_result(body)
+            if position in job.charged:
+                tokens_used = usage
+            else:
+                tokens_used = self.calculate_tokens(batch=True, **usage)
+                job.charged.add(position)
+            yield BatchResult(id=job.ids[position], response=text, usage=tokens_used)
+
+        for position, prompt_id in enumerate(job.ids):
+            if position not in seen:
+                yield BatchResult(id=prompt_id, error=f"No result returned, batch status: {job.status}")
+
+    def run_batch(self, prompts, poll_interval: float = 5.0, timeout: float = None, **kwargs) -> dict:
+        job = self.wait_batch(self.submit_batch(prompts, **kwargs), poll_interval=poll_interval, timeout=timeout)
+        return {result.id: result for result in self.batch_results(job)}
+
+    def _submit_batch(self, requests: list, **kwargs) -> str:
+        raise NotImplementedError(f"{self.provider_name} does not support batch requests.")
+
+    def _retrieve_batch(self, batch_id: str) -> tuple:
+        raise NotImplementedError(f"{self.provider_name} does not support batch requests.")
+
+    def _batch_results(self, job: BatchJob):
+        raise NotImplementedError(f"{self.provider_name} does not support batch requests.")
+
+    def _parse_batch_result(self, body: dict) -> tuple:
+        raise NotImplementedError(f"{self.provider_name} does not support batch requests.")
+
+    def _log_request(self, messages):
+        LOGGER.info("Sending request to %s API.", self.provider_name)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("Model: %s", self.model)
+            LOGGER.debug("Messages: %s", truncated(messages))
+
+    def _handle_response(self, response) -> tuple:
+        response_text, usage = self._parse_response(response)
+        tokens_used = self.calculate_tokens(**usage)
+
+        LOGGER.info("Received response from %s API.", self.provider_name)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("Response: %s", truncated(response_text))
+        return response_text, tokens_used
     
     @staticmethod
     def add_to_cumulative_tokens(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             self = args[0]
+            prices = self._batch_prices if kwargs.pop('batch', False) else self._prices
             tokens_used = func(*args, **kwargs)
-            if isinstance(tokens_used, dict):
-                self.cumulative_tokens = add_counters(tokens_used, self.cumulative_tokens)
-            else:
-                self.cumulative_tokens['total'] += tokens_used
+            usage = flatten_usage(tokens_used) if isinstance(tokens_used, dict) else {'total': tokens_used}
+            self._usage.add(usage, prices)
+            if self.ledger is not None:
+                self.ledger.record(self.provider_name, self.model, usage, prices)
+            span = current_span()
+            if span is not None:
+                span.add_usage(usage)
             
             if self.mlflow_flag:
                 self._log_to_mlflow(tokens_used)
@@ -82,32 +748,76 @@ class LLM_Base(ABC):
     def calculate_tokens(self, *args, **kwargs) -> dict:
         pass
 
+    def _usage_totals(self, scope: str = None) -> tuple:
+        """
+        (tokens, cost) for this wrapper (`local`) or, from the ledger, for every process on the
+        host using the same provider and model (`host`).
+        """
+        if (scope or self.usage_scope) == "host":
+            return self.ledger.totals(self.provider_name, self.model)
+        return self._usage.snapshot()
+
+    @property
+    def cumulative_tokens(self) -> Counter:
+        """
+        Read-only snapshot: a new Counter on every access, in both usage scopes, so changing it does
+        not change the totals. Use `reset_usage()` to start over.
+        """
+        return self._usage_totals()[0]
+
+    @property
+    def cumulative_cost(self) -> Counter:
+        return self._usage_totals()[1]
+
     @property
     def tokens_used(self):
         return dict(self.cumulative_tokens)
     
-    @property
+    def reset_usage(self):
+        """
+        Zeroes this wrapper's token and cost totals; a shared ledger is left untouched.
+        """
+        self._usage.reset()
+
     def set_token_cost(self, cost_dict: dict):
+        # Only requests made after this call are charged at the new prices.
         self._validate_cost(cost_dict)
-        self.cost_dict = cost_dict
 
     @property
     def tokens_session_cost(self):
-        self.cumulative_cost += multiply_counters(self.cost_dict, self.cumulative_tokens)
         adjusted_cost_dict = {}
         for key, value in self.cumulative_cost.items():
             adjusted_cost_dict[f"{key}_cost"] = value
 
         return adjusted_cost_dict
 
+    def usage_snapshot(self, scope: str = None) -> dict:
+        """
+        Consistent view of token totals and cost, cheap enough to serve from a metrics endpoint.
+        """
+        scope = scope or self.usage_scope
+        tokens, cost = self._usage_totals(scope)
+        return {
+            "provider": self.provider_name,
+            "model": self.model,
+            "scope": scope,
+            "tokens": dict(tokens),
+            "cost": dict(cost),
+            "total_cost": sum(cost.values()),
+        }
+
     def _initialize_mlflow(self, db_uri, experiment_name = "LLM_Experiments"):
 
         mlflow.set_tracking_uri(db_uri)
         mlflow.set_experiment(experiment_name)
         self._current_run_id = mlflow.start_run().info.run_id
+        self._telemetry = get_mlflow_sink(db_uri)
 
     def _log_to_mlflow(self, details: dict):
+        # Queued for the background sink, which writes to MLflow in batches off the request path.
+        self._telemetry.log_metrics(self._current_run_id, details)
 
-        with mlflow.start_run(run_id=self._current_run_id, nested=True):
-            for key, value in details.items():
-                mlflow.log_metric(key, value)
\ No newline at end of file
+    def flush_telemetry(self, timeout: float = 10.0) -> bool:
+        if not self.mlflow_flag:
+            return True
+        return self._telemetry.flush(timeout)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional
+
+@dataclass
+class PromptResult:
+    index: int
+    prompt: Any
+    response: Optional[str] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def _call(send: Callable, index: int, prompt, kwargs: dict) -> PromptResult:
+    try:
+        return PromptResult(index=index, prompt=prompt, response=send(prompt, **kwargs))
+    except Exception as e:
+        return PromptResult(index=index, prompt=prompt, error=e)
+
+async def _acall(asend: Callable, index: int, prompt, kwargs: dict) -> PromptResult:
+    try:
+        return PromptResult(index=index, prompt=prompt, response=await asend(prompt, **kwargs))
+    except Exception as e:
+        return PromptResult(index=index, prompt=prompt, error=e)
+
+def iter_prompts(send: Callable, prompts: Iterable, max_concurrency: int = 8,
+                 ordered: bool = True, **kwargs) -> Iterator[PromptResult]:
+    """
+    Runs `send` over `prompts` on a thread pool with at most `max_concurrency` calls in flight.
+    The input iterable is consumed lazily, so arbitrarily long inputs are never materialized.
+    Results are yielded in input order when `ordered` is set, otherwise as they complete.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    prompts = enumerate(prompts)
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="grollm-batch")
+
+    def submit_next(pending) -> bool:
+        item = next(prompts, None)
+        if item is None:
+            return False
+        index, prompt = item
+        pending.append(executor.submit(_call, send, index, prompt, kwargs))
+        return True
+
+    try:
+        if ordered:
+            pending = deque()
+            while len(pending) < max_concurrency and submit_next(pending):
+                pass
+            while pending:
+                result = pending.popleft().result()
+                submit_next(pending)
+                yield result
+        else:
+            pending = []
+            while len(pending) < max_concurrency and submit_next(pending):
+                pass
+            while pending:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                pending = list(not_done)
+                for _ in done:
+                    submit_next(pending)
+                for future in done:
+                    yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+async def aiter_prompts(asend: Callable, prompts: Iterable, max_concurrency: int = 8,
+                        ordered: bool = True, **kwargs) -> AsyncIterator[PromptResult]:
+    """
+    Async counterpart of `iter_prompts`, scheduling `asend` coroutines as tasks on the running loop.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    prompts = enumerate(prompts)
+
+    def submit_next(pending) -> bool:
+        item = next(prompts, None)
+        if item is None:
+            return False
+        index, prompt = item
+        pending.append(asyncio.ensure_future(_acall(asend, index, prompt, kwargs)))
+        return True
+
+    pending = deque() if ordered else []
+    try:
+        while len(pending) < max_concurrency and submit_next(pending):
+            pass
+
+        if ordered:
+            while pending:
+                result = await pending.popleft()
+                submit_next(pending)
+                yield result
+        else:
+            while pending:
+                done, not_done = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending = list(not_done)
+                for _ in done:
+                    submit_next(pending)
+                for task in done:
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
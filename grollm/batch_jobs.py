@@ -0,0 +1,114 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+# Batch statuses after which a job no longer changes.
+OPENAI_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+ANTHROPIC_BATCHES_BETA = "message-batches-2024-09-24"
+
+@dataclass
+class BatchJob:
+    """
+    Handle for a submitted provider batch. `ids` maps the position used as each request's
+    `custom_id` back to the caller's ID, so a job can be saved and resumed from `batch_id` and
+    `ids` alone. `charged` holds the positions whose usage has already been charged.
+    """
+    batch_id: str
+    ids: list
+    status: str = "submitted"
+    done: bool = False
+    info: dict = field(default_factory=dict)
+    charged: set = field(default_factory=set)
+
+@dataclass
+class BatchResult:
+    id: Any
+    response: Optional[str] = None
+    error: Optional[str] = None
+    usage: Optional[dict] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def _jsonl(lines: list) -> bytes:
+    return "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+
+def openai_submit_batch(client, requests: list, url: str, model: str, kwargs: dict) -> str:
+    """
+    Uploads `requests`, a list of (custom_id, messages), as a batch input file and starts a batch
+    against `url`. Used by both OpenAI and Azure OpenAI, which share the Batch API.
+    """
+    lines = [{"custom_id": custom_id, "method": "POST", "url": url,
+              "body": {"model": model, "messages": messages, **kwargs}}
+             for custom_id, messages in requests]
+    batch_file = client.files.create(file=("batch.jsonl", _jsonl(lines)), purpose="batch")
+    batch = client.batches.create(input_file_id=batch_file.id, endpoint=url, completion_window="24h")
+    return batch.id
+
+def openai_retrieve_batch(client, batch_id: str) -> tuple:
+    batch = client.batches.retrieve(batch_id)
+    return batch.status, batch.status in OPENAI_TERMINAL_STATUSES, batch.to_dict()
+
+def openai_batch_results(client, job: BatchJob) -> Iterator[tuple]:
+    for file_key in ("output_file_id", "error_file_id"):
+        file_id = job.info.get(file_key)
+        if not file_id:
+            continue
+        for raw in client.files.content(file_id).iter_lines():
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code", 200) >= 400:
+                error = line.get("error") or response.get("body", {}).get("error")
+                yield line["custom_id"], None, json.dumps(error)
+            else:
+                yield line["custom_id"], response["body"], None
+
+def openai_parse_batch_result(body: dict) -> tuple:
+    return body["choices"][0]["message"]["content"], body.get("usage", {})
+
+def anthropic_submit_batch(client, requests: list) -> str:
+    """
+    Creates an Anthropic Message Batch from (custom_id, params) pairs. The pinned SDK predates
+    `client.beta.messages.batches`, so the REST endpoint is called through the client's generic
+    request methods.
+    """
+    body = {"requests": [{"custom_id": custom_id, "params": params} for custom_id, params in requests]}
+    batch = client.post("/v1/messages/batches", body=body, cast_to=object,
+                        options={"headers": {"anthropic-beta": ANTHROPIC_BATCHES_BETA}})
+    return batch["id"]
+
+def anthropic_retrieve_batch(client, batch_id: str) -> tuple:
+    batch = client.get(f"/v1/messages/batches/{batch_id}", cast_to=object,
+                       options={"headers": {"anthropic-beta": ANTHROPIC_BATCHES_BETA}})
+    return batch["processing_status"], batch["processing_status"] == "ended", batch
+
+def anthropic_batch_results(client, job: BatchJob) -> Iterator[tuple]:
+    results_url = job.info.get("results_url")
+    if not results_url:
+        return
+    import httpx
+
+    response = client.get(results_url, cast_to=httpx.Response,
+                          options={"headers": {"anthropic-beta": ANTHROPIC_BATCHES_BETA}})
+    for raw in response.iter_lines():
+        if not raw.strip():
+            continue
+        line = json.loads(raw)
+        result = line["result"]
+        if result["type"] == "succeeded":
+            yield line["custom_id"], result["message"], None
+        else:
+            yield line["custom_id"], None, json.dumps(result.get("error") or {"type": result["type"]})
+
+def anthropic_parse_batch_result(body: dict) -> tuple:
+    text = "".join(block.get("text", "") for block in body["content"] if block.get("type") == "text")
+    usage = body.get("usage", {})
+    tokens = {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    if usage.get("cache_read_input_tokens"):
+        tokens["cached_prompt_tokens"] = usage["cache_read_input_tokens"]
+    if usage.get("cache_creation_input_tokens"):
+        tokens["cache_write_prompt_tokens"] = usage["cache_creation_input_tokens"]
+    return text, tokens
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import importlib.util
+import threading
+import warnings
+import weakref
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import httpx
+
+@dataclass(frozen=True)
+class ClientConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    timeout: float = 600.0
+    connect_timeout: float = 10.0
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+DEFAULT_CLIENT_CONFIG = ClientConfig()
+
+def _http2_enabled(config: ClientConfig) -> bool:
+    if config.http2 and importlib.util.find_spec("h2") is None:
+        warnings.warn("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1. "
+                      "Install it with `pip install httpx[http2]`.")
+        return False
+    return config.http2
+
+def build_http_client(config: ClientConfig = DEFAULT_CLIENT_CONFIG, asynchronous: bool = False):
+    client_class = httpx.AsyncClient if asynchronous else httpx.Client
+    return client_class(
+        limits=config.limits(),
+        timeout=config.timeouts(),
+        http2=_http2_enabled(config),
+        follow_redirects=True,
+    )
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+def _key(provider: str, endpoint: Optional[str], api_key: Optional[str], config: ClientConfig) -> tuple:
+    # Only a fingerprint of the key is kept in the registry.
+    fingerprint = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return provider, endpoint, fingerprint, config
+
+def shared_client(provider: str, endpoint: Optional[str], api_key: Optional[str], factory: Callable,
+                  config: ClientConfig = DEFAULT_CLIENT_CONFIG):
+    """
+    Returns the SDK client for (provider, endpoint, api_key, config), building it on first use
+    with `factory(http_client)`. Every wrapper instance with the same settings shares the client
+    and therefore its pool of warm keep-alive connections.
+    """
+    key = _key(provider, endpoint, api_key, config)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory(build_http_client(config))
+        return client
+
+def shared_async_client(provider: str, endpoint: Optional[str], api_key: Optional[str], factory: Callable,
+                        config: ClientConfig = DEFAULT_CLIENT_CONFIG):
+    """
+    Async variant of `shared_client`. httpx async connections belong to the event loop that
+    opened them, so clients are shared per running loop and dropped together with the loop.
+    """
+    loop = asyncio.get_running_loop()
+    key = _key(provider, endpoint, api_key, config)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = factory(build_http_client(config, asynchronous=True))
+        return client
+
+def close_clients():
+    """
+    Closes every pooled synchronous client, e.g. before forking worker processes.
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
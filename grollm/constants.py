@@ -5,4 +5,8 @@ class Constants(Enum):
 
     LOGS_FOLDER = "logs"
     LOGS_FILE = "grollm.log"
-    LOG_LEVEL = "DEBUG"
+    LOG_LEVEL = "INFO"
+    LOG_LEVEL_ENV = "GROLLM_LOG_LEVEL"
+    # Prompts and responses longer than this are cut down before they are logged.
+    LOG_PAYLOAD_CHARS = 1000
+    LOG_PAYLOAD_CHARS_ENV = "GROLLM_LOG_PAYLOAD_CHARS"
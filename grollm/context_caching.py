@@ -0,0 +1,141 @@
+import datetime
+import hashlib
+import json
+import threading
+import time
+from typing import Callable
+
+from .singleflight import SingleFlight
+from .tokenizers import message_text
+
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+# Gemini 1.5 rejects cached contents smaller than this.
+MIN_CACHEABLE_TOKENS = 32_768
+
+def to_gemini_contents(messages) -> tuple:
+    """
+    Converts chat messages to Gemini's (system_instruction, contents). System messages are joined
+    into the system instruction and assistant turns become `model` turns. Messages that already
+    carry Gemini `parts` keep them.
+    """
+    if isinstance(messages, str):
+        return None, messages
+    system = [message_text(m) for m in messages if m.get("role") == "system"]
+    contents = [{"role": "model" if m.get("role") in ("assistant", "model") else "user",
+                 "parts": m["parts"] if "parts" in m else [message_text(m)]}
+                for m in messages if m.get("role") != "system"]
+    return "\n\n".join(system) or None, contents
+
+class ContextCache:
+    """
+    Moves long, stable prompt prefixes into Gemini CachedContent so that follow-up requests send
+    only the latest turn and are billed the cached rate for the rest. The prefix is the system
+    instruction plus every turn before the last one; prefixes shorter than `min_tokens` are sent
+    as usual. Handles are keyed by a hash of the model and prefix. A handle used within
+    `refresh_margin` seconds of expiring has its TTL extended, so busy prefixes stay cached and
+    idle ones expire `ttl` seconds after their last extension.
+    """
+
+    def __init__(self, ttl: float = 3600.0, min_tokens: int = MIN_CACHEABLE_TOKENS,
+                 refresh_margin: float = 300.0):
+        from google.generativeai import caching
+
+        self._caching = caching
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.refresh_margin = refresh_margin
+        self.created = 0
+        self.reused = 0
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._singleflight = SingleFlight()
+
+    @staticmethod
+    def key(model: str, prefix: list) -> str:
+        payload = json.dumps({"model": model, "prefix": prefix}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def resolve(self, model: str, messages, count_messages: Callable[[list], int]) -> tuple:
+        """
+        Returns (cached_content, messages_to_send). `cached_content` is None when the request has
+        no prefix worth caching, in which case `messages` is returned unchanged.
+        """
+        if isinstance(messages, str):
+            return None, messages
+        turns = [m for m in messages if m.get("role") != "system"]
+        if not turns:
+            return None, messages
+        last = turns[-1]
+        prefix = [m for m in messages if m is not last]
+        if not prefix or count_messages(prefix) < self.min_tokens:
+            return None, messages
+
+        key = self.key(model, prefix)
+        cached, _ = self._singleflight.do(key, lambda: self._get_or_create(key, model, prefix))
+        return cached, [last]
+
+    def _get_or_create(self, key: str, model: str, prefix: list):
+        with self._lock:
+            handle = self._handles.get(key)
+        if handle is not None:
+            cached, expires = handle
+            remaining = expires - time.time()
+            if remaining > self.refresh_margin:
+                self._remember(key, cached, reused=True, extend=False)
+                return cached
+            if remaining > 0:
+                try:
+                    cached.update(ttl=datetime.timedelta(seconds=self.ttl))
+                    self._remember(key, cached, reused=True)
+                    return cached
+                except Exception as e:
+                    LOGGER.warning(f"Could not extend Gemini cached content {cached.name}, recreating it: {e}")
+
+        system, contents = to_gemini_contents(prefix)
+        cached = self._caching.CachedContent.create(
+            model=model, display_name=f"grollm-{key[:16]}", system_instruction=system,
+            contents=contents or None, ttl=datetime.timedelta(seconds=self.ttl))
+        LOGGER.info(f"Created Gemini cached content {cached.name} for {model}.")
+        self._remember(key, cached)
+        return cached
+
+    def _remember(self, key: str, cached, reused: bool = False, extend: bool = True):
+        with self._lock:
+            if extend:
+                self._handles[key] = (cached, time.time() + self.ttl)
+            if reused:
+                self.reused += 1
+            else:
+                self.created += 1
+
+    def discard(self, cached) -> None:
+        """
+        Forgets a handle the server no longer knows, so the next request recreates it.
+        """
+        with self._lock:
+            for key, (handle, _) in list(self._handles.items()):
+                if handle.name == cached.name:
+                    del self._handles[key]
+
+    def clear(self):
+        """
+        Deletes every cached content created here, which stops their storage charges.
+        """
+        with self._lock:
+            handles = [cached for cached, _ in self._handles.values()]
+            self._handles.clear()
+        for cached in handles:
+            try:
+                cached.delete()
+            except Exception as e:
+                LOGGER.warning(f"Could not delete Gemini cached content {cached.name}: {e}")
+
+    @property
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            live = sum(1 for _, expires in self._handles.values() if expires > now)
+        return {"created": self.created, "reused": self.reused, "live": live}
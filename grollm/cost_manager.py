@@ -2,6 +2,9 @@ import warnings
 
 from pydantic import BaseModel
 
+# Model details kept in pricing dictionaries alongside the per-token prices.
+NON_PRICE_KEYS = frozenset({"max_context"})
+
 class CostModel(BaseModel):
     name: str
     cost_dict: dict = {}
@@ -18,8 +21,10 @@ class CostStore:
                 raise ValueError("Model name must be a string.")
             if not isinstance(cost_dict, dict):
                 raise ValueError("Cost dictionary must be a dictionary.")
-            if not all(isinstance(value, float) for value in cost_dict.values()):
+            if not all(isinstance(value, float) for key, value in cost_dict.items() if key not in NON_PRICE_KEYS):
                 raise ValueError("Cost values must be floats.")
+            if not isinstance(cost_dict.get("max_context", 0), int):
+                raise ValueError("max_context must be an integer.")
 
     def get_model_pricing(self, model: str) -> CostModel:
         
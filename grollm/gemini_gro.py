@@ -1,83 +1,247 @@
+import asyncio
 import os
-from dotenv import load_dotenv
+import threading
+from collections import OrderedDict
 
 import google.generativeai as gemini  # Assuming a similar library or use the appropriate one
+from google.api_core import exceptions as google_exceptions
+from google.generativeai.types import generation_types
 
 from .base import LLM_Base
 
+from .cache import CacheBackend
+from .context_caching import ContextCache, to_gemini_contents
 from .cost_manager import CostStore
+from .ledger import UsageLedger
+from .retry import RetryPolicy
+from .semantic_cache import SemanticCache
 
 from .logger import get_logger
-
-load_dotenv()
+from .utils import load_env
 
 LOGGER = get_logger(__name__)
 
-pricing_details= {}
+# Prices for prompts up to 128k tokens; longer prompts are billed at twice these rates. Cached
+# content storage is billed per hour by Google and is not included.
+pricing_details = {
+    "gemini-1.5-pro": {
+        "prompt_tokens": 1.25 / 1000000,
+        "completion_tokens": 5.00 / 1000000,
+        "cached_prompt_tokens": 0.3125 / 1000000,
+        "max_context": 2097152,
+    },
+    "gemini-1.5-pro-002": {
+        "prompt_tokens": 1.25 / 1000000,
+        "completion_tokens": 5.00 / 1000000,
+        "cached_prompt_tokens": 0.3125 / 1000000,
+        "max_context": 2097152,
+    },
+    "gemini-1.5-flash": {
+        "prompt_tokens": 0.075 / 1000000,
+        "completion_tokens": 0.30 / 1000000,
+        "cached_prompt_tokens": 0.01875 / 1000000,
+        "max_context": 1048576,
+    },
+    "gemini-1.5-flash-002": {
+        "prompt_tokens": 0.075 / 1000000,
+        "completion_tokens": 0.30 / 1000000,
+        "cached_prompt_tokens": 0.01875 / 1000000,
+        "max_context": 1048576,
+    },
+    "gemini-1.0-pro-latest": {
+        "prompt_tokens": 0.50 / 1000000,
+        "completion_tokens": 1.50 / 1000000,
+        "max_context": 30720,
+    },
+}
+
+# GenerationConfig fields accepted as plain keyword arguments, and the OpenAI-style names mapped
+# onto them.
+GENERATION_CONFIG_KEYS = frozenset({"candidate_count", "stop_sequences", "max_output_tokens", "temperature",
+                                    "top_p", "top_k", "response_mime_type", "response_schema"})
+GENERATION_CONFIG_ALIASES = {"max_tokens": "max_output_tokens", "stop": "stop_sequences", "n": "candidate_count"}
+
+# Gemini fixes the system instruction and cached content per model object, so one is kept per value.
+MAX_MODELS = 32
 
 cs = CostStore(pricing_details)
 
+rate_limits = {}
+
 class Gemini_Grollm(LLM_Base):
-    
-    def __init__(self, api_key: str = os.getenv('GEMINI_API_KEY'), 
-                 db_uri: str = os.getenv('MLFLOW_DB_URI'),
+
+    provider_name = "Google Gemini"
+    api_error = google_exceptions.GoogleAPIError
+
+    def __init__(self, api_key: str = None, 
+                 db_uri: str = None,
                  mlflow_flag: bool = False,
                  experiment_name: str = "LLM_Experiments_GEMINI", 
                  model: str = 'gemini-1.0-pro-latest',
-                 cost_store: CostStore = cs):
-        
-        super().__init__(api_key=api_key, db_uri=db_uri, mlflow_flag=mlflow_flag, experiment_name=experiment_name)
-        gemini.configure(api_key=os.environ["GEMINI_API_KEY"])
+                 cost_store: CostStore = cs,
+                 rate_limit: dict = None,
+                 retry_policy: RetryPolicy = None,
+                 cache: CacheBackend = None,
+                 context_policy: str = None,
+                 coalesce: bool = False,
+                 semantic_cache: SemanticCache = None,
+                 health_ttl: float = 60.0,
+                 health_refresh: float = None,
+                 context_cache: ContextCache = None,
+                 ledger: UsageLedger = None,
+                 usage_scope: str = "local"):
+
+        load_env()
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        super().__init__(api_key=api_key, db_uri=db_uri, mlflow_flag=mlflow_flag, experiment_name=experiment_name,
+                         rate_limit=rate_limit or rate_limits.get(model), retry_policy=retry_policy,
+                         cache=cache, context_policy=context_policy,
+                         coalesce=coalesce, semantic_cache=semantic_cache, health_ttl=health_ttl,
+                         health_refresh=health_refresh, ledger=ledger, usage_scope=usage_scope)
+        gemini.configure(api_key=self.api_key)
         self.model = model
         self.gemini_client = gemini.GenerativeModel(self.model)
+        self.context_cache = context_cache
+        self._models = OrderedDict()
+        self._models_lock = threading.Lock()
         self.cost_store = cost_store
         self._validate_cost(pricing_details.get(model, {}))
         
-    def _check_api_key_health(self):
-        try:
-            # Make a basic request to check API health
-            self.gemini_client.generate_content("Hello, world!")
-            return True
-        except Exception as e:
-            LOGGER.error(f"API key health check failed: {e}")
-            return False
-
-    def send_prompt(self, prompt, **kwargs) -> str:
+    def _probe_health(self):
+        # Model metadata needs a valid key but, unlike generate_content, no tokens.
+        gemini.get_model(f"models/{self.model}")
 
+    def _format_messages(self, prompt):
         if isinstance(prompt, str):
-            try:
-                LOGGER.info("Sending request to Google Gemini API.")
-                LOGGER.debug(f"Model: {self.model}")
-                LOGGER.debug(f"Messages: {prompt}")
-
-                response = self.gemini_client.generate_content(prompt)
-                response_text = response.text
-
-                tokens_used = self.calculate_tokens(**response.to_dict()['usage_metadata'])
-                self.add_to_cumulative_tokens(tokens_used)
-
-                LOGGER.info("Received response from Google Gemini API.")
-                LOGGER.debug(f"Response: {response_text}")
-                return response_text
-            except Exception as e:
-                LOGGER.error(f"An Google Gemini API error occurred: {e}")
-                raise
+            return prompt
+        return super()._format_messages(prompt)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted,
+                                  google_exceptions.ServerError, google_exceptions.DeadlineExceeded))
+
+    def _reserved_output_tokens(self, kwargs: dict) -> int:
+        config = generation_types.to_generation_config_dict(kwargs.get("generation_config") or {})
+        return kwargs.get("max_output_tokens") or kwargs.get("max_tokens") or config.get("max_output_tokens") or 0
+
+    @staticmethod
+    def _generation_config(kwargs: dict):
+        """
+        Pops generation settings out of `kwargs` and merges them over an explicit
+        `generation_config`.
+        """
+        config = kwargs.pop("generation_config", None)
+        overrides = {}
+        for key in list(kwargs):
+            name = GENERATION_CONFIG_ALIASES.get(key, key)
+            if name in GENERATION_CONFIG_KEYS:
+                overrides[name] = kwargs.pop(key)
+        if isinstance(overrides.get("stop_sequences"), str):
+            overrides["stop_sequences"] = [overrides["stop_sequences"]]
+        if not overrides:
+            return config
+        return {**generation_types.to_generation_config_dict(config or {}), **overrides}
+
+    def _model_for(self, system, cached):
+        if cached is None and system is None:
+            return self.gemini_client
+        key = ("cached", cached.name) if cached is not None else ("system", system)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+        if cached is not None:
+            model = gemini.GenerativeModel.from_cached_content(cached)
         else:
-            raise ValueError("Prompt must be a string")
+            model = gemini.GenerativeModel(self.model, system_instruction=system)
+        with self._models_lock:
+            self._models[key] = model
+            while len(self._models) > MAX_MODELS:
+                self._models.popitem(last=False)
+        return model
+
+    def _request_params(self, messages, kwargs: dict) -> tuple:
+        """
+        Returns (model, contents, generate_kwargs, cached_content). With a context cache, the
+        cacheable prefix is replaced by a cached content handle and only the last turn is sent.
+        """
+        kwargs = dict(kwargs)
+        config = self._generation_config(kwargs)
+        if config is not None:
+            kwargs["generation_config"] = config
+        cached = None
+        if self.context_cache is not None:
+            cached, messages = self.context_cache.resolve(self.model, messages, self._count_message_tokens)
+        system, contents = to_gemini_contents(messages)
+        return self._model_for(system, cached), contents, kwargs, cached
+
+    def _discard_cached(self, cached):
+        self.context_cache.discard(cached)
+        with self._models_lock:
+            self._models.pop(("cached", cached.name), None)
+
+    def _generate(self, messages, kwargs: dict, stream: bool = False):
+        for attempt in range(2):
+            model, contents, params, cached = self._request_params(messages, kwargs)
+            try:
+                return model.generate_content(contents, stream=stream, **params)
+            except google_exceptions.NotFound:
+                # Cached content expired or was deleted server-side; recreate it once.
+                if cached is None or attempt:
+                    raise
+                self._discard_cached(cached)
+
+    async def _agenerate(self, messages, kwargs: dict, stream: bool = False):
+        for attempt in range(2):
+            if self.context_cache is None:
+                model, contents, params, cached = self._request_params(messages, kwargs)
+            else:
+                # Creating or extending cached content is a blocking upload.
+                model, contents, params, cached = await asyncio.to_thread(self._request_params, messages, kwargs)
+            try:
+                return await model.generate_content_async(contents, stream=stream, **params)
+            except google_exceptions.NotFound:
+                if cached is None or attempt:
+                    raise
+                self._discard_cached(cached)
+
+    def _create(self, messages, **kwargs):
+        return self._generate(messages, kwargs)
+
+    async def _acreate(self, messages, **kwargs):
+        return await self._agenerate(messages, kwargs)
+
+    def _parse_response(self, response) -> tuple:
+        return response.text, response.to_dict()['usage_metadata']
+
+    def _create_stream(self, messages, **kwargs):
+        return self._generate(messages, kwargs, stream=True)
+
+    async def _acreate_stream(self, messages, **kwargs):
+        return await self._agenerate(messages, kwargs, stream=True)
+
+    def _parse_stream_event(self, event) -> tuple:
+        # Every chunk carries the running usage totals, so the last one wins.
+        return event.text if event.parts else None, event.to_dict().get('usage_metadata')
         
     @LLM_Base.add_to_cumulative_tokens
     def calculate_tokens(self, *args, **kwargs) -> int:
 
         completion_tokens = kwargs.get('candidates_token_count', 0)
-        prompt_tokens = kwargs.get('prompt_tokens', 0)
+        prompt_tokens = kwargs.get('prompt_token_count', 0)
         total_tokens = kwargs.get('total_token_count', 0)
+        cached_tokens = kwargs.get('cached_content_token_count', 0)
 
-        LOGGER.debug(f"Completion tokens: {completion_tokens}, Prompt tokens: {prompt_tokens}, Total tokens: {total_tokens}")
-        return kwargs
-
-    def set_token_cost(self, cost_per_token: float):
-        cost_per_token = self._validate_cost(cost_per_token)
-        super().set_token_cost(cost_per_token)
+        LOGGER.debug("Completion tokens: %s, Prompt tokens: %s, Total tokens: %s",
+                     completion_tokens, prompt_tokens, total_tokens)
+        # prompt_token_count includes cached content, which is split out to be priced separately.
+        tokens = {'prompt_tokens': prompt_tokens - cached_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': total_tokens}
+        if cached_tokens:
+            tokens['cached_prompt_tokens'] = cached_tokens
+        return tokens
 
 if __name__ == "__main__":
 
@@ -0,0 +1,153 @@
+import threading
+import time
+import weakref
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+# Statuses that say the key or the account is unusable, as opposed to the request being bad.
+AUTH_ERROR_STATUSES = frozenset({401, 403})
+
+@dataclass
+class HealthStatus:
+    healthy: bool
+    source: str
+    checked_at: float
+    error: Optional[str] = None
+    latency: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+class HealthMonitor:
+    """
+    Caches the outcome of a cheap provider probe. A healthy result is reused for `ttl` seconds and
+    an unhealthy one for `failure_ttl`, so readiness checks can poll `check()` freely. Real traffic
+    refreshes the cached status too: every success marks the provider healthy, while
+    `failure_threshold` consecutive failures (or a single authentication error) mark it unhealthy.
+    With `refresh`, the background refresher (see `start`) starts on the first check or request
+    rather than here, so the probe never runs against a half-initialised owner.
+    """
+
+    def __init__(self, probe: Callable[[], None], name: str = "LLM", ttl: float = 60.0,
+                 failure_ttl: float = 10.0, failure_threshold: int = 3, refresh: float = None):
+        self.probe = probe
+        self.name = name
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.failure_threshold = failure_threshold
+        self.refresh = refresh
+        self.probes = 0
+        self._status = None
+        self._expires = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def status(self) -> Optional[HealthStatus]:
+        """
+        Last known status without probing; None until the first probe or request.
+        """
+        return self._status
+
+    def _fresh(self) -> Optional[HealthStatus]:
+        return self._status if time.monotonic() < self._expires else None
+
+    def _set(self, status: HealthStatus):
+        self._status = status
+        self._expires = time.monotonic() + (self.ttl if status.healthy else self.failure_ttl)
+
+    def _ensure_refreshing(self):
+        if self.refresh and self._thread is None:
+            self.start(self.refresh)
+
+    def check(self, force: bool = False) -> HealthStatus:
+        self._ensure_refreshing()
+        status = self._fresh()
+        if status is not None and not force:
+            return status
+        with self._probe_lock:
+            # Concurrent callers wait for one probe instead of each sending their own.
+            status = self._fresh()
+            if status is not None and not force:
+                return status
+            return self._run_probe()
+
+    def _run_probe(self) -> HealthStatus:
+        start = time.perf_counter()
+        error = None
+        try:
+            self.probe()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            LOGGER.error(f"{self.name} health check failed: {e}")
+        status = HealthStatus(error is None, "probe", time.time(), error, time.perf_counter() - start)
+        with self._lock:
+            self.probes += 1
+            self._failures = 0 if status.healthy else self._failures
+            self._set(status)
+        return status
+
+    def record_success(self):
+        self._ensure_refreshing()
+        with self._lock:
+            self._failures = 0
+            self._set(HealthStatus(True, "traffic", time.time()))
+
+    def record_failure(self, error: Exception, fatal: bool = False):
+        self._ensure_refreshing()
+        with self._lock:
+            self._failures += 1
+            if fatal or self._failures >= self.failure_threshold:
+                self._set(HealthStatus(False, "traffic", time.time(), f"{type(error).__name__}: {error}"))
+
+    def start(self, interval: float = None):
+        """
+        Probes in a background thread whenever the cached status would expire before the next
+        tick, so `check()` never blocks on the network. Wrappers with steady traffic are kept fresh
+        by their requests and are not probed at all.
+        """
+        interval = interval or min(self.ttl, self.failure_ttl) / 2
+        monitor_ref = weakref.ref(self)
+        stop = self._stop
+
+        def refresh():
+            while not stop.wait(interval):
+                monitor = monitor_ref()
+                if monitor is None:
+                    return
+                if monitor._expires - time.monotonic() <= interval:
+                    with monitor._probe_lock:
+                        monitor._run_probe()
+                del monitor
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            stop.clear()
+            self._thread = threading.Thread(target=refresh, name=f"grollm-health-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.refresh = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    @property
+    def info(self) -> dict:
+        status = self._status
+        return {
+            **(status.as_dict() if status else {"healthy": None}),
+            "probes": self.probes,
+            "consecutive_failures": self._failures,
+            "fresh": self._fresh() is not None,
+            "refreshing": self._thread is not None and self._thread.is_alive(),
+        }
@@ -0,0 +1,233 @@
+import asyncio
+import bisect
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional
+
+from .base import LLM_Base
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+class LatencyTracker:
+    """
+    Sliding window of the last `window` successful latencies with percentile lookups.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._recent = deque(maxlen=window)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                evicted = self._recent[0]
+                del self._sorted[bisect.bisect_left(self._sorted, evicted)]
+            self._recent.append(latency)
+            bisect.insort(self._sorted, latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._sorted:
+                return None
+            index = min(len(self._sorted) - 1, int(q / 100 * len(self._sorted)))
+            return self._sorted[index]
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+class HedgeBudget:
+    """
+    Credit bucket capping hedges to `max_extra` of primary requests: every primary request earns
+    `max_extra` credits, up to `burst`, and every hedge spends one.
+    """
+
+    def __init__(self, max_extra: float = 0.05, burst: float = 10.0):
+        self.max_extra = max_extra
+        self.burst = burst
+        self._credits = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._credits = min(self.burst, self._credits + self.max_extra)
+
+    def can_spend(self) -> bool:
+        return self._credits >= 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+            return True
+
+class Hedger:
+    """
+    Wraps an LLM instance and fires a duplicate request when the first one has not returned after
+    the `percentile` of recent latencies. The duplicate goes to the next of `alternates`, or to the
+    same instance if none are given. The first successful answer wins.
+
+    Both requests go through the wrappers' own `send_prompt`, so every completed request, winner or
+    loser, is charged to that wrapper's `cumulative_tokens` and `cumulative_cost`. The losing
+    request, sync or async, runs to completion in the background and is charged when it finishes;
+    only cancelling the caller's own async call cancels both. Hedges are sent `fresh`, past the
+    target's caches and request coalescing, so a hedge is always a second upstream request rather
+    than a wait on the first. Hedging starts once `min_samples` latencies have been seen.
+
+    Sync requests that cannot be hedged (too few samples, no budget, or all `max_workers` busy)
+    run on the caller's thread, so the pool never caps concurrency and nothing waits in its queue.
+    Otherwise the primary and the hedge each take a worker that is free at that moment.
+    """
+
+    def __init__(self, llm: LLM_Base, alternates: list = None, percentile: float = 95.0,
+                 min_delay: float = 0.05, max_extra: float = 0.05, burst: float = 10.0,
+                 min_samples: int = 20, window: int = 1000, max_workers: int = 32):
+        self.llm = llm
+        self.alternates = list(alternates or [])
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker(window)
+        self.budget = HedgeBudget(max_extra, burst)
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.denied = 0
+        self.saturated = 0
+        self.max_workers = max_workers
+        self._busy = 0
+        self._next_alternate = 0
+        self._background = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="grollm-hedge")
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self.tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    def _hedge_target(self) -> LLM_Base:
+        if not self.alternates:
+            return self.llm
+        with self._lock:
+            target = self.alternates[self._next_alternate % len(self.alternates)]
+            self._next_alternate += 1
+        return target
+
+    def _should_hedge(self) -> bool:
+        if self.budget.try_spend():
+            with self._lock:
+                self.hedged += 1
+            return True
+        with self._lock:
+            self.denied += 1
+        return False
+
+    def _reserve_worker(self) -> bool:
+        with self._lock:
+            if self._busy >= self.max_workers:
+                self.saturated += 1
+                return False
+            self._busy += 1
+            return True
+
+    def _release_worker(self):
+        with self._lock:
+            self._busy -= 1
+
+    def _timed_send(self, llm: LLM_Base, prompt, kwargs: dict, pooled: bool, track: bool):
+        # Timed from when the request actually starts, so the hedge threshold excludes any wait.
+        start = time.monotonic()
+        try:
+            response = llm.send_prompt(prompt, **kwargs)
+        finally:
+            if pooled:
+                self._release_worker()
+        if track:
+            self.tracker.add(time.monotonic() - start)
+        return response
+
+    def _record_win(self, hedge_won: bool):
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def send_prompt(self, prompt, **kwargs) -> str:
+        self.budget.earn()
+        delay = self.hedge_delay()
+        if delay is None or not self.budget.can_spend() or not self._reserve_worker():
+            return self._timed_send(self.llm, prompt, kwargs, pooled=False, track=True)
+
+        # The tracker sees the primary's full latency even when a hedge wins, so the hedge threshold
+        # follows the real latency distribution rather than the hedged one.
+        primary = self._executor.submit(self._timed_send, self.llm, prompt, kwargs, True, True)
+        if wait([primary], timeout=delay).done or not self._reserve_worker():
+            return primary.result()
+        if not self._should_hedge():
+            self._release_worker()
+            return primary.result()
+
+        target = self._hedge_target()
+        LOGGER.debug("Hedging request to %s after %.3fs.", target.provider_name, delay)
+        hedge = self._executor.submit(self._timed_send, target, prompt, {**kwargs, "fresh": True}, True, False)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The loser is left to finish: it is already running, and cancelling it before
+                    # it starts would skip releasing its worker.
+                    self._record_win(future is hedge)
+                    return future.result()
+        return primary.result()
+
+    async def asend_prompt(self, prompt, **kwargs) -> str:
+        self.budget.earn()
+        delay = self.hedge_delay()
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self.llm.asend_prompt(prompt, **kwargs))
+        primary.add_done_callback(
+            lambda t: not t.cancelled() and t.exception() is None and self.tracker.add(time.monotonic() - start))
+
+        tasks = [primary]
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not self._should_hedge():
+                return await primary
+
+            target = self._hedge_target()
+            LOGGER.debug("Hedging request to %s after %.3fs.", target.provider_name, delay)
+            hedge = asyncio.ensure_future(target.asend_prompt(prompt, **{**kwargs, "fresh": True}))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record_win(task is hedge)
+                        # The loser keeps running so that its usage is charged, as on the sync path.
+                        for loser in pending:
+                            self._background.add(loser)
+                            loser.add_done_callback(self._loser_done)
+                        return task.result()
+            return await primary
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def _loser_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.debug("Losing hedged request failed: %s", task.exception())
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hedged": self.hedged, "hedge_wins": self.hedge_wins, "denied": self.denied,
+                    "saturated": self.saturated, "busy_workers": self._busy, "hedge_delay": self.hedge_delay()}
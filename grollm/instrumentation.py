@@ -0,0 +1,466 @@
+import contextvars
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from .usage import flatten_usage
+
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TTFT_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800, 1600)
+
+# Usage keys reported as gen_ai.usage.* span attributes; the rest go under grollm.usage.*.
+USAGE_ATTRIBUTES = {"prompt_tokens": "gen_ai.usage.input_tokens", "completion_tokens": "gen_ai.usage.output_tokens"}
+
+_current_span = contextvars.ContextVar("grollm_span", default=None)
+_active = None
+
+def current_span():
+    """
+    Span of the request running in this context, or None when instrumentation is off.
+    """
+    return _current_span.get()
+
+def get_instrumentation():
+    return _active
+
+def enable_instrumentation(exporters: list = None, tracer=None, registry: "MetricsRegistry" = None) -> "Instrumentation":
+    """
+    Turns on spans and metrics for every wrapper in the process. `exporters` receive each finished
+    span (see InMemorySpanExporter); `tracer` is an optional OpenTelemetry tracer that gets a
+    matching CLIENT span per request.
+    """
+    global _active
+    _active = Instrumentation(exporters=exporters, tracer=tracer, registry=registry)
+    return _active
+
+def disable_instrumentation():
+    global _active
+    _active = None
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: tuple, value) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+
+    kind = "counter"
+
+    def inc(self, labels: dict, value: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+class Gauge(Counter):
+
+    kind = "gauge"
+
+    def set(self, labels: dict, value: float):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: dict, value: float):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _render_sample(self, key: tuple, state) -> list:
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket
+            le = 'le="%s"' % ("+Inf" if bound == float("inf") else _format_value(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus-style metrics store. `render()` returns the text exposition format, which
+    `serve()` exposes on /metrics for scraping.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                payload = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="grollm-metrics", daemon=True).start()
+        return server
+
+class Span:
+
+    __slots__ = ("name", "attributes", "usage", "start_time", "end_time", "first_token_time", "error", "_otel")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.usage = {}
+        self.start_time = time.time()
+        self.end_time = None
+        self.first_token_time = None
+        self.error = None
+        self._otel = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def increment(self, key: str, value: int = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def add_usage(self, usage: dict):
+        for key, value in flatten_usage(usage).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.usage[key] = self.usage.get(key, 0) + value
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first_token_time is None else self.first_token_time - self.start_time
+
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, duration={self.duration}, attributes={self.attributes})"
+
+class InMemorySpanExporter:
+    """
+    Keeps finished spans in a list, for tests and debugging.
+    """
+
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self) -> list:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+class Instrumentation:
+    """
+    Wraps wrapper calls in spans and records Prometheus-style metrics when they finish. Request
+    code only ever looks the active span up through `current_span()`, so with instrumentation
+    disabled the cost is a context variable read.
+    """
+
+    def __init__(self, exporters: list = None, tracer=None, registry: MetricsRegistry = None):
+        self.exporters = list(exporters or [])
+        self.tracer = tracer
+        self.registry = registry or MetricsRegistry()
+        self._otel = None
+        if tracer is not None:
+            from opentelemetry import trace
+
+            self._otel = trace
+
+        labels = ("provider", "model")
+        r = self.registry
+        self.requests = r.counter("grollm_requests_total", "Requests by operation and outcome.",
+                                  labels + ("operation", "status"))
+        self.errors = r.counter("grollm_request_errors_total", "Failed requests by exception class.",
+                                labels + ("operation", "error"))
+        self.latency = r.histogram("grollm_request_duration_seconds", "Request latency.", labels + ("operation",))
+        self.ttft = r.histogram("grollm_time_to_first_token_seconds", "Time to the first streamed token.",
+                                labels, TTFT_BUCKETS)
+        self.tokens_per_second = r.histogram("grollm_output_tokens_per_second", "Output tokens per second.",
+                                             labels, TOKENS_PER_SECOND_BUCKETS)
+        self.in_flight = r.gauge("grollm_requests_in_flight", "Requests currently in flight.", labels)
+        self.tokens = r.counter("grollm_tokens_total", "Tokens billed, by type.", labels + ("type",))
+        self.retries = r.counter("grollm_retries_total", "Retried provider calls.", labels)
+        self.cache = r.counter("grollm_cache_lookups_total", "Response cache lookups by result.",
+                               labels + ("result",))
+
+    def start(self, llm, operation: str) -> Span:
+        span = Span(f"grollm.{operation}", {"gen_ai.system": llm.provider_name,
+                                             "gen_ai.request.model": llm.model,
+                                             "grollm.operation": operation})
+        if self._otel is not None:
+            span._otel = self.tracer.start_span(span.name, kind=self._otel.SpanKind.CLIENT,
+                                                attributes=dict(span.attributes))
+        self.in_flight.inc(self._labels(span))
+        return span
+
+    @staticmethod
+    def _labels(span: Span) -> dict:
+        return {"provider": span.attributes["gen_ai.system"], "model": span.attributes["gen_ai.request.model"]}
+
+    def finish(self, span: Span, error: BaseException = None):
+        span.end_time = time.time()
+        labels = self._labels(span)
+        operation = span.attributes["grollm.operation"]
+        self.in_flight.inc(labels, -1)
+
+        if error is not None:
+            span.error = error
+            span.attributes["error.type"] = type(error).__name__
+            self.errors.inc({**labels, "operation": operation, "error": type(error).__name__})
+        self.requests.inc({**labels, "operation": operation, "status": "error" if error is not None else "ok"})
+        self.latency.observe({**labels, "operation": operation}, span.duration)
+
+        for key, value in span.usage.items():
+            span.attributes[USAGE_ATTRIBUTES.get(key, f"grollm.usage.{key}")] = value
+            if key.endswith("_tokens") and "." not in key:
+                self.tokens.inc({**labels, "type": key[:-len("_tokens")]}, value)
+        if span.attributes.get("grollm.retries"):
+            self.retries.inc(labels, span.attributes["grollm.retries"])
+        if "grollm.cache" in span.attributes:
+            self.cache.inc({**labels, "result": span.attributes["grollm.cache"]})
+
+        ttft = span.time_to_first_token
+        if ttft is not None:
+            span.attributes["grollm.time_to_first_token"] = ttft
+            self.ttft.observe(labels, ttft)
+        output_tokens = span.usage.get("completion_tokens")
+        generating = span.end_time - (span.first_token_time or span.start_time)
+        if output_tokens and generating > 0:
+            self.tokens_per_second.observe(labels, output_tokens / generating)
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                LOGGER.error(f"Span exporter {type(exporter).__name__} failed: {e}")
+        if span._otel is not None:
+            self._end_otel(span)
+
+    def _end_otel(self, span: Span):
+        otel_span = span._otel
+        otel_span.set_attributes({key: value for key, value in span.attributes.items()
+                                  if isinstance(value, (str, bool, int, float))})
+        if span.error is not None:
+            otel_span.record_exception(span.error)
+            otel_span.set_status(self._otel.Status(self._otel.StatusCode.ERROR, str(span.error)))
+        otel_span.end()
+
+    @contextmanager
+    def activate(self, span: Span):
+        """
+        Makes `span` current for retry and cache bookkeeping, and for OpenTelemetry children such
+        as HTTP client spans.
+        """
+        token = _current_span.set(span)
+        try:
+            if span._otel is None:
+                yield span
+            else:
+                with self._otel.use_span(span._otel, end_on_exit=False, record_exception=False,
+                                         set_status_on_exception=False):
+                    yield span
+        finally:
+            _current_span.reset(token)
+
+    @contextmanager
+    def request(self, llm, operation: str):
+        span = self.start(llm, operation)
+        try:
+            with self.activate(span):
+                yield span
+        except BaseException as e:
+            self.finish(span, e)
+            raise
+        self.finish(span)
+
+    def stream(self, llm, operation: str, chunks, first_token: bool = True):
+        """
+        Instruments a generator. The span is only made current while the generator runs, never
+        across a yield, so it cannot leak into the consumer's context. With `first_token` the
+        first item's arrival is recorded as the time to first token.
+        """
+        span = self.start(llm, operation)
+        error = None
+        try:
+            while True:
+                with self.activate(span):
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                if first_token and span.first_token_time is None:
+                    span.first_token_time = time.time()
+                yield chunk
+        except GeneratorExit:
+            # The consumer stopped reading; not a failure.
+            span.set_attribute("grollm.cancelled", True)
+            chunks.close()
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish(span, error)
+
+    async def astream(self, llm, operation: str, chunks, first_token: bool = True):
+        span = self.start(llm, operation)
+        error = None
+        try:
+            while True:
+                with self.activate(span):
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        return
+                if first_token and span.first_token_time is None:
+                    span.first_token_time = time.time()
+                yield chunk
+        except GeneratorExit:
+            span.set_attribute("grollm.cancelled", True)
+            await chunks.aclose()
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish(span, error)
+
+def instrumented(operation: str, first_token: bool = True):
+    """
+    Runs a wrapper method inside a span named after `operation` when instrumentation is enabled.
+    Handles plain methods, coroutines, generators and async generators; when disabled the only
+    cost is one extra call.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                instrumentation = _active
+                if instrumentation is None:
+                    return await func(self, *args, **kwargs)
+                with instrumentation.request(self, operation):
+                    return await func(self, *args, **kwargs)
+        elif inspect.isasyncgenfunction(func):
+            @wraps(func)
+            def wrapper(self, *args, **kwargs):
+                instrumentation = _active
+                if instrumentation is None:
+                    return func(self, *args, **kwargs)
+                return instrumentation.astream(self, operation, func(self, *args, **kwargs), first_token)
+        elif inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def wrapper(self, *args, **kwargs):
+                instrumentation = _active
+                if instrumentation is None:
+                    return func(self, *args, **kwargs)
+                return instrumentation.stream(self, operation, func(self, *args, **kwargs), first_token)
+        else:
+            @wraps(func)
+            def wrapper(self, *args, **kwargs):
+                instrumentation = _active
+                if instrumentation is None:
+                    return func(self, *args, **kwargs)
+                with instrumentation.request(self, operation):
+                    return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
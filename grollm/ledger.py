@@ -0,0 +1,362 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, defaultdict
+
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+LEDGER_SCOPES = ("local", "host")
+
+# SQLite keeps per-process state for each database file, its global mutexes and the file locks
+# held by this process's connections, and a forked worker inherits it as it is. Forked while a
+# thread here was opening a connection or inside a transaction, the worker's own writer hangs or
+# finds the database locked for good. Connections are opened, used and closed under this lock,
+# and forking waits for it. It is never held while waiting for another process: a busy database
+# is retried with the lock released (`UsageLedger._locked`).
+_fork_lock = threading.Lock()
+
+class _Connection(sqlite3.Connection):
+    # sqlite3.Connection itself cannot be weakly referenced.
+    pass
+
+_connections = weakref.WeakSet()
+
+def _after_fork_in_child():
+    # The parent's connections are unusable in the worker, and while they stay open SQLite counts
+    # their file locks as held by this process, so the worker's own connections would skip taking
+    # them and the parent could delete the WAL under the worker. None is mid-call: the fork lock
+    # was held across the fork.
+    for conn in list(_connections):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _fork_lock.release()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_fork_lock.acquire, after_in_parent=_fork_lock.release,
+                        after_in_child=_after_fork_in_child)
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+class UsageLedger:
+    """
+    Host-wide token and cost totals shared by every process that opens the same file. Recording
+    a request only queues it; a background thread per process sums what is queued and appends
+    one row per (provider, model, key) to a WAL-mode SQLite log every `flush_interval` seconds,
+    so workers never wait on each other. Every `compact_interval` seconds one writer folds the
+    log into a totals table. Reads sum both tables, see other processes' usage up to
+    `flush_interval` late, and are cached for `read_ttl` seconds. Workers may be forked at any
+    time; a busy database is retried for up to `busy_timeout` seconds.
+    """
+
+    def __init__(self, path: str = os.path.join("logs", "grollm_ledger.db"), flush_interval: float = 1.0,
+                 compact_interval: float = 300.0, read_ttl: float = 1.0, max_queue: int = 100_000,
+                 busy_timeout: float = 30.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.read_ttl = read_ttl
+        self.max_queue = max_queue
+        self.busy_timeout = busy_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.compactions = 0
+        self._start_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._reads = {}
+        self._reader = None
+        self._reader_pid = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            self._locked(conn, self._create_tables)
+        finally:
+            self._close(conn)
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_log (id INTEGER PRIMARY KEY, recorded REAL NOT NULL, "
+            "provider TEXT NOT NULL, model TEXT NOT NULL, key TEXT NOT NULL, "
+            "tokens REAL NOT NULL, cost REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_totals (provider TEXT NOT NULL, model TEXT NOT NULL, "
+            "key TEXT NOT NULL, tokens REAL NOT NULL, cost REAL NOT NULL, PRIMARY KEY (provider, model, key))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS ledger_meta (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # SQLite itself never waits on a busy database; `_locked` does, without the fork lock.
+        with _fork_lock:
+            conn = sqlite3.connect(self.path, timeout=0, check_same_thread=False, isolation_level=None,
+                                   factory=_Connection)
+            _connections.add(conn)
+        # Even a pragma can find the database busy while another process opens the WAL.
+        try:
+            self._locked(conn, lambda conn: conn.execute("PRAGMA synchronous=NORMAL"))
+        except BaseException:
+            self._close(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _close(conn: sqlite3.Connection):
+        with _fork_lock:
+            conn.close()
+
+    def _locked(self, conn: sqlite3.Connection, work, write: bool = False):
+        """
+        Returns `work(conn)`, run under the fork lock and, with `write`, in one write transaction.
+        While another process holds the database the attempt is repeated, with the lock released in
+        between, for up to `busy_timeout` seconds.
+        """
+        deadline = time.monotonic() + self.busy_timeout
+        delay = 0.001
+        while True:
+            with _fork_lock:
+                try:
+                    if not write:
+                        return work(conn)
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        result = work(conn)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    return result
+                except sqlite3.OperationalError as e:
+                    if not _is_busy(e) or time.monotonic() >= deadline:
+                        raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def record(self, provider: str, model: str, tokens: dict, prices: dict = None):
+        """
+        Queues one request's usage. Cost is charged from `prices` by the writer thread.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((provider, model, tokens, prices))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        # A worker forked from a parent that already used the ledger inherits neither its thread
+        # nor a usable connection, so each process starts its own writer.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.written = self.dropped = self.failed = self.compactions = 0
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, name="grollm-ledger", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+                atexit.register(self.close)
+
+    def _run(self):
+        conn = self._connect()
+        pending = defaultdict(lambda: [0.0, 0.0])
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                self._write(conn, pending)
+                item.set()
+            elif item is not None:
+                provider, model, tokens, prices = item
+                for key, value in tokens.items():
+                    totals = pending[(provider, model, key)]
+                    totals[0] += value
+                    if prices and prices.get(key):
+                        totals[1] += value * prices[key]
+
+            if time.monotonic() >= deadline:
+                self._write(conn, pending)
+                self._maybe_compact(conn)
+                deadline = time.monotonic() + self.flush_interval
+
+            if self._stop.is_set() and self._queue.empty():
+                self._write(conn, pending)
+                self._close(conn)
+                return
+
+    def _write(self, conn: sqlite3.Connection, pending: dict):
+        if not pending:
+            return
+        now = time.time()
+        rows = [(now, provider, model, key, tokens, cost) for (provider, model, key), (tokens, cost) in pending.items()]
+        try:
+            self._locked(conn, lambda conn: conn.executemany(
+                "INSERT INTO usage_log (recorded, provider, model, key, tokens, cost) VALUES (?, ?, ?, ?, ?, ?)", rows
+            ), write=True)
+            self.written += len(rows)
+            pending.clear()
+        except sqlite3.Error as e:
+            # Kept in `pending` and retried on the next flush.
+            self.failed += 1
+            LOGGER.error(f"Failed to write {len(rows)} usage rows to {self.path}: {e}")
+
+    def _maybe_compact(self, conn: sqlite3.Connection):
+        try:
+            row = self._locked(conn, self._last_compacted)
+            if row is not None and time.time() - row[0] < self.compact_interval:
+                return
+            self.compact(conn)
+        except sqlite3.Error as e:
+            LOGGER.warning(f"Usage ledger compaction failed: {e}")
+
+    def compact(self, conn: sqlite3.Connection = None):
+        """
+        Folds the log into the totals table. Safe to run from any process at any time: it happens
+        in one write transaction, and a process that finds another one has just compacted skips it.
+        """
+        own = conn is None
+
+        def fold(conn: sqlite3.Connection) -> bool:
+            row = self._last_compacted(conn)
+            if not own and row is not None and time.time() - row[0] < self.compact_interval:
+                return False
+            (last_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM usage_log").fetchone()
+            conn.execute(
+                "INSERT INTO usage_totals (provider, model, key, tokens, cost) "
+                "SELECT provider, model, key, SUM(tokens), SUM(cost) FROM usage_log WHERE id <= ? "
+                "GROUP BY provider, model, key "
+                "ON CONFLICT (provider, model, key) DO UPDATE SET "
+                "tokens = tokens + excluded.tokens, cost = cost + excluded.cost", (last_id,)
+            )
+            conn.execute("DELETE FROM usage_log WHERE id <= ?", (last_id,))
+            conn.execute("INSERT OR REPLACE INTO ledger_meta (name, value) VALUES ('compacted', ?)", (time.time(),))
+            return True
+
+        conn = conn or self._connect()
+        try:
+            if self._locked(conn, fold, write=True):
+                self.compactions += 1
+        finally:
+            if own:
+                self._close(conn)
+
+    @staticmethod
+    def _last_compacted(conn: sqlite3.Connection):
+        return conn.execute("SELECT value FROM ledger_meta WHERE name = 'compacted'").fetchone()
+
+    def totals(self, provider: str = None, model: str = None) -> tuple:
+        """
+        Host-wide (tokens, cost) Counters, optionally for one provider and model. Each call returns
+        new Counters, so callers cannot change the cached totals.
+        """
+        cache_key = (provider, model)
+        now = time.monotonic()
+        with self._read_lock:
+            cached = self._reads.get(cache_key)
+            if cached is not None and now - cached[0] < self.read_ttl:
+                return Counter(cached[1]), Counter(cached[2])
+            if self._reader_pid != os.getpid():
+                self._reader = self._connect()
+                self._reader_pid = os.getpid()
+            where, params = "", ()
+            if provider is not None:
+                where, params = " WHERE provider = ? AND model = ?", (provider, model)
+            rows = self._locked(self._reader, lambda conn: conn.execute(
+                "SELECT key, SUM(tokens), SUM(cost) FROM ("
+                f"SELECT key, tokens, cost FROM usage_totals{where} UNION ALL "
+                f"SELECT key, tokens, cost FROM usage_log{where}) GROUP BY key", params * 2
+            ).fetchall())
+            tokens, cost = Counter(), Counter()
+            for key, key_tokens, key_cost in rows:
+                tokens[key] = int(key_tokens) if float(key_tokens).is_integer() else key_tokens
+                if key_cost:
+                    cost[key] = key_cost
+            self._reads[cache_key] = (now, tokens, cost)
+            return Counter(tokens), Counter(cost)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Writes out this process's queued usage, so `totals()` includes it on its next read.
+        """
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        with self._read_lock:
+            self._reads.clear()
+        return done.wait(timeout)
+
+    def reset(self):
+        """
+        Deletes every recorded row, for all processes.
+        """
+        self.flush()
+        conn = self._connect()
+        try:
+            self._locked(conn, self._delete_all, write=True)
+        finally:
+            self._close(conn)
+        with self._read_lock:
+            self._reads.clear()
+
+    @staticmethod
+    def _delete_all(conn: sqlite3.Connection):
+        conn.execute("DELETE FROM usage_log")
+        conn.execute("DELETE FROM usage_totals")
+
+    def close(self, timeout: float = 10.0):
+        with self._read_lock:
+            if self._reader_pid == os.getpid():
+                self._close(self._reader)
+                self._reader_pid = None
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        try:
+            # Wakes the writer now rather than at its next flush deadline.
+            self._queue.put_nowait(threading.Event())
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._pid = None
+
+    @property
+    def stats(self) -> dict:
+        queued = self._queue.qsize() if self._pid == os.getpid() else 0
+        return {"written": self.written, "dropped": self.dropped, "failed": self.failed,
+                "compactions": self.compactions, "queued": queued}
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+def get_ledger(path: str = os.path.join("logs", "grollm_ledger.db")) -> UsageLedger:
+    """
+    One ledger, and so one writer thread, per file per process.
+    """
+    with _ledgers_lock:
+        ledger = _ledgers.get(path)
+        if ledger is None:
+            ledger = _ledgers[path] = UsageLedger(path)
+        return ledger
@@ -1,18 +1,17 @@
 import os
 import sys
-import yaml
+import queue
+import atexit
+import threading
 import logging, logging.handlers
 from pathlib import Path
 
-import coloredlogs
-
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[1]  # project root directory
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))  # add ROOT to PATH
 
 from .constants import Constants
-os.makedirs(Constants.LOGS_FOLDER.value, exist_ok=True)
 
 SUCCESS = logging.ERROR + 10
 logging.addLevelName(SUCCESS, "SUCCESS")
@@ -23,59 +22,177 @@ def success(self, message, *args, **kws):
 
 logging.Logger.success = success
 
+PACKAGE_LOGGER = "grollm"
 
 file_loc = os.path.join(Constants.LOGS_FOLDER.value, Constants.LOGS_FILE.value)
 
-# Create a ColoredFormatter instance and set color codes
-colored_formatter = coloredlogs.ColoredFormatter(
-    fmt="%(asctime)s -- %(levelname)s -- %(name)s -- %(funcName)s -- (%(lineno)d) -- %(message)s",
-    datefmt='%Y-%m-%d %H:%M:%S',
-    level_styles={
-        'debug': {'color': 'white'},
-        'info': {'color': 'green'},
-        'warning': {'color': 'yellow'},
-        'success': {'color': 'green', 'bold': True},
-        'error': {'color': 'white', 'bold': True, 'background': 'red'}
-    },
-    field_styles={
-        'asctime': {'color': 'white'},
-        'levelname': {'color': 'black', 'bold': True},
-        'message': {'color': 'white'},
-    }
-)
-
-def get_logger(name):
-    log_level = Constants.LOG_LEVEL.value
-    LOGGER = logging.getLogger(name)
-    eval("LOGGER.setLevel(logging.{0})".format(log_level))
-
-    # Remove any existing handlers to avoid duplication
-    for handler in LOGGER.handlers:
-        LOGGER.removeHandler(handler)
-
-    handler_file = logging.handlers.RotatingFileHandler(
-        file_loc,
-        mode="a",
-        maxBytes=10 * 1024 * 1024,
-        backupCount=50,
-        encoding=None,
-        delay=0,
-    )
-
-    log_formatter = logging.Formatter(
-        "%(asctime)s -- %(levelname)s -- %(name)s -- %(funcName)s -- (%(lineno)d) -- %(message)s"
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+_payload_limit = Constants.LOG_PAYLOAD_CHARS.value
+
+def get_log_level() -> str:
+    return os.getenv(Constants.LOG_LEVEL_ENV.value, Constants.LOG_LEVEL.value).upper()
+
+def _parse_log_level() -> tuple:
+    """
+    Returns (level, error); an unknown level name falls back to the default.
+    """
+    level = get_log_level()
+    if isinstance(logging.getLevelName(level), int):
+        return level, None
+    return Constants.LOG_LEVEL.value, f"Ignoring {Constants.LOG_LEVEL_ENV.value}={level!r}: not a logging level name."
+
+def _parse_payload_limit() -> tuple:
+    """
+    Returns (limit, error); a missing, malformed or negative setting falls back to the default.
+    """
+    raw = os.getenv(Constants.LOG_PAYLOAD_CHARS_ENV.value)
+    if raw is None:
+        return Constants.LOG_PAYLOAD_CHARS.value, None
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        return Constants.LOG_PAYLOAD_CHARS.value, f"Ignoring {Constants.LOG_PAYLOAD_CHARS_ENV.value}={raw!r}: expected a non-negative integer."
+    return limit, None
+
+def get_payload_limit() -> int:
+    # Read from the environment once, by setup_logging, rather than on every logged request.
+    return _payload_limit
+
+def _shorten(value, budget: int) -> tuple:
+    """
+    Returns (copy, size): a copy of `value` whose strings are cut so that together they stay within
+    `budget` characters, and containers stop at the first item past the budget. The work done is
+    bounded by the budget rather than by the size of `value`.
+    """
+    if isinstance(value, str):
+        return (value, len(value)) if len(value) <= budget else (value[:budget] + "...", budget)
+    if isinstance(value, (list, tuple, dict)):
+        items, used = [], 0
+        for item in (value.items() if isinstance(value, dict) else value):
+            if used >= budget:
+                items.append(("...", "...") if isinstance(value, dict) else "...")
+                break
+            if isinstance(value, dict):
+                shortened, size = _shorten(item[1], budget - used)
+                items.append((item[0], shortened))
+            else:
+                shortened, size = _shorten(item, budget - used)
+                items.append(shortened)
+            # Roughly the quotes and separators str() adds around each item.
+            used += size + 4
+        return (dict(items) if isinstance(value, dict) else items), used
+    return value, 0
+
+class truncated:
+    """
+    Defers rendering a prompt or response until a record is actually emitted, and caps the
+    rendered text at `limit` characters. Use as a %-style argument:
+    `LOGGER.debug("Messages: %s", truncated(messages))`.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit: int = None):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        limit = get_payload_limit() if self.limit is None else self.limit
+        value = self.value
+        if isinstance(value, str):
+            if len(value) > limit:
+                return f"{value[:limit]}... [{len(value) - limit} more chars]"
+            return value
+        text = str(_shorten(value, limit)[0])
+        return text if len(text) <= limit else f"{text[:limit]}... [truncated]"
+
+def _colored_formatter():
+    import coloredlogs
+
+    # Create a ColoredFormatter instance and set color codes
+    return coloredlogs.ColoredFormatter(
+        fmt="%(asctime)s -- %(levelname)s -- %(name)s -- %(funcName)s -- (%(lineno)d) -- %(message)s",
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level_styles={
+            'debug': {'color': 'white'},
+            'info': {'color': 'green'},
+            'warning': {'color': 'yellow'},
+            'success': {'color': 'green', 'bold': True},
+            'error': {'color': 'white', 'bold': True, 'background': 'red'}
+        },
+        field_styles={
+            'asctime': {'color': 'white'},
+            'levelname': {'color': 'black', 'bold': True},
+            'message': {'color': 'white'},
+        }
     )
 
-    handler_file.setFormatter(log_formatter)
-    eval("handler_file.setLevel(logging.{0})".format(log_level))
-
-    LOGGER.addHandler(handler_file)
+def setup_logging():
+    """
+    Configures the package logger. Runs once, on first wrapper construction, so importing grollm
+    neither creates the logs folder nor opens the log file. Records are handed to a QueueHandler
+    and written to the file and console by a QueueListener thread, off the request path. The
+    QueueHandler renders each message on the calling thread, so the record no longer refers to
+    the caller's messages when the caller goes on to change them; payloads are kept cheap to render
+    by `truncated`.
+    """
+    global _configured, _listener
+
+    with _configure_lock:
+        if _configured:
+            return
+
+        global _payload_limit
+        _payload_limit, payload_limit_error = _parse_payload_limit()
+
+        log_level, log_level_error = _parse_log_level()
+        LOGGER = logging.getLogger(PACKAGE_LOGGER)
+        LOGGER.setLevel(log_level)
+
+        # Remove any existing handlers to avoid duplication
+        for handler in list(LOGGER.handlers):
+            LOGGER.removeHandler(handler)
+
+        os.makedirs(Constants.LOGS_FOLDER.value, exist_ok=True)
+        handler_file = logging.handlers.RotatingFileHandler(
+            file_loc,
+            mode="a",
+            maxBytes=10 * 1024 * 1024,
+            backupCount=50,
+            encoding=None,
+            delay=0,
+        )
+
+        log_formatter = logging.Formatter(
+            "%(asctime)s -- %(levelname)s -- %(name)s -- %(funcName)s -- (%(lineno)d) -- %(message)s"
+        )
+
+        handler_file.setFormatter(log_formatter)
+        handler_file.setLevel(log_level)
+
+        colored_handler = logging.StreamHandler(sys.stdout)
+        
+        colored_handler.setFormatter(_colored_formatter())
+        colored_handler.setLevel(log_level)
+
+        log_queue = queue.SimpleQueue()
+        LOGGER.addHandler(logging.handlers.QueueHandler(log_queue))
+        LOGGER.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, handler_file, colored_handler,
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        _configured = True
+        for error in (log_level_error, payload_limit_error):
+            if error:
+                LOGGER.warning(error)
 
-    colored_handler = logging.StreamHandler(sys.stdout)
-    
-    colored_handler.setFormatter(colored_formatter)
-    eval("colored_handler.setLevel(logging.{0})".format(log_level))
-    LOGGER.addHandler(colored_handler)
-    LOGGER.propagate = False
-
-    return LOGGER
+def get_logger(name):
+    # Module loggers propagate to the package logger, whose handlers setup_logging attaches.
+    return logging.getLogger(name)
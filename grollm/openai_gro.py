@@ -1,16 +1,21 @@
 import os
-from dotenv import load_dotenv
 
 import openai
 from openai import OpenAIError, AuthenticationError
 
 from .base import LLM_Base
 
+from .batch_jobs import openai_batch_results, openai_parse_batch_result, openai_retrieve_batch, openai_submit_batch
+from .cache import CacheBackend
+from .clients import ClientConfig
 from .cost_manager import CostStore
+from .ledger import UsageLedger
+from .retry import RetryPolicy, http_error_is_retryable
+from .semantic_cache import SemanticCache
+from .tokenizers import count_openai_tokens
 
 from .logger import get_logger
-
-load_dotenv()
+from .utils import load_env
 
 LOGGER = get_logger(__name__)
 
@@ -18,91 +23,164 @@ pricing_details = {
     "gpt-4o": {
         "prompt_tokens": 5.00 / 1000000,
         "completion_tokens": 15.00 / 1000000,
+        "cached_prompt_tokens": 2.50 / 1000000,
+        "batch_prompt_tokens": 2.50 / 1000000,
+        "batch_completion_tokens": 7.50 / 1000000,
+        "max_context": 128000,
     },
     "gpt-4o-mini": {
         "prompt_tokens": 0.150 / 1_000000,
         "completion_tokens": 0.600 / 1000000,
+        "cached_prompt_tokens": 0.075 / 1000000,
+        "batch_prompt_tokens": 0.075 / 1000000,
+        "batch_completion_tokens": 0.30 / 1000000,
+        "max_context": 128000,
     },
     "gpt-4-turbo": {
         "prompt_tokens": 10.00 / 1000000,
         "completion_tokens": 30.00 / 1000000,
+        "batch_prompt_tokens": 5.00 / 1000000,
+        "batch_completion_tokens": 15.00 / 1000000,
+        "max_context": 128000,
     },
     "gpt-4": {
         "prompt_tokens": 30.00 / 1000000,
         "completion_tokens": 60.00 / 1000000,
+        "batch_prompt_tokens": 15.00 / 1000000,
+        "batch_completion_tokens": 30.00 / 1000000,
+        "max_context": 8192,
     },
     "gpt-4-32k": {
         "prompt_tokens": 60.00 / 1000000,
         "completion_tokens": 120.00 / 1000000,
+        "batch_prompt_tokens": 30.00 / 1000000,
+        "batch_completion_tokens": 60.00 / 1000000,
+        "max_context": 32768,
     },
     "gpt-3.5-turbo": {
         "prompt_tokens": 0.50 / 1000000,
         "completion_tokens": 1.50 / 1000000,
+        "batch_prompt_tokens": 0.25 / 1000000,
+        "batch_completion_tokens": 0.75 / 1000000,
+        "max_context": 16385,
     },
 }
 
 cs = CostStore(pricing_details)
 
+# Per-model {"rpm": ..., "tpm": ...} quotas, shared by every instance in the process.
+# Left empty since quotas depend on the account tier; fill in or pass `rate_limit=` to enable.
+rate_limits = {}
+
 class OpenAI_Grollm(LLM_Base):
-    
-    def __init__(self, api_key: str = os.getenv('OPENAI_API_KEY'), 
-                 db_uri: str = os.getenv('MLFLOW_DB_URI'),
+
+    provider_name = "OpenAI"
+    api_error = OpenAIError
+
+    def __init__(self, api_key: str = None, 
+                 db_uri: str = None,
                  mlflow_flag: bool = False,
                  experiment_name: str = "LLM_Experiments_OPENAI", model: str = "gpt-3.5-turbo",
-                 cost_store: CostStore = cs):
-        
-        super().__init__(api_key=api_key, db_uri=db_uri, mlflow_flag=mlflow_flag, experiment_name=experiment_name)
+                 cost_store: CostStore = cs,
+                 rate_limit: dict = None,
+                 retry_policy: RetryPolicy = None,
+                 cache: CacheBackend = None,
+                 client_config: ClientConfig = None,
+                 context_policy: str = None,
+                 coalesce: bool = False,
+                 semantic_cache: SemanticCache = None,
+                 base_url: str = None,
+                 health_ttl: float = 60.0,
+                 health_refresh: float = None,
+                 ledger: UsageLedger = None,
+                 usage_scope: str = "local"):
+
+        load_env()
+        api_key = api_key or os.getenv('OPENAI_API_KEY')
+        super().__init__(api_key=api_key, db_uri=db_uri, mlflow_flag=mlflow_flag, experiment_name=experiment_name,
+                         rate_limit=rate_limit or rate_limits.get(model), retry_policy=retry_policy,
+                         cache=cache, client_config=client_config, context_policy=context_policy,
+                         coalesce=coalesce, semantic_cache=semantic_cache, health_ttl=health_ttl,
+                         health_refresh=health_refresh, ledger=ledger, usage_scope=usage_scope)
         self.model = model
-        openai.api_key = os.getenv('OPENAI_API_KEY', api_key)
+        self.base_url = base_url or os.getenv('OPENAI_BASE_URL')
         self.cost_store = cost_store
         self._validate_cost(pricing_details.get(model, {}))
 
-    def _check_api_key_health(self) -> bool:
+    def _probe_health(self):
         try:
-            openai.models.list()
-            return True
+            self.client.models.retrieve(self.model)
         except AuthenticationError:
             LOGGER.error("Authentication error: Invalid API key.")
             LOGGER.error("Please check your API key and update it in .env file present at the root directory of grollm.")
-            return False
-        except OpenAIError as e:
-            LOGGER.error(f"An error occurred while checking API key health: {e}")
-            return False
-
-    def send_prompt(self, prompt, **kwargs) -> str:
-        if isinstance(prompt, str):
-            messages = [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        elif isinstance(prompt, list) and all(isinstance(m, dict) for m in prompt):
-            messages = prompt
-        else:
-            raise ValueError("Prompt must be a string or a list of message dictionaries.")
-
-        try:
-            LOGGER.info("Sending request to OpenAI API.")
-            LOGGER.debug(f"Model: {self.model}")
-            LOGGER.debug(f"Messages: {messages}")
-
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                **kwargs
-            )
-
-            response_text = response.choices[0].message.content
-            tokens_used = self.calculate_tokens(**response.usage.to_dict())
-            self.add_to_cumulative_tokens(tokens_used)
-
-            LOGGER.info("Received response from OpenAI API.")
-            LOGGER.debug(f"Response: {response_text}")
-            return response_text
-
-        except OpenAIError as e:
-            LOGGER.error(f"An OpenAI API error occurred: {e}")
             raise
-    
+
+    def _build_client(self, http_client) -> openai.OpenAI:
+        return openai.OpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+
+    def _build_async_client(self, http_client) -> openai.AsyncOpenAI:
+        return openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client,
+                                  max_retries=0)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        return isinstance(error, openai.APIStatusError) and http_error_is_retryable(error)
+
+    def _count_message_tokens(self, messages) -> int:
+        return count_openai_tokens(messages, self.model, self.chars_per_token)
+
+    def _create(self, messages, **kwargs):
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **kwargs
+        )
+
+    async def _acreate(self, messages, **kwargs):
+        return await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **kwargs
+        )
+
+    def _parse_response(self, response) -> tuple:
+        return response.choices[0].message.content, response.usage.to_dict()
+
+    def _create_stream(self, messages, **kwargs):
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            stream_options={**kwargs.pop("stream_options", {}), "include_usage": True},
+            **kwargs
+        )
+
+    async def _acreate_stream(self, messages, **kwargs):
+        return await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            stream_options={**kwargs.pop("stream_options", {}), "include_usage": True},
+            **kwargs
+        )
+
+    def _parse_stream_event(self, event) -> tuple:
+        text = event.choices[0].delta.content if event.choices else None
+        return text, event.usage.to_dict() if event.usage else None
+
+    def _submit_batch(self, requests: list, **kwargs) -> str:
+        return openai_submit_batch(self.client, requests, "/v1/chat/completions", self.model, kwargs)
+
+    def _retrieve_batch(self, batch_id: str) -> tuple:
+        return openai_retrieve_batch(self.client, batch_id)
+
+    def _batch_results(self, job):
+        return openai_batch_results(self.client, job)
+
+    def _parse_batch_result(self, body: dict) -> tuple:
+        return openai_parse_batch_result(body)
+
     @LLM_Base.add_to_cumulative_tokens
     def calculate_tokens(self, *args, **kwargs) -> int:
 
@@ -110,13 +188,19 @@ class OpenAI_Grollm(LLM_Base):
         prompt_tokens = kwargs.get('prompt_tokens', 0)
         total_tokens = kwargs.get('total_tokens', 0)
 
-        LOGGER.debug(f"Completion tokens: {completion_tokens}, Prompt tokens: {prompt_tokens}, Total tokens: {total_tokens}")
+        LOGGER.debug("Completion tokens: %s, Prompt tokens: %s, Total tokens: %s",
+                     completion_tokens, prompt_tokens, total_tokens)
+        # Cached tokens are reported once, as cached_prompt_tokens, not again under the details.
+        details = dict(kwargs.pop('prompt_tokens_details', None) or {})
+        cached_tokens = details.pop('cached_tokens', None) or 0
+        if details:
+            kwargs['prompt_tokens_details'] = details
+        if cached_tokens:
+            # prompt_tokens keeps only the uncached part so that cache reads are priced separately.
+            kwargs['prompt_tokens'] = prompt_tokens - cached_tokens
+            kwargs['cached_prompt_tokens'] = cached_tokens
         return kwargs
 
-    def set_token_cost(self, cost_per_token: float):
-        cost_per_token = self._validate_cost(cost_per_token)
-        super().set_token_cost(cost_per_token)
-
 if __name__ == "__main__":
     ol = OpenAI_Grollm()
     if ol.is_available:
@@ -0,0 +1,56 @@
+from typing import Callable
+
+from .tokenizers import message_text
+
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
+# Anthropic does not cache prefixes shorter than this (2048 for Haiku), so breakpoints on shorter
+# prefixes would only take up one of the four allowed slots.
+MIN_CACHEABLE_TOKENS = 1024
+
+EPHEMERAL = {"type": "ephemeral"}
+
+def split_system_messages(messages) -> tuple:
+    """
+    Moves system messages into Anthropic's top-level `system` blocks, which the Messages API
+    requires. Returns (system_blocks, remaining_messages).
+    """
+    if not isinstance(messages, list):
+        return [], messages
+    system = [{"type": "text", "text": message_text(m)} for m in messages if m.get("role") == "system"]
+    return system, [m for m in messages if m.get("role") != "system"]
+
+def _has_breakpoint(blocks) -> bool:
+    return isinstance(blocks, list) and any(isinstance(b, dict) and "cache_control" in b for b in blocks)
+
+def _with_breakpoint(message: dict) -> dict:
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": EPHEMERAL}]
+    else:
+        blocks = [*content[:-1], {**content[-1], "cache_control": EPHEMERAL}]
+    return {**message, "content": blocks}
+
+def add_cache_breakpoints(params: dict, count_messages: Callable[[list], int],
+                          min_tokens: int = MIN_CACHEABLE_TOKENS) -> dict:
+    """
+    Marks the stable prefixes of a Messages API request as cacheable: the end of the system prompt
+    and the end of the conversation history before the latest turn. Prefixes shorter than
+    `min_tokens` are left alone, as are requests that already carry their own breakpoints.
+    """
+    system, messages = params.get("system"), params["messages"]
+    if _has_breakpoint(system) or any(_has_breakpoint(m.get("content")) for m in messages):
+        return params
+
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+
+    prefix_tokens = 0
+    if system:
+        prefix_tokens = count_messages([{"role": "system", "content": b.get("text", "")} for b in system])
+        if prefix_tokens >= min_tokens:
+            params["system"] = [*system[:-1], {**system[-1], "cache_control": EPHEMERAL}]
+
+    if len(messages) > 1 and prefix_tokens + count_messages(messages[:-1]) >= min_tokens:
+        params["messages"] = [*messages[:-2], _with_breakpoint(messages[-2]), messages[-1]]
+    return params
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of refusing them: the amount is taken
+    immediately (the balance may go negative) and the caller is told how long to wait until
+    the balance is back above zero. Callers are therefore paced at the refill rate rather
+    than released in bursts.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError("Bucket capacity and refill rate must be positive.")
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._balance = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._balance = min(self.capacity, self._balance + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self._balance -= amount
+            if self._balance >= 0:
+                return 0.0
+            return -self._balance / self.refill_per_second
+
+    def adjust(self, amount: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._balance = min(self.capacity, self._balance + amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._balance
+
+class Reservation:
+
+    def __init__(self, limiter: Optional["RateLimiter"] = None, tokens: int = 0, wait: float = 0.0):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.wait = wait
+
+    def settle(self, actual_tokens: int):
+        if self.limiter is not None:
+            self.limiter.reconcile(self.tokens, actual_tokens)
+            self.limiter = None
+
+    def cancel(self):
+        self.settle(0)
+
+class RateLimiter:
+    """
+    Client-side limiter for a requests-per-minute and a tokens-per-minute quota. Limits are
+    scaled by `utilization` so that steady-state throughput sits just below the provider quota,
+    and at most `burst_seconds` worth of quota can be spent at once.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 utilization: float = 0.95, burst_seconds: float = 10.0):
+        if not 0 < utilization <= 1:
+            raise ValueError("utilization must be in (0, 1].")
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = self._bucket(rpm, utilization, burst_seconds)
+        self.tokens = self._bucket(tpm, utilization, burst_seconds)
+
+    @staticmethod
+    def _bucket(per_minute, utilization, burst_seconds) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        per_second = per_minute * utilization / 60
+        return TokenBucket(capacity=max(1.0, per_second * burst_seconds), refill_per_second=per_second)
+
+    def reserve(self, tokens: int) -> Reservation:
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return Reservation(self, tokens, wait)
+
+    def acquire(self, tokens: int) -> Reservation:
+        reservation = self.reserve(tokens)
+        if reservation.wait > 0:
+            time.sleep(reservation.wait)
+        return reservation
+
+    async def aacquire(self, tokens: int) -> Reservation:
+        reservation = self.reserve(tokens)
+        if reservation.wait > 0:
+            await asyncio.sleep(reservation.wait)
+        return reservation
+
+    def reconcile(self, reserved_tokens: int, actual_tokens: int):
+        if self.tokens is not None and actual_tokens != reserved_tokens:
+            self.tokens.adjust(reserved_tokens - actual_tokens)
+
+    @property
+    def headroom(self) -> float:
+        """
+        Fraction of the burst capacity currently available, the tighter of the two quotas.
+        """
+        fractions = [max(0.0, bucket.available) / bucket.capacity
+                     for bucket in (self.requests, self.tokens) if bucket is not None]
+        return min(fractions, default=1.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_rate_limiter(provider: str, model: str, rpm: Optional[int] = None,
+                     tpm: Optional[int] = None, **kwargs) -> RateLimiter:
+    """
+    Returns the limiter shared by every wrapper instance in this process for `provider`/`model`
+    and these limits. Wrappers that give the same scope different limits get separate limiters,
+    which between them can exceed the provider quota, so that is logged as a warning.
+    """
+    key = (provider, model, rpm, tpm, tuple(sorted(kwargs.items())))
+    with _registry_lock:
+        limiter = _registry.get(key)
+        if limiter is None:
+            others = [(other.rpm, other.tpm) for (p, m, *_), other in _registry.items() if (p, m) == (provider, model)]
+            if others:
+                LOGGER.warning(f"{provider}/{model} already has a rate limiter with limits {others}; a separate "
+                               f"one with rpm={rpm}, tpm={tpm} is created, and together they can exceed the quota.")
+            limiter = _registry[key] = RateLimiter(rpm=rpm, tpm=tpm, **kwargs)
+        return limiter
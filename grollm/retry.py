@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+class RetryBudget:
+    """
+    Process-wide cap on retries. Every request deposits `ratio` retry credits and every retry
+    withdraws one, so during an outage retries stay at roughly `ratio` of the request rate
+    instead of multiplying it. `min_per_second` keeps a trickle of retries available when
+    traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_balance: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self._balance = max_balance
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _deposit(self, amount: float):
+        now = time.monotonic()
+        amount += (now - self._updated) * self.min_per_second
+        self._balance = min(self.max_balance, self._balance + amount)
+        self._updated = now
+
+    def record_request(self):
+        with self._lock:
+            self._deposit(self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._deposit(0)
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+DEFAULT_RETRY_BUDGET = RetryBudget()
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter. A server supplied Retry-After takes precedence over
+    the computed delay but is still capped at `max_retry_after`.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 max_retry_after: float = 60.0, budget: Optional[RetryBudget] = DEFAULT_RETRY_BUDGET):
+        if max_retries < 0:
+            raise ValueError("max_retries must be non-negative.")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def record_request(self):
+        if self.budget is not None:
+            self.budget.record_request()
+
+    def allow_retry(self, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return self.budget is None or self.budget.try_spend()
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    Reads a delay in seconds from `retry-after-ms` or `retry-after` (seconds or an HTTP date).
+    """
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(retry_after).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+def http_error_is_retryable(error) -> bool:
+    """
+    Shared classification for the httpx based OpenAI and Anthropic SDK errors.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        should_retry = response.headers.get("x-should-retry")
+        if should_retry in ("true", "false"):
+            return should_retry == "true"
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return False
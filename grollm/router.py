@@ -0,0 +1,256 @@
+import random
+import threading
+import time
+from typing import Optional
+
+from .base import LLM_Base
+from .health import AUTH_ERROR_STATUSES
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+# Non-retryable statuses that still point at the backend rather than the request: a revoked key,
+# or a model or deployment this backend does not serve. Other backends may well succeed.
+BACKEND_ERROR_STATUSES = AUTH_ERROR_STATUSES | {404}
+
+class CircuitBreaker:
+    """
+    Ejects a backend after `failure_threshold` consecutive failures. Once `cooldown` seconds have
+    passed a single probe request is let through; success closes the breaker, failure opens it
+    again with the cooldown doubled, up to `max_cooldown`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allows(self, now: float) -> bool:
+        if self.state == self.OPEN and now - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            return not self.probing
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open(now)
+        elif self.failures >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.probing = False
+
+class Backend:
+    """
+    Live view of one routed LLM instance: EWMA latency and error rate, requests in flight and its
+    circuit breaker. The router updates it under its own lock.
+    """
+
+    def __init__(self, llm: LLM_Base, name: str, breaker: CircuitBreaker, alpha: float, error_half_life: float):
+        self.llm = llm
+        self.name = name
+        self.breaker = breaker
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self.latency = None
+        self._error_rate = 0.0
+        self._error_time = time.monotonic()
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+        prices = llm.cost_dict
+        self.price = prices.get("prompt_tokens", 0) + prices.get("completion_tokens", 0)
+
+    def error_rate(self, now: float = None) -> float:
+        # Decays with time as well as with traffic, so a backend that stopped being picked after a
+        # burst of errors is tried again rather than being starved forever.
+        now = time.monotonic() if now is None else now
+        return self._error_rate * 0.5 ** ((now - self._error_time) / self.error_half_life)
+
+    def observe(self, latency: Optional[float], failed: bool):
+        now = time.monotonic()
+        self.requests += 1
+        self.failures += failed
+        error_rate = self.error_rate(now)
+        self._error_rate = error_rate + self.alpha * (failed - error_rate)
+        self._error_time = now
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+
+    @property
+    def headroom(self) -> float:
+        limiter = self.llm.rate_limiter
+        return 1.0 if limiter is None else limiter.headroom
+
+    def stats(self) -> dict:
+        return {"latency": self.latency, "error_rate": self.error_rate(), "inflight": self.inflight,
+                "requests": self.requests, "failures": self.failures, "headroom": self.headroom,
+                "price": self.price, "circuit": self.breaker.state}
+
+class Router:
+    """
+    Sends each prompt to one of several LLM instances, e.g. OpenAI plus a few Azure deployments of
+    the same model, and fails over to the next candidate on retryable errors and on errors that
+    are specific to one backend (authentication failures, unknown model or deployment).
+
+    Candidates are ranked by expected latency (EWMA latency scaled by requests in flight), divided
+    by rate-limit headroom and penalised by the error rate, an EWMA that also halves every
+    `error_half_life` seconds. `cost_weight` adds a preference for
+    backends whose CostStore price is lower, relative to the cheapest one. Backends with an open
+    circuit breaker are skipped; when a breaker's cooldown ends, the next request probes it first.
+    """
+
+    def __init__(self, backends, cost_weight: float = 0.0, error_penalty: float = 10.0, alpha: float = 0.2,
+                 failure_threshold: int = 5, cooldown: float = 30.0, error_half_life: float = 30.0,
+                 max_attempts: int = None):
+        if isinstance(backends, dict):
+            items = list(backends.items())
+        else:
+            items = [(f"{llm.provider_name}:{getattr(llm, 'deployment_name', llm.model)}#{i}", llm)
+                     for i, llm in enumerate(backends)]
+        if not items:
+            raise ValueError("Router needs at least one backend.")
+
+        self.backends = [Backend(llm, name, CircuitBreaker(failure_threshold, cooldown), alpha, error_half_life)
+                         for name, llm in items]
+        self.cost_weight = cost_weight
+        self.error_penalty = error_penalty
+        self.max_attempts = max_attempts or len(self.backends)
+        self._lock = threading.Lock()
+
+    def _score(self, backend: Backend, now: float, baseline_latency: float, min_price: float) -> float:
+        latency = backend.latency if backend.latency is not None else baseline_latency
+        score = latency * (1 + backend.inflight) / max(backend.headroom, 0.05)
+        score *= 1 + self.error_penalty * backend.error_rate(now)
+        if self.cost_weight and min_price:
+            score *= (backend.price / min_price) ** self.cost_weight
+        return score
+
+    def _select(self, exclude: set) -> Optional[Backend]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude and b.breaker.allows(now)]
+            if not candidates:
+                return None
+
+            probe = next((b for b in candidates if b.breaker.state == CircuitBreaker.HALF_OPEN), None)
+            if probe is not None:
+                probe.breaker.probing = True
+                chosen = probe
+            else:
+                known = [b.latency for b in candidates if b.latency is not None]
+                # Backends without measurements are scored optimistically so they get explored.
+                baseline = min(known) if known else 1.0
+                prices = [b.price for b in candidates if b.price]
+                min_price = min(prices) if prices else 0
+                scores = [(self._score(b, now, baseline, min_price), random.random(), i) for i, b in enumerate(candidates)]
+                chosen = candidates[min(scores)[2]]
+
+            chosen.inflight += 1
+            return chosen
+
+    def _release(self, backend: Backend, latency: Optional[float], error: Optional[Exception],
+                 observed: bool = True):
+        now = time.monotonic()
+        with self._lock:
+            backend.inflight -= 1
+            if not observed:
+                # Cancelled, or rejected for reasons of the request's own: says nothing about the backend.
+                backend.breaker.probing = False
+                return
+            backend.observe(latency, error is not None)
+            if error is None:
+                backend.breaker.record_success()
+            else:
+                backend.breaker.record_failure(now)
+                if backend.breaker.state == CircuitBreaker.OPEN:
+                    LOGGER.warning("Circuit opened for %s after %s failures.", backend.name, backend.breaker.failures)
+
+    def _should_fail_over(self, backend: Backend, error: Exception) -> bool:
+        """
+        True when the error is the backend's fault: it counts against the backend's breaker and the
+        request moves on. Other errors, such as a 400 for a malformed request, would fail anywhere,
+        so they go back to the caller and leave the breaker untouched.
+        """
+        if not isinstance(error, backend.llm.api_error):
+            return False
+        if backend.llm._is_retryable(error):
+            return True
+        status = getattr(error, "status_code", getattr(error, "code", None))
+        # API errors without a status are connection failures and timeouts.
+        return not isinstance(status, int) or status in BACKEND_ERROR_STATUSES
+
+    def send_prompt(self, prompt, **kwargs) -> str:
+        tried, last_error = set(), None
+        while len(tried) < self.max_attempts:
+            backend = self._select(tried)
+            if backend is None:
+                break
+            tried.add(backend)
+            start = time.monotonic()
+            try:
+                response = backend.llm.send_prompt(prompt, **kwargs)
+            except Exception as e:
+                if not self._should_fail_over(backend, e):
+                    self._release(backend, None, None, observed=False)
+                    raise
+                self._release(backend, None, e)
+                LOGGER.warning("Request to %s failed, failing over: %s", backend.name, e)
+                last_error = e
+                continue
+            except BaseException:
+                self._release(backend, None, None, observed=False)
+                raise
+            self._release(backend, time.monotonic() - start, None)
+            return response
+
+        raise last_error or RuntimeError("No healthy backend available.")
+
+    async def asend_prompt(self, prompt, **kwargs) -> str:
+        tried, last_error = set(), None
+        while len(tried) < self.max_attempts:
+            backend = self._select(tried)
+            if backend is None:
+                break
+            tried.add(backend)
+            start = time.monotonic()
+            try:
+                response = await backend.llm.asend_prompt(prompt, **kwargs)
+            except Exception as e:
+                if not self._should_fail_over(backend, e):
+                    self._release(backend, None, None, observed=False)
+                    raise
+                self._release(backend, None, e)
+                LOGGER.warning("Request to %s failed, failing over: %s", backend.name, e)
+                last_error = e
+                continue
+            except BaseException:
+                self._release(backend, None, None, observed=False)
+                raise
+            self._release(backend, time.monotonic() - start, None)
+            return response
+
+        raise last_error or RuntimeError("No healthy backend available.")
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {backend.name: backend.stats() for backend in self.backends}
@@ -0,0 +1,275 @@
+"""
+Bulk runner: streams prompts from a JSONL file through a provider and appends one result line per
+input row to an output JSONL file. The output file doubles as the checkpoint, so an interrupted run
+is resumed by starting it again with the same arguments.
+
+    python -m grollm.run --provider openai --model gpt-4o-mini prompts.jsonl results.jsonl
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+
+from .base import LLM_Base
+from .batch import iter_prompts
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+PROVIDERS = {
+    "openai": "OpenAI_Grollm",
+    "anthropic": "Anthropic_Grollm",
+    "gemini": "Gemini_Grollm",
+    "azure": "AzureOpenAI_Grollm",
+}
+
+# Output lines carry the 1-based input line number under this key; it is what resume matches on.
+LINE_KEY = "_line"
+
+@dataclass
+class RunStats:
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.succeeded + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "rows_per_second": round(self.rows_per_second, 2)}
+
+class Checkpoint:
+    """
+    Set of processed input lines kept as a watermark, below which every line is done, plus the
+    sparse set of done lines above it. Results complete at most `max_concurrency` rows out of
+    order, so the sparse set stays small and memory is flat however long the input is.
+
+    Failed lines count as processed, so that one bad row cannot pin the watermark, and are also
+    kept in `failed` until they succeed. That set only grows with the number of failures.
+    """
+
+    def __init__(self):
+        self.watermark = 0
+        self._done = set()
+        self.failed = set()
+
+    def add(self, line: int, failed: bool = False):
+        if failed:
+            self.failed.add(line)
+        else:
+            self.failed.discard(line)
+        if line <= self.watermark:
+            return
+        self._done.add(line)
+        while self.watermark + 1 in self._done:
+            self.watermark += 1
+            self._done.remove(self.watermark)
+
+    def pending(self, line: int) -> bool:
+        """
+        True for lines that still need to be sent: never processed, or failed last time.
+        """
+        return line not in self or line in self.failed
+
+    def __contains__(self, line: int) -> bool:
+        return line <= self.watermark or line in self._done
+
+    def __len__(self) -> int:
+        return self.watermark + len(self._done)
+
+def _read_records(path: str) -> Iterator[dict]:
+    """
+    Yields the JSON records of an output or failure log. A trailing partial line left by a crash
+    mid-write is cut off so that appending resumes on a clean line boundary. Unreadable complete
+    lines are skipped with a warning and left in place: the rows around them are still done.
+    """
+    if not os.path.exists(path):
+        return
+
+    end = 0
+    tail = None
+    with open(path, "rb") as f:
+        for number, raw in enumerate(f, 1):
+            try:
+                record = json.loads(raw)
+                record[LINE_KEY]
+            except (ValueError, KeyError, TypeError):
+                record = None
+            if not raw.endswith(b"\n"):
+                tail = record
+                break
+            end += len(raw)
+            if record is None:
+                LOGGER.warning("Skipping unreadable line %s of %s.", number, path)
+                continue
+            yield record
+
+    if end != os.path.getsize(path):
+        with open(path, "rb+") as f:
+            if tail is None:
+                f.truncate(end)
+            else:
+                # Complete record that only lost its newline.
+                f.seek(0, os.SEEK_END)
+                f.write(b"\n")
+    if tail is not None:
+        yield tail
+
+def load_checkpoint(output_path: str) -> Checkpoint:
+    """
+    Rebuilds the checkpoint from the failure log and the output file. Failures are read first, so
+    a line that failed once and succeeded later ends up done.
+    """
+    checkpoint = Checkpoint()
+    for record in _read_records(f"{output_path}.errors"):
+        checkpoint.add(record[LINE_KEY], failed=True)
+    for record in _read_records(output_path):
+        checkpoint.add(record[LINE_KEY])
+    return checkpoint
+
+def _compact_errors(errors_path: str, checkpoint: Checkpoint):
+    """
+    Rewrites the failure log with the latest error of each line that is still failing.
+    """
+    latest = {record[LINE_KEY]: record for record in _read_records(errors_path)
+              if record[LINE_KEY] in checkpoint.failed}
+    if not latest:
+        if os.path.exists(errors_path):
+            os.remove(errors_path)
+        return
+    tmp_path = f"{errors_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in sorted(latest):
+            f.write(json.dumps(latest[line], ensure_ascii=False) + "\n")
+    os.replace(tmp_path, errors_path)
+
+def read_rows(input_path: str, checkpoint: Checkpoint, stats: RunStats, prompt_field: str = "prompt",
+              on_error=None) -> Iterator[dict]:
+    """
+    Yields the input rows still pending. Lines that are not valid JSON are passed to
+    `on_error(line, error)` instead of ending the run.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line, raw in enumerate(f, start=1):
+            if not raw.strip():
+                continue
+            if not checkpoint.pending(line):
+                stats.skipped += 1
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError as e:
+                if on_error is None:
+                    raise
+                on_error(line, e)
+                continue
+            if not isinstance(row, dict):
+                row = {prompt_field: row}
+            row[LINE_KEY] = line
+            yield row
+
+def run_jsonl(llm: LLM_Base, input_path: str, output_path: str, prompt_field: str = "prompt",
+              id_field: str = "id", max_concurrency: int = 8, stats_interval: Optional[float] = 10.0,
+              fsync_interval: float = 1.0, **kwargs) -> RunStats:
+    """
+    Sends the `prompt_field` of every input row through `llm` with at most `max_concurrency`
+    requests in flight. Each result is appended to `output_path` as soon as it completes:
+
+        {"_line": 12, "id": ..., "response": "..."}
+
+    Failed rows, including input lines that are not valid JSON, are appended to
+    `<output_path>.errors` instead and retried by the next run; at the end of a run that file is
+    cut down to the rows still failing. Rows already present in the output are skipped. Extra
+    `kwargs` are passed to `send_prompt`.
+    """
+    stats = RunStats()
+    checkpoint = load_checkpoint(output_path)
+    errors_path = f"{output_path}.errors"
+    start_tokens = llm._usage_total(llm.cumulative_tokens)
+    start_cost = sum(llm.cumulative_cost.values())
+
+    def send(row: dict):
+        return llm.send_prompt(row[prompt_field], **kwargs)
+
+    def update_usage():
+        stats.elapsed = time.monotonic() - start
+        stats.tokens = llm._usage_total(llm.cumulative_tokens) - start_tokens
+        stats.cost = sum(llm.cumulative_cost.values()) - start_cost
+
+    start = time.monotonic()
+    last_report = last_sync = start
+    with open(output_path, "a", encoding="utf-8") as out, open(errors_path, "a", encoding="utf-8") as errors:
+        def record_failure(record: dict, error: BaseException):
+            record["error"] = f"{type(error).__name__}: {error}"
+            errors.write(json.dumps(record, ensure_ascii=False) + "\n")
+            errors.flush()
+            checkpoint.add(record[LINE_KEY], failed=True)
+            stats.failed += 1
+
+        rows = read_rows(input_path, checkpoint, stats, prompt_field,
+                         on_error=lambda line, error: record_failure({LINE_KEY: line, id_field: line}, error))
+        for result in iter_prompts(send, rows, max_concurrency=max_concurrency, ordered=False):
+            row = result.prompt
+            record = {LINE_KEY: row[LINE_KEY], id_field: row.get(id_field, row[LINE_KEY])}
+            if result.ok:
+                record["response"] = result.response
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                checkpoint.add(row[LINE_KEY])
+                stats.succeeded += 1
+            else:
+                record_failure(record, result.error)
+
+            now = time.monotonic()
+            if now - last_sync >= fsync_interval:
+                os.fsync(out.fileno())
+                last_sync = now
+            if stats_interval is not None and now - last_report >= stats_interval:
+                update_usage()
+                print(json.dumps(stats.as_dict()), file=sys.stderr, flush=True)
+                last_report = now
+
+        os.fsync(out.fileno())
+
+    _compact_errors(errors_path, checkpoint)
+    update_usage()
+    return stats
+
+def build_llm(provider: str, model: Optional[str] = None, **kwargs) -> LLM_Base:
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider {provider!r}, expected one of {sorted(PROVIDERS)}.")
+    llm_class = getattr(importlib.import_module("grollm"), PROVIDERS[provider])
+    if model is not None:
+        kwargs["model"] = model
+    return llm_class(**kwargs)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m grollm.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="JSONL file with one prompt per line")
+    parser.add_argument("output", help="JSONL file results are appended to; also used to resume")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="openai")
+    parser.add_argument("--model")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--kwargs", type=json.loads, default={}, help="JSON object passed to send_prompt")
+    args = parser.parse_args(argv)
+
+    llm = build_llm(args.provider, args.model)
+    stats = run_jsonl(llm, args.input, args.output, prompt_field=args.prompt_field, id_field=args.id_field,
+                      max_concurrency=args.concurrency, stats_interval=args.stats_interval, **args.kwargs)
+    llm.flush_telemetry()
+    print(json.dumps(stats.as_dict()), file=sys.stderr)
+    return 1 if stats.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
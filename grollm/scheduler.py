@@ -0,0 +1,264 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from .hedging import LatencyTracker
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+# Lower values are dispatched first. Plain ints are accepted as well.
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2}
+
+# Latency samples older than this no longer count towards admission control, so a quiet period
+# after a slow spell does not keep shedding load.
+LATENCY_STALE_AFTER = 30.0
+
+QUEUED, GRANTED, EXPIRED, CANCELLED = "queued", "granted", "expired", "cancelled"
+
+class DeadlineExceeded(TimeoutError):
+
+    def __init__(self, waited: float):
+        self.waited = waited
+        super().__init__(f"Request deadline passed after {waited:.3f}s in the scheduler queue; it was not sent.")
+
+class RequestShed(RuntimeError):
+
+    def __init__(self, reason: str, priority: int):
+        self.reason = reason
+        self.priority = priority
+        super().__init__(f"Priority {priority} request shed by admission control: {reason}.")
+
+class _Ticket:
+
+    __slots__ = ("priority", "tenant", "deadline", "enqueued", "state", "event", "loop", "future")
+
+    def __init__(self, priority: int, tenant, deadline: Optional[float], loop=None):
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.state = QUEUED
+        self.loop = loop
+        self.event = None if loop is not None else threading.Event()
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+class Scheduler:
+    """
+    Puts a queue in front of an LLM instance, Router or Hedger and lets at most `max_concurrency`
+    requests through at a time. Waiting requests are dispatched by priority class first; within a
+    class, tenants share the slots in proportion to `tenant_weights` (start-time fair queuing), and
+    each tenant's requests go out in arrival order. A request whose deadline passes while it waits
+    is dropped before it is sent and raises DeadlineExceeded.
+
+    Admission control sheds new requests at `shed_priority` or lower with RequestShed while the
+    backend is degraded: rate-limit headroom below `min_headroom`, recent p95 latency above
+    `shed_latency`, or a failed health check. Higher priorities are always admitted. A full queue
+    sheds every priority.
+    """
+
+    def __init__(self, llm, max_concurrency: int = 8, tenant_weights: dict = None,
+                 default_priority="default", default_deadlines: dict = None, max_queue: int = 10_000,
+                 shed_priority="batch", shed_latency: float = None, min_headroom: float = 0.05,
+                 window: int = 200, min_samples: int = 20):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.tenant_weights = dict(tenant_weights or {})
+        self.default_priority = self._priority(default_priority)
+        self.default_deadlines = {self._priority(k): v for k, v in (default_deadlines or {}).items()}
+        self.max_queue = max_queue
+        self.shed_priority = self._priority(shed_priority)
+        self.shed_latency = shed_latency
+        self.min_headroom = min_headroom
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker(window)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        self.shed = Counter()
+        self.dispatched = Counter()
+        self._queues = {}
+        self._vtime = {}
+        self._clock = 0.0
+        self._queued = 0
+        self._in_flight = 0
+        self._last_sample = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _priority(priority) -> int:
+        if isinstance(priority, int):
+            return priority
+        try:
+            return PRIORITIES[priority]
+        except KeyError:
+            raise ValueError(f"Unknown priority {priority!r}; use an int or one of {list(PRIORITIES)}.") from None
+
+    def degraded(self) -> Optional[str]:
+        """
+        Why new low-priority requests are being shed right now, or None.
+        """
+        limiter = getattr(self.llm, "rate_limiter", None)
+        if limiter is not None and limiter.headroom < self.min_headroom:
+            return "rate limit headroom"
+        if (self.shed_latency is not None and len(self.tracker) >= self.min_samples
+                and time.monotonic() - self._last_sample < LATENCY_STALE_AFTER
+                and self.tracker.percentile(95) > self.shed_latency):
+            return "latency"
+        health = getattr(self.llm, "health", None)
+        status = health.status if health is not None else None
+        if status is not None and not status.healthy:
+            return "unhealthy"
+        return None
+
+    def _charge(self, tenant):
+        # Start-time fair queuing: a tenant's tag never falls behind the clock, so an idle tenant
+        # cannot bank credit, and each dispatch advances it by 1 / weight.
+        start = max(self._vtime.get(tenant, 0.0), self._clock)
+        self._clock = start
+        self._vtime[tenant] = start + 1.0 / self.tenant_weights.get(tenant, 1.0)
+        self._in_flight += 1
+        self.dispatched[tenant] += 1
+
+    def _enter(self, priority, tenant, deadline, loop=None) -> Optional[_Ticket]:
+        """
+        Admits the request. Returns None when it may run at once, else its queued ticket.
+        """
+        priority = self.default_priority if priority is None else self._priority(priority)
+        if deadline is None:
+            deadline = self.default_deadlines.get(priority)
+        with self._lock:
+            self.submitted += 1
+            reason = self.degraded() if priority >= self.shed_priority else None
+            if reason is None and self._queued >= self.max_queue:
+                reason = "queue full"
+            if reason is not None:
+                self.shed[reason] += 1
+                LOGGER.debug("Shedding priority %s request: %s.", priority, reason)
+                raise RequestShed(reason, priority)
+            if self._in_flight < self.max_concurrency and not self._queued:
+                self._charge(tenant)
+                return None
+            ticket = _Ticket(priority, tenant, None if deadline is None else time.monotonic() + deadline, loop)
+            self._queues.setdefault(priority, {}).setdefault(tenant, deque()).append(ticket)
+            self._queued += 1
+            return ticket
+
+    def _next(self) -> Optional[_Ticket]:
+        now = time.monotonic()
+        for priority in sorted(self._queues):
+            tenants = self._queues[priority]
+            while tenants:
+                tenant = min(tenants, key=lambda t: max(self._vtime.get(t, 0.0), self._clock))
+                queue = tenants[tenant]
+                ticket = queue.popleft()
+                if not queue:
+                    del tenants[tenant]
+                if ticket.state != QUEUED:
+                    continue
+                self._queued -= 1
+                if ticket.deadline is not None and ticket.deadline <= now:
+                    ticket.state = EXPIRED
+                    self.expired += 1
+                    ticket.wake()
+                    continue
+                ticket.state = GRANTED
+                self._charge(tenant)
+                return ticket
+            del self._queues[priority]
+        return None
+
+    def _release(self, failed: bool = None):
+        with self._lock:
+            self._in_flight -= 1
+            if failed is not None:
+                self.failed += failed
+                self.completed += not failed
+            ticket = self._next()
+        if ticket is not None:
+            ticket.wake()
+
+    def _after_wait(self, ticket: _Ticket):
+        with self._lock:
+            if ticket.state == QUEUED:
+                ticket.state = EXPIRED
+                self._queued -= 1
+                self.expired += 1
+        if ticket.state != GRANTED:
+            raise DeadlineExceeded(time.monotonic() - ticket.enqueued)
+
+    def _finish(self, start: float, error: Optional[BaseException]):
+        if error is None:
+            self.tracker.add(time.monotonic() - start)
+            self._last_sample = time.monotonic()
+        self._release(failed=error is not None)
+
+    def send_prompt(self, prompt, priority=None, deadline: float = None, tenant=None, **kwargs) -> str:
+        """
+        `priority` is a name from PRIORITIES or an int, `deadline` the seconds this request may wait
+        for a slot, and `tenant` any hashable key that fair sharing is applied to.
+        """
+        ticket = self._enter(priority, tenant, deadline)
+        if ticket is not None:
+            ticket.event.wait(None if ticket.deadline is None else max(0.0, ticket.deadline - time.monotonic()))
+            self._after_wait(ticket)
+
+        start, error = time.monotonic(), None
+        try:
+            return self.llm.send_prompt(prompt, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(start, error)
+
+    async def asend_prompt(self, prompt, priority=None, deadline: float = None, tenant=None, **kwargs) -> str:
+        ticket = self._enter(priority, tenant, deadline, asyncio.get_running_loop())
+        if ticket is not None:
+            timeout = None if ticket.deadline is None else max(0.0, ticket.deadline - time.monotonic())
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = ticket.state == GRANTED
+                    if ticket.state == QUEUED:
+                        ticket.state = CANCELLED
+                        self._queued -= 1
+                if granted:
+                    self._release()
+                raise
+            self._after_wait(ticket)
+
+        start, error = time.monotonic(), None
+        try:
+            return await self.llm.asend_prompt(prompt, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(start, error)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"submitted": self.submitted, "completed": self.completed, "failed": self.failed,
+                    "expired": self.expired, "shed": dict(self.shed), "queued": self._queued,
+                    "in_flight": self._in_flight, "dispatched": dict(self.dispatched),
+                    "p95_latency": self.tracker.percentile(95), "degraded": self.degraded()}
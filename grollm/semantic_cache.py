@@ -0,0 +1,309 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import warnings
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from .tokenizers import message_text
+from .utils import import_or_install
+
+np = None
+
+def _numpy():
+    global np
+    if np is None:
+        np = import_or_install("numpy")
+    return np
+
+class Embedder(ABC):
+    """
+    Turns texts into an (n, dim) float array. Vectors are normalized by the cache, so embedders
+    need not return unit vectors.
+    """
+
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: list):
+        pass
+
+class HashingEmbedder(Embedder):
+    """
+    Offline embedder hashing word unigrams and character trigrams into `dim` signed buckets. It
+    needs no model or network access, which makes it suitable for tests and for catching
+    rewordings that share most of their words; use a real embedding model for looser paraphrases.
+    """
+
+    def __init__(self, dim: int = 512):
+        _numpy()
+        self.dim = dim
+
+    def _features(self, text: str):
+        text = text.lower()
+        for word in re.findall(r"\w+", text):
+            yield "w:" + word
+        squashed = " ".join(text.split())
+        for i in range(len(squashed) - 2):
+            yield "c:" + squashed[i:i + 3]
+
+    def embed(self, texts: list):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        return vectors
+
+class OpenAIEmbedder(Embedder):
+
+    def __init__(self, api_key: str = None, model: str = "text-embedding-3-small", dim: int = 1536,
+                 base_url: str = None):
+        _numpy()
+        import openai
+
+        self.model = model
+        self.dim = dim
+        self.client = openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), base_url=base_url)
+
+    def embed(self, texts: list):
+        response = self.client.embeddings.create(model=self.model, input=texts, dimensions=self.dim)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+class VectorIndex:
+    """
+    Fixed-capacity matrix of unit vectors searched by brute-force dot product. With a `path` the
+    vectors live in a memory-mapped `.npy` file and the entries in a JSON sidecar, both written by
+    `flush()`. When full, the least recently used slot is overwritten; only hits count as uses.
+    """
+
+    def __init__(self, dim: int, capacity: int, path: Optional[str] = None):
+        _numpy()
+        self.dim = dim
+        self.capacity = capacity
+        self.path = path
+        self.count = 0
+        self.clock = 0
+        self.entries = [None] * capacity
+        self.accessed = np.zeros(capacity, dtype=np.int64)
+
+        if path is None:
+            self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        elif self._load():
+            return
+        else:
+            self.vectors = np.lib.format.open_memmap(f"{path}.npy", mode="w+", dtype=np.float32,
+                                                     shape=(capacity, dim))
+
+    def _load(self) -> bool:
+        if not (os.path.exists(f"{self.path}.npy") and os.path.exists(f"{self.path}.json")):
+            return False
+        vectors = np.load(f"{self.path}.npy", mmap_mode="r+")
+        if vectors.shape != (self.capacity, self.dim):
+            warnings.warn(f"Ignoring semantic cache index {self.path} built with shape {vectors.shape}.")
+            del vectors
+            return False
+        with open(f"{self.path}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.vectors = vectors
+        self.count = meta["count"]
+        self.clock = meta["clock"]
+        self.entries[:self.count] = meta["entries"]
+        self.accessed[:self.count] = meta["accessed"]
+        return True
+
+    def search(self, vector) -> tuple:
+        if self.count == 0:
+            return None, 0.0
+        scores = self.vectors[:self.count] @ vector
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def touch(self, slot: int):
+        self.clock += 1
+        self.accessed[slot] = self.clock
+
+    def add(self, vector, entry: dict) -> int:
+        if self.count < self.capacity:
+            slot = self.count
+            self.count += 1
+        else:
+            slot = int(np.argmin(self.accessed))
+        self.clock += 1
+        self.vectors[slot] = vector
+        self.entries[slot] = entry
+        self.accessed[slot] = self.clock
+        return slot
+
+    def flush(self):
+        if self.path is None:
+            return
+        self.vectors.flush()
+        meta = {"count": self.count, "clock": self.clock, "entries": self.entries[:self.count],
+                "accessed": self.accessed[:self.count].tolist()}
+        tmp = f"{self.path}.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, f"{self.path}.json")
+
+    def close(self):
+        """
+        Flushes the index and releases its memory map.
+        """
+        self.flush()
+        self.vectors = None
+
+    def clear(self):
+        self.count = 0
+        self.clock = 0
+        self.entries = [None] * self.capacity
+        self.accessed[:] = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+def _flush_at_exit(cache_ref):
+    cache = cache_ref()
+    if cache is not None:
+        cache.flush()
+
+class SemanticCache:
+    """
+    Returns a cached completion when a new prompt's embedding has cosine similarity of at least
+    `threshold` with a cached one. Each model, system prompt and set of request kwargs gets its own
+    namespace, an index of at most `capacity` entries; with `directory` the indexes are
+    memory-mapped there and persist across restarts. At most `max_namespaces` indexes are open at
+    once: the least recently used one is flushed and closed, and reloaded from `directory` (or
+    started empty without one) when its namespace is used again.
+    """
+
+    def __init__(self, embedder: Embedder = None, threshold: float = 0.9, capacity: int = 10_000,
+                 directory: Optional[str] = None, flush_every: int = 100, max_namespaces: int = 16):
+        _numpy()
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.capacity = capacity
+        self.directory = directory
+        self.flush_every = flush_every
+        self.max_namespaces = max_namespaces
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+        self._indexes = OrderedDict()
+        self._pending = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            # Only a weak reference, so registering does not keep the cache alive until exit.
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    @staticmethod
+    def namespace(model: str, messages, kwargs: dict) -> str:
+        # System prompts would dominate the similarity of short questions, so rather than being
+        # embedded they partition the cache, like the request kwargs.
+        system = [message_text(m) for m in messages if m.get("role") == "system"] if isinstance(messages, list) else []
+        if not kwargs and not system:
+            return model
+        payload = json.dumps({"system": system, "kwargs": kwargs}, sort_keys=True, default=str)
+        return f"{model}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]}"
+
+    def _index(self, namespace: str) -> VectorIndex:
+        index = self._indexes.get(namespace)
+        if index is not None:
+            self._indexes.move_to_end(namespace)
+            return index
+        while len(self._indexes) >= self.max_namespaces:
+            _, oldest = self._indexes.popitem(last=False)
+            oldest.close()
+            self.evicted += 1
+        path = None
+        if self.directory is not None:
+            path = os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", namespace))
+        index = self._indexes[namespace] = VectorIndex(self.embedder.dim, self.capacity, path)
+        return index
+
+    def _embed(self, messages):
+        if isinstance(messages, str):
+            text = messages
+        else:
+            text = "\n".join(f"{m.get('role', '')}: {message_text(m)}" for m in messages if m.get("role") != "system")
+        vector = self.embedder.embed([text])[0].astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, key: str, model: str, messages, kwargs: dict) -> Optional[dict]:
+        """
+        Returns the entry of the most similar cached prompt if it clears the threshold. On a miss
+        the embedding is kept under `key` so that `store` does not have to compute it again.
+        """
+        namespace = self.namespace(model, messages, kwargs)
+        vector = self._embed(messages)
+        with self._lock:
+            index = self._index(namespace)
+            slot, score = index.search(vector)
+            if slot is not None and score >= self.threshold:
+                index.touch(slot)
+                self.hits += 1
+                return index.entries[slot]
+            self.misses += 1
+            self._pending[key] = (namespace, vector)
+            while len(self._pending) > 10_000:
+                self._pending.popitem(last=False)
+        return None
+
+    def store(self, key: str, entry: dict):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+            if pending is None:
+                return
+            namespace, vector = pending
+            self._index(namespace).add(vector, entry)
+            self._writes += 1
+            if self.directory is not None and self._writes % self.flush_every == 0:
+                self._flush()
+
+    def _flush(self):
+        for index in self._indexes.values():
+            index.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """
+        Flushes and closes every open namespace; they are reopened if the cache is used again.
+        """
+        with self._lock:
+            while self._indexes:
+                _, index = self._indexes.popitem(last=False)
+                index.close()
+            self._pending.clear()
+
+    def clear(self):
+        with self._lock:
+            for index in self._indexes.values():
+                index.clear()
+                index.flush()
+            if self.directory is not None:
+                # Closed namespaces are only on disk.
+                open_paths = {index.path for index in self._indexes.values()}
+                for name in os.listdir(self.directory):
+                    path = os.path.join(self.directory, name[:-len(".json")])
+                    if name.endswith(".json") and path not in open_paths and os.path.exists(f"{path}.npy"):
+                        os.remove(f"{path}.json")
+                        os.remove(f"{path}.npy")
+            self._pending.clear()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evicted_namespaces": self.evicted,
+                    "entries": {namespace: len(index) for namespace, index in self._indexes.items()}}
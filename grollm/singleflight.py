@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import weakref
+from typing import Awaitable, Callable
+
+class _Call:
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one. The first caller runs the function and
+    every caller that arrives while it is in flight waits for and shares its result or exception.
+    Returns (result, shared), where `shared` is True for callers that did not make the call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._async_calls = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn: Callable) -> tuple:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key, fn: Callable[[], Awaitable]) -> tuple:
+        """
+        Async variant of `do`. The upstream call runs as its own task, so one caller being
+        cancelled does not cancel the request the others are waiting on.
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        task = calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: calls.get(key) is t and calls.pop(key))
+        return await asyncio.shield(task), shared
+
+    def __len__(self) -> int:
+        return len(self._calls) + sum(len(calls) for calls in self._async_calls.values())
@@ -0,0 +1,36 @@
+import time
+
+class StreamTimer:
+    """
+    Records time-to-first-token and the gaps between consecutive text deltas of one stream.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first = None
+        self.last = None
+        self.chunks = 0
+        self.gap_total = 0.0
+        self.gap_max = 0.0
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        else:
+            gap = now - self.last
+            self.gap_total += gap
+            self.gap_max = max(self.gap_max, gap)
+        self.last = now
+        self.chunks += 1
+
+    def stats(self) -> dict:
+        end = self.last if self.last is not None else time.perf_counter()
+        gaps = max(self.chunks - 1, 0)
+        return {
+            "chunks": self.chunks,
+            "duration_seconds": end - self.started,
+            "time_to_first_token": self.first - self.started if self.first is not None else None,
+            "mean_inter_token_latency": self.gap_total / gaps if gaps else 0.0,
+            "max_inter_token_latency": self.gap_max,
+        }
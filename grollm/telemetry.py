@@ -0,0 +1,135 @@
+import atexit
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from .logger import get_logger
+
+LOGGER = get_logger(__name__)
+
+# MLflow rejects log_batch calls with more than 1000 metrics.
+MLFLOW_MAX_BATCH = 1000
+
+class MLflowSink:
+    """
+    Moves MLflow metric logging off the request path. Points are queued without blocking and a
+    background thread writes them with `MlflowClient.log_batch` whenever `batch_size` points are
+    waiting or `flush_interval` seconds have passed. The queue is bounded; when it is full new
+    points are dropped and counted in `dropped` rather than slowing callers down.
+    """
+
+    def __init__(self, tracking_uri: Optional[str] = None, max_queue: int = 100_000,
+                 batch_size: int = 500, flush_interval: float = 5.0):
+        self.tracking_uri = tracking_uri
+        self.batch_size = min(batch_size, MLFLOW_MAX_BATCH)
+        self.flush_interval = flush_interval
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._client = None
+
+    def log_metrics(self, run_id: str, metrics: dict, step: int = 0):
+        self._ensure_started()
+        timestamp = int(time.time() * 1000)
+        for key, value in metrics.items():
+            if not isinstance(value, (int, float)):
+                continue
+            try:
+                self._queue.put_nowait((run_id, key, float(value), timestamp, step))
+            except queue.Full:
+                self.dropped += 1
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="grollm-mlflow-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                # flush() marker: write out everything queued before it, then wake the caller.
+                self._write(batch)
+                batch = []
+                item.set()
+            elif item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+            if self._stop.is_set() and self._queue.empty():
+                self._write(batch)
+                return
+
+    def _write(self, batch: list):
+        if not batch:
+            return
+        from mlflow.entities import Metric
+        from mlflow.tracking import MlflowClient
+
+        if self._client is None:
+            self._client = MlflowClient(tracking_uri=self.tracking_uri)
+
+        by_run = defaultdict(list)
+        for run_id, key, value, timestamp, step in batch:
+            by_run[run_id].append(Metric(key, value, timestamp, step))
+
+        for run_id, metrics in by_run.items():
+            for start in range(0, len(metrics), MLFLOW_MAX_BATCH):
+                chunk = metrics[start:start + MLFLOW_MAX_BATCH]
+                try:
+                    self._client.log_batch(run_id, metrics=chunk)
+                    self.sent += len(chunk)
+                except Exception as e:
+                    self.failed += len(chunk)
+                    LOGGER.error(f"Failed to log {len(chunk)} metrics to MLflow: {e}")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    @property
+    def stats(self) -> dict:
+        return {"sent": self.sent, "dropped": self.dropped, "failed": self.failed, "queued": self._queue.qsize()}
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+def get_mlflow_sink(tracking_uri: Optional[str] = None) -> MLflowSink:
+    with _sinks_lock:
+        sink = _sinks.get(tracking_uri)
+        if sink is None:
+            sink = _sinks[tracking_uri] = MLflowSink(tracking_uri=tracking_uri)
+        return sink
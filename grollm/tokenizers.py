@@ -0,0 +1,103 @@
+import math
+from functools import lru_cache
+from typing import Callable
+
+class ContextWindowExceededError(ValueError):
+
+    def __init__(self, model: str, prompt_tokens: int, output_tokens: int, max_context: int):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.max_context = max_context
+        super().__init__(
+            f"Prompt of ~{prompt_tokens} tokens plus {output_tokens} output tokens exceeds the "
+            f"{max_context} token context window of {model}."
+        )
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """
+    Returns the tiktoken encoding for an OpenAI model, or None when tiktoken is not installed.
+    Encoders are expensive to build, so each one is created once per process.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base" if model.startswith(("gpt-4o", "o1")) else "cl100k_base")
+
+def message_text(message) -> str:
+    """
+    Text of a chat message whose content is either a string or a list of content blocks.
+    """
+    if isinstance(message, str):
+        return message
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+def estimate_tokens(text: str, chars_per_token: float) -> int:
+    return math.ceil(len(text) / chars_per_token)
+
+def count_openai_tokens(messages, model: str, chars_per_token: float = 4.0) -> int:
+    # Chat formatting overhead as documented by OpenAI: 3 tokens per message plus 3 to prime the reply.
+    encoding = get_encoding(model)
+    if encoding is None:
+        count = lambda text: estimate_tokens(text, chars_per_token)
+    else:
+        count = lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    if isinstance(messages, str):
+        return count(messages)
+
+    total = 3
+    for message in messages:
+        total += 3 + count(message_text(message)) + count(message.get("role", ""))
+        if message.get("name"):
+            total += 1 + count(message["name"])
+    return total
+
+def count_estimated_tokens(messages, chars_per_token: float, tokens_per_message: int = 4) -> int:
+    if isinstance(messages, str):
+        return estimate_tokens(messages, chars_per_token)
+    return sum(tokens_per_message + estimate_tokens(message_text(message), chars_per_token)
+               for message in messages)
+
+def truncate_text(text: str, max_tokens: int, count: Callable[[str], int]) -> str:
+    """
+    Keeps the end of `text`, which for prompts is usually the part that matters, dropping
+    characters from the front until it fits in `max_tokens`.
+    """
+    tokens = count(text)
+    while tokens > max_tokens and text:
+        keep = int(len(text) * max_tokens / tokens * 0.95)
+        text = text[len(text) - keep:] if keep > 0 else ""
+        tokens = count(text)
+    return text
+
+def truncate_messages(messages: list, max_tokens: int, count_messages: Callable[[list], int]) -> list:
+    """
+    Drops the oldest non-system messages, always keeping the last one, until the conversation
+    fits. If the last message alone is still too long its text is trimmed from the front.
+    """
+    messages = list(messages)
+    while count_messages(messages) > max_tokens:
+        droppable = [i for i, m in enumerate(messages[:-1]) if m.get("role") != "system"]
+        if not droppable:
+            break
+        del messages[droppable[0]]
+
+    excess = count_messages(messages) - max_tokens
+    last = messages[-1]
+    if excess > 0 and isinstance(last.get("content"), str):
+        own = count_messages([last])
+        budget = max(own - excess, 0)
+        trimmed = truncate_text(last["content"], budget, lambda text: count_messages([{**last, "content": text}]))
+        messages[-1] = {**last, "content": trimmed}
+
+    return messages
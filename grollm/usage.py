@@ -0,0 +1,104 @@
+import threading
+import weakref
+from collections import Counter
+
+class _Shard:
+
+    __slots__ = ("lock", "tokens", "cost")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = Counter()
+        self.cost = Counter()
+
+def flatten_usage(usage: dict, prefix: str = "") -> dict:
+    """
+    Keeps the numeric entries of a provider usage dict, flattening nested detail dicts such as
+    OpenAI's `prompt_tokens_details` into dotted keys.
+    """
+    flat = {}
+    for key, value in usage.items():
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, dict):
+            flat.update(flatten_usage(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+class _Owner:
+    """
+    Lives in a thread's local storage only, so it is released when that thread exits.
+    """
+
+def _retire(accumulator_ref, shard: _Shard):
+    accumulator = accumulator_ref()
+    if accumulator is not None:
+        accumulator._retire(shard)
+
+class UsageAccumulator:
+    """
+    Token and cost totals sharded per thread. Each thread only ever takes the lock of its own
+    shard, which is uncontended, so recording usage costs the same at any thread count.
+    `snapshot()` sums the shards on demand. When a thread exits its shard is folded into a base
+    shard, so the number of shards follows the live threads rather than every thread ever seen.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._base = _Shard()
+        self._shards = [self._base]
+        # Reentrant because a shard can be retired from any thread that drops the last reference.
+        self._shards_lock = threading.RLock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            self._local.owner = _Owner()
+            weakref.finalize(self._local.owner, _retire, weakref.ref(self), shard)
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard: _Shard):
+        with self._shards_lock:
+            with shard.lock, self._base.lock:
+                self._base.tokens.update(shard.tokens)
+                self._base.cost.update(shard.cost)
+            self._shards.remove(shard)
+
+    def add(self, tokens: dict, prices: dict = None):
+        """
+        Records one request. Its cost is charged right away from `prices`, a per-token price per
+        usage key, so totals never have to be re-multiplied.
+        """
+        shard = self._shard()
+        with shard.lock:
+            for key, value in tokens.items():
+                shard.tokens[key] += value
+            if prices:
+                for key, price in prices.items():
+                    value = tokens.get(key)
+                    if value:
+                        shard.cost[key] += value * price
+
+    def snapshot(self) -> tuple:
+        """
+        Fresh (tokens, cost) Counters; changing them does not change the totals.
+        """
+        tokens, cost = Counter(), Counter()
+        # Held throughout so that a shard being folded into the base is counted exactly once.
+        with self._shards_lock:
+            for shard in self._shards:
+                with shard.lock:
+                    tokens.update(shard.tokens)
+                    cost.update(shard.cost)
+        return tokens, cost
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in self._shards:
+                with shard.lock:
+                    shard.tokens.clear()
+                    shard.cost.clear()
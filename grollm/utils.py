@@ -1,5 +1,5 @@
-import pip
 from collections import Counter
+from functools import lru_cache
 
 def import_or_install(package = "mlflow"):
 
@@ -7,6 +7,8 @@ def import_or_install(package = "mlflow"):
         return __import__(package)
     
     except ImportError:
+        import pip
+
         if package == "mlflow":
             pip.main(['install', 'mlflow==2.15.1'])
         else:
@@ -14,6 +16,12 @@ def import_or_install(package = "mlflow"):
         
         return __import__(package)
         
+@lru_cache(maxsize=None)
+def load_env():
+    # Read .env once, on first wrapper construction rather than at import time.
+    from dotenv import load_dotenv
+    load_dotenv()
+
 def multiply_counters(counter1: Counter, counter2: Counter) -> Counter:
 
     common_keys = counter1.keys() & counter2.keys()
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.batch import aiter_prompts, iter_prompts
+from grollm.openai_gro import OpenAI_Grollm
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeProviderServer(completion_tokens=8, prompt_tokens=80) as server:
+        yield server
+
+def _llm(server):
+    return OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1")
+
+def test_run_batch_maps_results_and_charges_batch_prices(server):
+    llm = _llm(server)
+    results = llm.run_batch({"q1": "one", "q2": "two"}, poll_interval=0.01, timeout=5)
+
+    assert set(results) == {"q1", "q2"}
+    assert all(result.ok and result.response for result in results.values())
+    assert llm.tokens_used["total_tokens"] == 176
+    assert llm.cumulative_cost["prompt_tokens"] == pytest.approx(160 * llm._batch_prices["prompt_tokens"])
+
+def test_rereading_results_charges_each_result_once(server):
+    llm = _llm(server)
+    job = llm.wait_batch(llm.submit_batch(["a", "b", "c"]), poll_interval=0.01, timeout=5)
+
+    results = llm.batch_results(job)
+    next(results)
+    results.close()
+    assert llm.tokens_used["total_tokens"] == 88
+
+    assert len(list(llm.batch_results(job))) == 3
+    assert llm.tokens_used["total_tokens"] == 264
+    list(llm.batch_results(job))
+    assert llm.tokens_used["total_tokens"] == 264
+
+class Sender:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def __call__(self, prompt: int) -> str:
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.01 * (prompt % 3))
+        with self.lock:
+            self.in_flight -= 1
+        if prompt == 4:
+            raise ValueError("bad prompt")
+        return f"reply {prompt}"
+
+def test_fan_out_is_bounded_ordered_and_keeps_failures():
+    send = Sender()
+    results = list(iter_prompts(send, iter(range(12)), max_concurrency=3))
+
+    assert [result.index for result in results] == list(range(12))
+    assert send.peak <= 3
+    assert isinstance(results[4].error, ValueError) and not results[4].ok
+    assert all(result.response == f"reply {result.index}" for result in results if result.index != 4)
+
+def test_unordered_fan_out_yields_every_result():
+    results = list(iter_prompts(Sender(), range(12), max_concurrency=4, ordered=False))
+    assert sorted(result.index for result in results) == list(range(12))
+
+def test_async_fan_out_is_bounded_and_ordered_by_default():
+    in_flight, peak = 0, 0
+
+    async def asend(prompt: int) -> str:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 * (prompt % 3))
+        in_flight -= 1
+        return f"reply {prompt}"
+
+    async def main():
+        return [result async for result in aiter_prompts(asend, range(10), max_concurrency=4)]
+
+    results = asyncio.run(main())
+    assert [result.response for result in results] == [f"reply {i}" for i in range(10)]
+    assert peak == 4
+
+def test_wrapper_fan_out_defaults_to_input_order(server):
+    llm = _llm(server)
+    prompts = [f"prompt {i}" for i in range(6)]
+    assert [result.prompt for result in llm.iter_prompts(prompts, max_concurrency=3)] == prompts
+    assert [result.prompt for result in llm.send_prompts(prompts)] == prompts
@@ -0,0 +1,55 @@
+import time
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.cache import InMemoryCache, SQLiteCache, make_cache_key
+from grollm.openai_gro import OpenAI_Grollm
+
+ENTRY = {"response": "hi", "usage": {"total_tokens": 3}}
+
+def test_cache_key_ignores_kwarg_order_but_not_values():
+    messages = [{"role": "user", "content": "hi"}]
+    key = make_cache_key("OpenAI", "m", messages, {"temperature": 0, "top_p": 1})
+    assert key == make_cache_key("OpenAI", "m", messages, {"top_p": 1, "temperature": 0})
+    assert key != make_cache_key("OpenAI", "m", messages, {"temperature": 1, "top_p": 1})
+    assert key != make_cache_key("OpenAI", "other", messages, {"temperature": 0, "top_p": 1})
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(maxsize=2)
+    cache.set("a", ENTRY)
+    cache.set("b", ENTRY)
+    assert cache.get("a") == ENTRY
+    cache.set("c", ENTRY)
+    assert cache.get("b") is None and cache.get("a") == ENTRY and len(cache) == 2
+
+def test_memory_cache_expires_entries():
+    cache = InMemoryCache(ttl=0.05)
+    cache.set("a", ENTRY)
+    assert cache.get("a") == ENTRY
+    time.sleep(0.06)
+    assert cache.get("a") is None and len(cache) == 0
+
+def test_sqlite_cache_survives_reopening_and_expires(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path)
+    cache.set("a", ENTRY)
+    cache.close()
+
+    cache = SQLiteCache(path, ttl=0.05)
+    assert cache.get("a") == ENTRY
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    cache.set("b", ENTRY)
+    cache.clear()
+    assert cache.get("b") is None
+    cache.close()
+
+def test_wrapper_serves_repeats_from_the_cache():
+    with FakeProviderServer(prompt_tokens=10, completion_tokens=2) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1", cache=InMemoryCache())
+        first = llm.send_prompt("hi")
+        assert llm.send_prompt("hi") == first
+        assert server.requests == 1
+
+        llm.send_prompt("hi", temperature=0.5)
+        llm.send_prompt("hi", fresh=True)
+        assert server.requests == 3
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from grollm import clients
+from grollm.clients import ClientConfig, close_clients, shared_async_client, shared_client
+
+class SDKClient:
+
+    def __init__(self, http_client):
+        self.http_client = http_client
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self.http_client.close()
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Keeps the pooled clients of other tests' wrappers out of reach of close_clients().
+    monkeypatch.setattr(clients, "_clients", {})
+
+def test_wrappers_with_the_same_settings_share_one_client():
+    first = shared_client("Test", "https://a.example", "key-1", SDKClient)
+    assert shared_client("Test", "https://a.example", "key-1", SDKClient) is first
+    assert shared_client("Test", "https://b.example", "key-1", SDKClient) is not first
+    assert shared_client("Test", "https://a.example", "key-2", SDKClient) is not first
+    assert shared_client("Test", "https://a.example", "key-1", SDKClient, ClientConfig(max_connections=5)) is not first
+    assert isinstance(first.http_client, httpx.Client)
+    close_clients()
+
+def test_registry_keeps_only_a_fingerprint_of_the_key():
+    shared_client("Test", None, "sk-secret-value", SDKClient)
+    assert not any("sk-secret-value" in str(key) for key in clients._clients)
+    close_clients()
+
+def test_close_clients_closes_and_forgets_every_client():
+    client = shared_client("Test", None, "key", SDKClient)
+    close_clients()
+    assert client.closed and client.http_client.is_closed
+    assert shared_client("Test", None, "key", SDKClient) is not client
+    close_clients()
+
+def test_async_clients_are_shared_per_event_loop():
+    async def get():
+        first = shared_async_client("Test", None, "key", SDKClient)
+        assert shared_async_client("Test", None, "key", SDKClient) is first
+        assert isinstance(first.http_client, httpx.AsyncClient)
+        await first.http_client.aclose()
+        return first
+
+    assert asyncio.run(get()) is not asyncio.run(get())
+
+def test_pool_limits_follow_the_config():
+    config = ClientConfig(max_connections=7, max_keepalive_connections=3, timeout=5.0, connect_timeout=1.0)
+    limits, timeout = config.limits(), config.timeouts()
+    assert (limits.max_connections, limits.max_keepalive_connections) == (7, 3)
+    assert (timeout.read, timeout.connect) == (5.0, 1.0)
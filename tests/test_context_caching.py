@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+import google.generativeai as gemini
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.context_caching import ContextCache, to_gemini_contents
+from grollm.tokenizers import count_estimated_tokens
+
+HISTORY = [{"role": "system", "content": "You answer from the attached manual. " + "manual " * 200},
+           {"role": "user", "content": "What does chapter one cover?"},
+           {"role": "assistant", "content": "Installation."}]
+
+def _count(messages) -> int:
+    return count_estimated_tokens(messages, chars_per_token=4.0)
+
+@pytest.fixture
+def server():
+    with FakeProviderServer(prompt_tokens=10, completion_tokens=2) as server:
+        # The Gemini SDK has no base_url; its REST transport accepts a plain-HTTP endpoint instead.
+        gemini.configure(api_key="fake", transport="rest", client_options={"api_endpoint": server.url})
+        yield server
+
+def test_messages_convert_to_gemini_contents():
+    system, contents = to_gemini_contents([*HISTORY, {"role": "user", "parts": ["raw part"]}])
+    assert system == HISTORY[0]["content"]
+    assert [content["role"] for content in contents] == ["user", "model", "user"]
+    assert contents[1]["parts"] == ["Installation."] and contents[2]["parts"] == ["raw part"]
+    assert to_gemini_contents("hi") == (None, "hi")
+
+def test_short_prefixes_are_sent_as_usual(server):
+    cache = ContextCache(min_tokens=10_000)
+    messages = [*HISTORY, {"role": "user", "content": "And chapter two?"}]
+    assert cache.resolve("models/gemini-1.5-flash", messages, _count) == (None, messages)
+    assert not server.httpd.state.cached_contents
+
+def test_prefix_is_cached_once_and_reused(server):
+    cache = ContextCache(min_tokens=100)
+    first, sent = cache.resolve("models/gemini-1.5-flash", [*HISTORY, {"role": "user", "content": "Two?"}], _count)
+    assert sent == [{"role": "user", "content": "Two?"}]
+    second, _ = cache.resolve("models/gemini-1.5-flash", [*HISTORY, {"role": "user", "content": "Three?"}], _count)
+
+    assert first.name == second.name and list(server.httpd.state.cached_contents) == [first.name]
+    assert cache.stats == {"created": 1, "reused": 1, "live": 1}
+
+    cache.clear()
+    assert not server.httpd.state.cached_contents and cache.stats["live"] == 0
+
+def test_handle_close_to_expiry_is_extended(server):
+    cache = ContextCache(ttl=600, min_tokens=100, refresh_margin=600)
+    messages = [*HISTORY, {"role": "user", "content": "Two?"}]
+    cached, _ = cache.resolve("models/gemini-1.5-flash", messages, _count)
+    entry = server.httpd.state.cached_contents[cached.name]
+    entry["expires"] -= 300
+    expires = entry["expires"]
+
+    assert cache.resolve("models/gemini-1.5-flash", messages, _count)[0].name == cached.name
+    assert entry["expires"] > expires + 200
+    assert cache.stats["created"] == 1 and cache.stats["reused"] == 1
+
+def test_wrapper_recreates_cached_content_the_server_dropped(server):
+    from grollm.gemini_gro import Gemini_Grollm
+
+    llm = Gemini_Grollm(api_key="fake", model="gemini-1.5-flash", context_cache=ContextCache(min_tokens=100))
+    gemini.configure(api_key="fake", transport="rest", client_options={"api_endpoint": server.url})
+
+    assert llm.send_prompt([*HISTORY, {"role": "user", "content": "Two?"}])
+    server.httpd.state.cached_contents.clear()
+    assert llm.send_prompt([*HISTORY, {"role": "user", "content": "Three?"}])
+
+    assert llm.context_cache.stats["created"] == 2
+    assert len(server.httpd.state.cached_contents) == 1
+    assert llm.cumulative_tokens["cached_prompt_tokens"] > 0
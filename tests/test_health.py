@@ -0,0 +1,80 @@
+import threading
+import time
+
+from grollm.health import HealthMonitor
+
+class Probe:
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+
+def test_probe_result_is_cached_for_its_ttl():
+    probe = Probe()
+    monitor = HealthMonitor(probe, ttl=0.2, failure_ttl=0.05)
+    assert monitor.check().healthy and monitor.check().healthy
+    assert probe.calls == 1
+
+    time.sleep(0.25)
+    assert monitor.check().healthy and probe.calls == 2
+
+    probe.error = ConnectionError("down")
+    assert monitor.check(force=True).error == "ConnectionError: down"
+    assert monitor.check().healthy is False and probe.calls == 3
+    time.sleep(0.1)
+    monitor.check()
+    assert probe.calls == 4
+
+def test_concurrent_checks_share_one_probe():
+    probe = Probe()
+    monitor = HealthMonitor(lambda: (time.sleep(0.1), probe()))
+    threads = [threading.Thread(target=monitor.check) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert probe.calls == 1
+
+def test_traffic_updates_the_status_without_probing():
+    probe = Probe()
+    monitor = HealthMonitor(probe, failure_threshold=2)
+    monitor.record_success()
+    assert monitor.status.source == "traffic" and monitor.check().healthy
+
+    monitor.record_failure(TimeoutError("slow"))
+    assert monitor.check().healthy
+    monitor.record_failure(TimeoutError("slow"))
+    assert monitor.check().healthy is False and monitor.info["consecutive_failures"] == 2
+
+    monitor.record_success()
+    monitor.record_failure(PermissionError("bad key"), fatal=True)
+    assert monitor.check().error == "PermissionError: bad key"
+    assert probe.calls == 0
+
+def test_refresher_starts_on_first_use_and_stops():
+    probe = Probe()
+    monitor = HealthMonitor(probe, ttl=0.1, refresh=0.05)
+    time.sleep(0.15)
+    assert probe.calls == 0 and not monitor.info["refreshing"]
+
+    monitor.check()
+    time.sleep(0.3)
+    assert probe.calls >= 2 and monitor.info["refreshing"]
+
+    monitor.stop()
+    calls = probe.calls
+    monitor.check(force=True)
+    time.sleep(0.15)
+    assert probe.calls == calls + 1 and not monitor.info["refreshing"]
+
+def test_wrapper_refresher_waits_for_the_subclass_to_finish_initialising():
+    from grollm.openai_gro import OpenAI_Grollm
+
+    llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url="http://127.0.0.1:9/v1", health_refresh=0.01)
+    assert not llm.health_info["refreshing"]
+    llm.health.stop()
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from grollm.hedging import Hedger, LatencyTracker
+
+class StubLLM:
+
+    provider_name = "Stub"
+
+    def __init__(self, delays: list = None, default: float = 0.0):
+        self.delays = list(delays or [])
+        self.default = default
+        self.cost_dict = Counter()
+        self._lock = threading.Lock()
+        self.in_flight = self.peak = 0
+
+    def send_prompt(self, prompt, **kwargs) -> str:
+        with self._lock:
+            delay = self.delays.pop(0) if self.delays else self.default
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(delay)
+        with self._lock:
+            self.in_flight -= 1
+        return f"{prompt} after {delay}"
+
+def test_latency_tracker_percentiles_follow_the_window():
+    tracker = LatencyTracker(window=3)
+    for latency in (5.0, 1.0, 2.0, 3.0):
+        tracker.add(latency)
+    assert len(tracker) == 3
+    assert tracker.percentile(0) == 1.0 and tracker.percentile(99) == 3.0
+
+def test_pool_size_does_not_cap_concurrency():
+    llm = StubLLM(default=0.2)
+    hedger = Hedger(llm, max_workers=2, min_samples=1, min_delay=1.0, burst=100)
+    hedger.tracker.add(0.2)
+    hedger.budget._credits = 100
+
+    threads = [threading.Thread(target=hedger.send_prompt, args=("hi",)) for _ in range(8)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - start < 0.6
+    assert llm.peak == 8
+    assert hedger.stats["saturated"] >= 6 and hedger.stats["busy_workers"] == 0
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    llm = StubLLM(delays=[1.0, 0.0])
+    hedger = Hedger(llm, min_samples=1, min_delay=0.05)
+    hedger.tracker.add(0.01)
+    hedger.budget._credits = 5
+
+    start = time.monotonic()
+    assert hedger.send_prompt("hi") == "hi after 0.0"
+    assert time.monotonic() - start < 0.5
+    assert hedger.stats["hedged"] == 1 and hedger.stats["hedge_wins"] == 1
+
+def test_unhedgeable_requests_run_on_the_caller_thread():
+    callers = []
+
+    class Recorder(StubLLM):
+        def send_prompt(self, prompt, **kwargs):
+            callers.append(threading.current_thread())
+            return prompt
+
+    hedger = Hedger(Recorder(), min_samples=20)
+    assert hedger.send_prompt("hi") == "hi"
+    assert callers == [threading.current_thread()] and len(hedger.tracker) == 1
+
+def test_async_loser_finishes_and_is_not_cancelled():
+    finished = []
+
+    class AsyncStub(StubLLM):
+        async def asend_prompt(self, prompt, fresh=False, **kwargs):
+            delay = 0.3 if not fresh else 0.0
+            await asyncio.sleep(delay)
+            finished.append(fresh)
+            return f"{prompt} fresh={fresh}"
+
+    async def main():
+        hedger = Hedger(AsyncStub(), min_samples=1, min_delay=0.05)
+        hedger.tracker.add(0.01)
+        hedger.budget._credits = 5
+        response = await hedger.asend_prompt("hi")
+        await asyncio.sleep(0.4)
+        return hedger, response
+
+    hedger, response = asyncio.run(main())
+    assert response == "hi fresh=True"
+    assert finished == [True, False]
+    assert hedger.stats["hedge_wins"] == 1 and not hedger._background
+
+def test_hedge_to_a_coalescing_wrapper_sends_a_second_request():
+    from benchmarks.fake_server import FakeProviderServer
+    from grollm.cache import InMemoryCache
+    from grollm.openai_gro import OpenAI_Grollm
+
+    with FakeProviderServer(latency=0.3, prompt_tokens=10, completion_tokens=2) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1",
+                            coalesce=True, cache=InMemoryCache())
+        hedger = Hedger(llm, min_samples=1, min_delay=0.05)
+        hedger.tracker.add(0.01)
+        hedger.budget._credits = 5
+
+        hedger.send_prompt("hi")
+        deadline = time.monotonic() + 5
+        while llm.tokens_used.get("total_tokens") != 24 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert server.requests == 2 and hedger.stats["hedged"] == 1
+        assert llm.tokens_used["total_tokens"] == 24
+        assert llm.coalesce_info["coalesced"] == 0
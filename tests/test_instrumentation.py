@@ -0,0 +1,107 @@
+import asyncio
+
+import openai
+import pytest
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.instrumentation import (InMemorySpanExporter, MetricsRegistry, current_span, disable_instrumentation,
+                                    enable_instrumentation, get_instrumentation)
+from grollm.openai_gro import OpenAI_Grollm
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    enable_instrumentation(exporters=[exporter], registry=MetricsRegistry())
+    yield exporter
+    disable_instrumentation()
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeProviderServer(prompt_tokens=10, completion_tokens=4) as server:
+        yield server
+
+def _llm(url: str) -> OpenAI_Grollm:
+    return OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=url + "/v1")
+
+def test_send_prompt_span_has_request_and_usage_attributes(exporter, server):
+    _llm(server.url).send_prompt("hi")
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "grollm.send_prompt" and span.error is None
+    assert span.attributes["gen_ai.system"] == "OpenAI"
+    assert span.attributes["gen_ai.request.model"] == "gpt-4o-mini"
+    assert span.attributes["gen_ai.usage.input_tokens"] == 10
+    assert span.attributes["gen_ai.usage.output_tokens"] == 4
+    assert span.duration >= 0
+    assert current_span() is None
+
+def test_span_nested_in_an_outer_request_restores_the_outer_span(exporter, server):
+    llm = _llm(server.url)
+    with get_instrumentation().request(llm, "outer") as outer:
+        llm.send_prompt("hi")
+        assert current_span() is outer
+
+    inner, finished_outer = exporter.get_finished_spans()
+    assert inner.name == "grollm.send_prompt" and finished_outer is outer
+    assert outer.start_time <= inner.start_time and inner.end_time <= outer.end_time
+    assert "gen_ai.usage.input_tokens" not in outer.attributes
+
+def test_concurrent_async_requests_get_their_own_spans(exporter, server):
+    llm = _llm(server.url)
+
+    async def main():
+        await asyncio.gather(*(llm.asend_prompt(f"hi {i}") for i in range(3)))
+        assert current_span() is None
+
+    asyncio.run(main())
+
+    spans = exporter.get_finished_spans()
+    assert [span.name for span in spans] == ["grollm.send_prompt"] * 3
+    assert all(span.attributes["gen_ai.usage.input_tokens"] == 10 for span in spans)
+    assert all(span.attributes["gen_ai.usage.output_tokens"] == 4 for span in spans)
+
+def test_failed_call_marks_the_span_and_counts_the_error(exporter):
+    with FakeProviderServer(error_rate=1.0, error_status=400) as server:
+        llm = _llm(server.url)
+        with pytest.raises(openai.BadRequestError):
+            llm.send_prompt("hi")
+        with pytest.raises(openai.BadRequestError):
+            asyncio.run(llm.asend_prompt("hi"))
+
+    spans = exporter.get_finished_spans()
+    assert len(spans) == 2
+    assert all(isinstance(span.error, openai.BadRequestError) for span in spans)
+    assert all(span.attributes["error.type"] == "BadRequestError" for span in spans)
+
+    instrumentation = get_instrumentation()
+    labels = {"provider": "OpenAI", "model": "gpt-4o-mini", "operation": "send_prompt"}
+    assert instrumentation.requests.value(**labels, status="error") == 2
+    assert instrumentation.requests.value(**labels, status="ok") == 0
+    assert instrumentation.errors.value(**labels, error="BadRequestError") == 2
+    assert instrumentation.in_flight.value(provider="OpenAI", model="gpt-4o-mini") == 0
+
+def test_counters_and_histograms_follow_the_requests(exporter, server):
+    llm = _llm(server.url)
+    llm.send_prompt("one")
+    asyncio.run(llm.asend_prompt("two"))
+
+    instrumentation = get_instrumentation()
+    labels = {"provider": "OpenAI", "model": "gpt-4o-mini"}
+    assert instrumentation.requests.value(**labels, operation="send_prompt", status="ok") == 2
+    assert instrumentation.tokens.value(**labels, type="prompt") == 20
+    assert instrumentation.tokens.value(**labels, type="completion") == 8
+    assert instrumentation.latency.count(**labels, operation="send_prompt") == 2
+    assert instrumentation.tokens_per_second.count(**labels) == 2
+    assert instrumentation.in_flight.value(**labels) == 0
+
+    text = instrumentation.registry.render()
+    assert 'grollm_requests_total{provider="OpenAI",model="gpt-4o-mini",operation="send_prompt",status="ok"} 2' in text
+    assert 'grollm_request_duration_seconds_count{provider="OpenAI",model="gpt-4o-mini",operation="send_prompt"} 2' in text
+
+def test_disabled_instrumentation_records_nothing(server):
+    exporter = InMemorySpanExporter()
+    enable_instrumentation(exporters=[exporter])
+    disable_instrumentation()
+
+    assert _llm(server.url).send_prompt("hi")
+    assert exporter.get_finished_spans() == [] and current_span() is None
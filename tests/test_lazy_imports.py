@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import grollm
+
+def test_importing_the_package_loads_no_provider_sdk():
+    code = ("import sys, grollm; "
+            "print(sorted(m for m in ('openai', 'anthropic', 'google.generativeai', 'grollm.base') if m in sys.modules))")
+    root = os.path.dirname(os.path.dirname(grollm.__file__))
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+def test_names_resolve_on_first_access_and_are_cached():
+    from grollm.openai_gro import OpenAI_Grollm
+
+    assert grollm.OpenAI_Grollm is OpenAI_Grollm
+    assert vars(grollm)["OpenAI_Grollm"] is OpenAI_Grollm
+
+def test_every_exported_name_resolves():
+    assert set(grollm.__all__) == set(grollm._LAZY_IMPORTS) | {"__version__"}
+    assert set(grollm._LAZY_IMPORTS) <= set(dir(grollm))
+    for name in grollm._LAZY_IMPORTS:
+        assert getattr(grollm, name) is not None
+
+def test_unknown_names_raise_attribute_error():
+    with pytest.raises(AttributeError):
+        grollm.NotAProvider
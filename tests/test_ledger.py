@@ -0,0 +1,108 @@
+import multiprocessing
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from grollm.ledger import UsageLedger
+
+def _record_in_child(ledger, n):
+    for _ in range(n):
+        ledger.record("openai", "gpt-4o-mini", {"prompt_tokens": 3, "completion_tokens": 1}, {"prompt_tokens": 0.5})
+    # A writer that inherited SQLite's locks mid-call from the parent never finishes a flush.
+    assert ledger.flush(timeout=5.0)
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "ledger.db"), flush_interval=60.0, compact_interval=3600.0, read_ttl=60.0)
+    yield ledger
+    ledger.close()
+
+def test_totals_include_other_processes(ledger):
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        pytest.skip("needs fork")
+
+    # The parent has already started its writer, which forked workers must not inherit.
+    ledger.record("openai", "gpt-4o-mini", {"prompt_tokens": 3, "completion_tokens": 1}, {"prompt_tokens": 0.5})
+    workers = [context.Process(target=_record_in_child, args=(ledger, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+
+    ledger.flush()
+    tokens, cost = ledger.totals()
+    assert tokens == {"prompt_tokens": 303, "completion_tokens": 101}
+    assert cost == {"prompt_tokens": pytest.approx(151.5)}
+
+def test_reads_are_cached_until_flush(ledger):
+    ledger.record("openai", "gpt-4o", {"total_tokens": 5})
+    assert ledger.totals()[0] == {}
+    ledger.flush()
+    assert ledger.totals()[0] == {"total_tokens": 5}
+
+def test_compaction_keeps_totals_and_empties_the_log(ledger):
+    for model, tokens in [("gpt-4o", 5), ("gpt-4o", 7), ("gpt-4o-mini", 11)]:
+        ledger.record("openai", model, {"total_tokens": tokens})
+        ledger.flush()
+    ledger.compact()
+    ledger.record("openai", "gpt-4o", {"total_tokens": 1})
+    ledger.flush()
+
+    assert ledger.totals()[0] == {"total_tokens": 24}
+    assert ledger.totals("openai", "gpt-4o")[0] == {"total_tokens": 13}
+    conn = sqlite3.connect(ledger.path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM usage_log").fetchone() == (1,)
+    finally:
+        conn.close()
+
+def test_reset_clears_every_row(ledger):
+    ledger.record("openai", "gpt-4o", {"total_tokens": 5})
+    ledger.flush()
+    ledger.compact()
+    ledger.reset()
+    assert ledger.totals()[0] == {}
+
+def test_totals_are_copies(ledger):
+    ledger.record("openai", "gpt-4o", {"total_tokens": 5})
+    ledger.flush()
+    tokens, cost = ledger.totals()
+    tokens["total_tokens"] += 100
+    assert ledger.totals()[0] == {"total_tokens": 5}
+
+def test_fork_does_not_wait_for_another_process_write(ledger):
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        pytest.skip("needs fork")
+
+    # Another process holds the write lock, so this process's compaction keeps retrying.
+    blocker = subprocess.Popen(
+        [sys.executable, "-c", "import sqlite3, sys; conn = sqlite3.connect(sys.argv[1], isolation_level=None); "
+         "conn.execute('BEGIN IMMEDIATE'); print(flush=True); sys.stdin.readline()", ledger.path],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    blocker.stdout.readline()
+    compacting = threading.Thread(target=ledger.compact)
+    compacting.start()
+    time.sleep(0.1)
+    try:
+        start = time.monotonic()
+        worker = context.Process(target=_record_in_child, args=(ledger, 1))
+        worker.start()
+        forked = time.monotonic() - start
+        time.sleep(0.2)
+    finally:
+        blocker.communicate("\n")
+    compacting.join(10)
+    worker.join(10)
+
+    assert forked < 0.5 and worker.exitcode == 0
+    ledger.flush()
+    assert ledger.totals()[0] == {"prompt_tokens": 3, "completion_tokens": 1}
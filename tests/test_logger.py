@@ -0,0 +1,54 @@
+import logging
+import logging.handlers
+import queue
+import time
+
+from grollm import logger
+from grollm.logger import _parse_log_level, _parse_payload_limit, truncated
+
+def test_long_message_list_is_cut_before_rendering():
+    messages = [{"role": "user", "content": "x" * 50_000} for _ in range(100)]
+    start = time.perf_counter()
+    text = str(truncated(messages, limit=200))
+    assert time.perf_counter() - start < 0.01
+    assert len(text) <= 200 + len("... [truncated]")
+    assert text.startswith("[{'role': 'user', 'content': 'xxx")
+
+def test_short_values_render_unchanged():
+    assert str(truncated("hello", limit=10)) == "hello"
+    assert str(truncated([{"role": "user", "content": "hi"}], limit=100)) == "[{'role': 'user', 'content': 'hi'}]"
+    assert str(truncated("a" * 15, limit=10)) == "a" * 10 + "... [5 more chars]"
+
+def test_malformed_payload_limit_falls_back(monkeypatch):
+    monkeypatch.setenv("GROLLM_LOG_PAYLOAD_CHARS", "1k")
+    limit, error = _parse_payload_limit()
+    assert limit == 1000 and "1k" in error
+    monkeypatch.setenv("GROLLM_LOG_PAYLOAD_CHARS", "250")
+    assert _parse_payload_limit() == (250, None)
+
+def test_truncated_uses_the_configured_limit(monkeypatch):
+    monkeypatch.setattr(logger, "_payload_limit", 4)
+    assert str(truncated("abcdefgh")) == "abcd... [4 more chars]"
+
+def test_malformed_log_level_falls_back(monkeypatch):
+    monkeypatch.setenv("GROLLM_LOG_LEVEL", "verbose")
+    level, error = _parse_log_level()
+    assert level == "INFO" and "VERBOSE" in error
+    monkeypatch.setenv("GROLLM_LOG_LEVEL", "debug")
+    assert _parse_log_level() == ("DEBUG", None)
+
+def test_queued_record_is_rendered_before_the_caller_changes_its_messages():
+    log_queue = queue.SimpleQueue()
+    log = logging.getLogger("grollm.tests.queue")
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+    messages = [{"role": "user", "content": "first"}]
+    try:
+        log.debug("Messages: %s", truncated(messages))
+        messages.append({"role": "user", "content": "second"})
+    finally:
+        log.handlers.clear()
+
+    record = log_queue.get_nowait()
+    assert record.getMessage() == "Messages: [{'role': 'user', 'content': 'first'}]" and record.args is None
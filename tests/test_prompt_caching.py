@@ -0,0 +1,42 @@
+from grollm.prompt_caching import EPHEMERAL, add_cache_breakpoints, split_system_messages
+from grollm.tokenizers import count_estimated_tokens
+
+LONG = "policy " * 1000
+
+def _count(messages) -> int:
+    return count_estimated_tokens(messages, chars_per_token=4.0)
+
+def test_system_messages_move_to_top_level_blocks():
+    system, rest = split_system_messages([{"role": "system", "content": "be brief"},
+                                          {"role": "user", "content": "hi"}])
+    assert system == [{"type": "text", "text": "be brief"}]
+    assert rest == [{"role": "user", "content": "hi"}]
+    assert split_system_messages("hi") == ([], "hi")
+
+def test_long_system_prompt_and_history_get_breakpoints():
+    params = {"system": LONG, "messages": [{"role": "user", "content": "first"},
+                                           {"role": "assistant", "content": "answer"},
+                                           {"role": "user", "content": "follow up"}]}
+    params = add_cache_breakpoints(params, _count)
+
+    assert params["system"] == [{"type": "text", "text": LONG, "cache_control": EPHEMERAL}]
+    assert params["messages"][1]["content"] == [{"type": "text", "text": "answer", "cache_control": EPHEMERAL}]
+    assert params["messages"][0]["content"] == "first" and params["messages"][2]["content"] == "follow up"
+
+def test_short_prefixes_are_left_alone():
+    params = {"system": "be brief", "messages": [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"},
+                                                 {"role": "user", "content": "c"}]}
+    assert add_cache_breakpoints(dict(params), _count) == params
+
+def test_caller_breakpoints_are_respected():
+    own = [{"type": "text", "text": "mine", "cache_control": EPHEMERAL}]
+    params = {"system": LONG, "messages": [{"role": "user", "content": own}, {"role": "assistant", "content": LONG},
+                                           {"role": "user", "content": "next"}]}
+    assert add_cache_breakpoints(dict(params), _count) == params
+
+def test_breakpoint_goes_on_the_last_block_of_a_block_list():
+    blocks = [{"type": "text", "text": LONG}, {"type": "text", "text": "tail"}]
+    params = add_cache_breakpoints({"messages": [{"role": "user", "content": blocks},
+                                                 {"role": "user", "content": "now"}]}, _count)
+    assert params["messages"][0]["content"] == [blocks[0], {**blocks[1], "cache_control": EPHEMERAL}]
+    assert "cache_control" not in blocks[1]
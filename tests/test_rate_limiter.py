@@ -0,0 +1,41 @@
+import time
+
+from grollm import rate_limiter
+from grollm.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+
+def test_bucket_paces_reservations_at_the_refill_rate():
+    bucket = TokenBucket(capacity=2, refill_per_second=10)
+    assert bucket.reserve(1) == 0.0 and bucket.reserve(1) == 0.0
+    assert abs(bucket.reserve(1) - 0.1) < 0.01
+    assert abs(bucket.reserve(1) - 0.2) < 0.01
+
+def test_unused_reserved_tokens_are_given_back():
+    limiter = RateLimiter(tpm=600, utilization=1.0, burst_seconds=10)
+    reservation = limiter.reserve(80)
+    assert reservation.wait == 0.0 and limiter.tokens.available < 21
+    reservation.settle(30)
+    assert 69 < limiter.tokens.available < 71
+    reservation.settle(0)
+    assert limiter.tokens.available < 71
+
+def test_acquire_waits_once_the_burst_is_spent():
+    limiter = RateLimiter(rpm=600, utilization=1.0, burst_seconds=0.1)
+    limiter.acquire(0)
+    start = time.monotonic()
+    limiter.acquire(0)
+    assert time.monotonic() - start >= 0.08
+
+def test_registry_shares_a_limiter_per_scope_and_limits(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(rate_limiter, "_registry", {})
+    monkeypatch.setattr(rate_limiter.LOGGER, "warning", warnings.append)
+
+    first = get_rate_limiter("OpenAI", "gpt-4o", rpm=100, tpm=1000)
+    assert get_rate_limiter("OpenAI", "gpt-4o", rpm=100, tpm=1000) is first
+    assert get_rate_limiter("OpenAI", "gpt-4o-mini", rpm=50) is not first
+    assert not warnings
+
+    other = get_rate_limiter("OpenAI", "gpt-4o", rpm=10)
+    assert other is not first and (other.rpm, other.tpm) == (10, None)
+    assert get_rate_limiter("OpenAI", "gpt-4o", rpm=100, tpm=1000) is first
+    assert len(warnings) == 1 and "gpt-4o" in warnings[0]
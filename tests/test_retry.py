@@ -0,0 +1,61 @@
+import time
+from email.utils import formatdate
+
+import openai
+import pytest
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.openai_gro import OpenAI_Grollm
+from grollm.retry import RetryBudget, RetryPolicy, parse_retry_after
+
+def test_backoff_is_jittered_capped_and_follows_retry_after():
+    policy = RetryPolicy(base_delay=0.5, max_delay=2.0, max_retry_after=5.0, budget=None)
+    assert all(0 <= policy.backoff(1) <= 1.0 for _ in range(50))
+    assert all(0 <= policy.backoff(10) <= 2.0 for _ in range(50))
+    assert policy.backoff(0, retry_after=3.0) == 3.0
+    assert policy.backoff(0, retry_after=90.0) == 5.0
+    assert policy.backoff(0, retry_after=-1.0) == 0.0
+
+def test_policy_stops_at_max_retries():
+    policy = RetryPolicy(max_retries=2, budget=None)
+    assert policy.allow_retry(0) and policy.allow_retry(1)
+    assert not policy.allow_retry(2)
+
+def test_budget_caps_retries_at_a_share_of_requests():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_balance=2.0)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+
+    for _ in range(4):
+        budget.record_request()
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+
+def test_budget_refills_slowly_without_traffic():
+    budget = RetryBudget(ratio=0.0, min_per_second=20.0, max_balance=1.0)
+    assert budget.try_spend() and not budget.try_spend()
+    time.sleep(0.06)
+    assert budget.try_spend()
+
+def test_parse_retry_after_headers():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after({"retry-after-ms": "250", "retry-after": "9"}) == 0.25
+    assert parse_retry_after({"retry-after": "3"}) == 3.0
+    assert 8 < parse_retry_after({"retry-after": formatdate(time.time() + 10, usegmt=True)}) <= 10
+    assert parse_retry_after({"retry-after": "soon"}) is None
+
+def test_retryable_errors_are_retried_until_max_retries():
+    policy = RetryPolicy(max_retries=2, budget=None)
+    with FakeProviderServer(error_rate=1.0, error_status=503) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1", retry_policy=policy)
+        with pytest.raises(openai.InternalServerError):
+            llm.send_prompt("hi")
+    assert server.requests == 3
+
+def test_rejected_requests_are_not_retried():
+    policy = RetryPolicy(max_retries=2, budget=None)
+    with FakeProviderServer(error_rate=1.0, error_status=400) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1", retry_policy=policy)
+        with pytest.raises(openai.BadRequestError):
+            llm.send_prompt("hi")
+    assert server.requests == 1
@@ -0,0 +1,97 @@
+from collections import Counter
+
+import pytest
+
+from grollm.router import CircuitBreaker, Router
+
+class StatusError(Exception):
+
+    def __init__(self, status_code: int = None):
+        self.status_code = status_code
+        super().__init__(f"status {status_code}")
+
+class StubLLM:
+
+    provider_name = "Stub"
+    api_error = StatusError
+    rate_limiter = None
+
+    def __init__(self, model: str, error: Exception = None):
+        self.model = model
+        self.error = error
+        self.cost_dict = Counter()
+        self.calls = 0
+
+    def _is_retryable(self, error: Exception) -> bool:
+        return error.status_code is None or error.status_code == 429 or error.status_code >= 500
+
+    def send_prompt(self, prompt, **kwargs) -> str:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return f"{self.model}: {prompt}"
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10.0)
+    breaker.record_failure(0.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(0.0)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allows(5.0)
+
+    assert breaker.allows(10.0) and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.probing = True
+    assert not breaker.allows(10.0)
+    breaker.record_failure(11.0)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.cooldown == 20.0
+
+    assert breaker.allows(31.0)
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.cooldown == 10.0
+
+BACKEND_STATUSES = [401, 403, 404, 500, None]
+
+@pytest.mark.parametrize("status", BACKEND_STATUSES)
+def test_backend_errors_fail_over(status):
+    broken, healthy = StubLLM("broken", StatusError(status)), StubLLM("healthy")
+    router = Router({"broken": broken, "healthy": healthy})
+
+    for _ in range(30):
+        assert router.send_prompt("hi") == "healthy: hi"
+    assert router.stats["broken"]["failures"] == broken.calls >= 1
+
+@pytest.mark.parametrize("status", BACKEND_STATUSES)
+def test_backend_errors_eject(status):
+    broken = StubLLM("broken", StatusError(status))
+    router = Router([broken], failure_threshold=3)
+
+    for _ in range(3):
+        with pytest.raises(StatusError):
+            router.send_prompt("hi")
+    with pytest.raises(RuntimeError, match="No healthy backend"):
+        router.send_prompt("hi")
+
+    (stats,) = router.stats.values()
+    assert stats["circuit"] == CircuitBreaker.OPEN and stats["failures"] == broken.calls == 3
+
+def test_request_errors_do_not_touch_the_breaker():
+    bad_request = StubLLM("only", StatusError(400))
+    router = Router([bad_request], failure_threshold=2)
+    for _ in range(5):
+        with pytest.raises(StatusError):
+            router.send_prompt("hi")
+
+    (stats,) = router.stats.values()
+    assert stats["circuit"] == CircuitBreaker.CLOSED
+    assert stats["failures"] == 0 and stats["requests"] == 0 and stats["inflight"] == 0
+
+def test_request_error_does_not_close_an_open_breaker():
+    llm = StubLLM("only", StatusError(401))
+    router = Router([llm], failure_threshold=1, cooldown=0.0)
+    with pytest.raises(StatusError):
+        router.send_prompt("hi")
+    llm.error = StatusError(400)
+    with pytest.raises(StatusError):
+        router.send_prompt("hi")
+
+    (backend,) = router.backends
+    assert backend.breaker.state != CircuitBreaker.CLOSED and not backend.breaker.probing
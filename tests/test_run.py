@@ -0,0 +1,111 @@
+import json
+from collections import Counter
+
+from grollm.base import LLM_Base
+from grollm.run import LINE_KEY, Checkpoint, load_checkpoint, run_jsonl
+
+class StubLLM:
+
+    def __init__(self, failing: set = ()):
+        self.failing = set(failing)
+        self.sent = []
+        self.cumulative_tokens = Counter()
+        self.cumulative_cost = Counter()
+
+    _usage_total = staticmethod(LLM_Base._usage_total)
+
+    def send_prompt(self, prompt, **kwargs) -> str:
+        self.sent.append(prompt)
+        if prompt in self.failing:
+            raise RuntimeError(f"cannot answer {prompt}")
+        return prompt.upper()
+
+def write_input(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_failed_line_does_not_pin_the_watermark():
+    checkpoint = Checkpoint()
+    checkpoint.add(1, failed=True)
+    for line in range(2, 20_002):
+        checkpoint.add(line)
+
+    assert checkpoint.watermark == 20_001
+    assert not checkpoint._done
+    assert checkpoint.failed == {1}
+    assert checkpoint.pending(1) and not checkpoint.pending(2)
+
+    checkpoint.add(1)
+    assert not checkpoint.failed and not checkpoint.pending(1)
+
+def test_out_of_order_completion_stays_sparse():
+    checkpoint = Checkpoint()
+    for line in (3, 2, 5):
+        checkpoint.add(line)
+    assert checkpoint.watermark == 0 and len(checkpoint) == 3
+    checkpoint.add(1)
+    assert checkpoint.watermark == 3 and checkpoint._done == {5}
+
+def test_resume_retries_only_failures_with_flat_checkpoint(tmp_path):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    errors_path = tmp_path / "out.jsonl.errors"
+    write_input(input_path, [json.dumps({"prompt": f"p{i}"}) for i in range(1, 2_001)])
+
+    stats = run_jsonl(StubLLM(failing={"p1"}), str(input_path), str(output_path), stats_interval=None)
+    assert (stats.succeeded, stats.failed) == (1_999, 1)
+    assert [record[LINE_KEY] for record in read_jsonl(errors_path)] == [1]
+
+    checkpoint = load_checkpoint(str(output_path))
+    assert checkpoint.watermark == 2_000 and not checkpoint._done and checkpoint.failed == {1}
+
+    llm = StubLLM()
+    stats = run_jsonl(llm, str(input_path), str(output_path), stats_interval=None)
+    assert llm.sent == ["p1"]
+    assert (stats.succeeded, stats.failed, stats.skipped) == (1, 0, 1_999)
+    assert not errors_path.exists()
+    assert sorted(record[LINE_KEY] for record in read_jsonl(output_path)) == list(range(1, 2_001))
+
+def test_malformed_input_line_is_a_failed_row(tmp_path):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(input_path, ['{"prompt": "a"}', '{"prompt": ', '{"prompt": "c"}'])
+
+    stats = run_jsonl(StubLLM(), str(input_path), str(output_path), stats_interval=None)
+    assert (stats.succeeded, stats.failed) == (2, 1)
+    (error,) = read_jsonl(tmp_path / "out.jsonl.errors")
+    assert error[LINE_KEY] == 2 and error["error"].startswith("JSONDecodeError")
+    assert load_checkpoint(str(output_path)).watermark == 3
+
+def test_partial_trailing_line_is_cut_and_rerun(tmp_path):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(input_path, ['"a"', '"b"'])
+    output_path.write_text(json.dumps({LINE_KEY: 1, "response": "A"}) + '\n{"_line": 2, "resp', encoding="utf-8")
+
+    llm = StubLLM()
+    run_jsonl(llm, str(input_path), str(output_path), stats_interval=None)
+    assert llm.sent == ["b"]
+    assert [record[LINE_KEY] for record in read_jsonl(output_path)] == [1, 2]
+
+def test_corrupt_middle_line_does_not_drop_later_rows(tmp_path):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(input_path, ['"a"', '"b"', '"c"', '"d"'])
+    rows = [json.dumps({LINE_KEY: 1, "response": "A"}), '{"_line": 2, "resp\x00garbage',
+            json.dumps({LINE_KEY: 3, "response": "C"}), json.dumps({LINE_KEY: 4, "response": "D"})]
+    output_path.write_text("".join(row + "\n" for row in rows), encoding="utf-8")
+
+    llm = StubLLM()
+    run_jsonl(llm, str(input_path), str(output_path), stats_interval=None)
+    assert llm.sent == ["b"]
+    lines = output_path.read_text(encoding="utf-8").splitlines()
+    assert lines[:4] == rows and json.loads(lines[4])[LINE_KEY] == 2
+
+def test_complete_trailing_record_without_newline_is_kept(tmp_path):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(input_path, ['"a"', '"b"'])
+    output_path.write_text(json.dumps({LINE_KEY: 1, "response": "A"}), encoding="utf-8")
+
+    llm = StubLLM()
+    run_jsonl(llm, str(input_path), str(output_path), stats_interval=None)
+    assert llm.sent == ["b"]
+    assert [record[LINE_KEY] for record in read_jsonl(output_path)] == [1, 2]
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from grollm.scheduler import DeadlineExceeded, RequestShed, Scheduler
+
+class GatedLLM:
+
+    def __init__(self):
+        self.sent = []
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+
+    def send_prompt(self, prompt, **kwargs):
+        with self.lock:
+            self.sent.append(prompt)
+        if prompt == "blocker":
+            self.gate.wait(5)
+        return prompt
+
+    async def asend_prompt(self, prompt, **kwargs):
+        self.sent.append(prompt)
+        await asyncio.sleep(0.05)
+        return prompt
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+def _start(scheduler, prompt, errors=None, **kwargs):
+    def run():
+        try:
+            scheduler.send_prompt(prompt, **kwargs)
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_priority_first_then_weighted_tenant_order():
+    llm = GatedLLM()
+    scheduler = Scheduler(llm, max_concurrency=1, tenant_weights={"a": 2})
+    threads = [_start(scheduler, "blocker")]
+    _wait_until(lambda: llm.sent == ["blocker"])
+
+    for i in range(4):
+        for tenant in ("a", "b"):
+            threads.append(_start(scheduler, f"{tenant}{i}", priority="batch", tenant=tenant))
+            _wait_until(lambda: scheduler.stats["queued"] == len(threads) - 1)
+    threads.append(_start(scheduler, "urgent", priority="interactive"))
+    _wait_until(lambda: scheduler.stats["queued"] == 9)
+
+    llm.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    # Tenant "a" has twice the weight, so it gets two slots for each of "b"'s while both wait.
+    assert llm.sent == ["blocker", "urgent", "a0", "b0", "a1", "a2", "b1", "a3", "b2", "b3"]
+    assert scheduler.stats["dispatched"] == {None: 2, "a": 4, "b": 4}
+
+def test_request_past_its_deadline_is_never_sent():
+    llm = GatedLLM()
+    scheduler = Scheduler(llm, max_concurrency=1)
+    errors = []
+    blocker = _start(scheduler, "blocker")
+    _wait_until(lambda: llm.sent == ["blocker"])
+    late = _start(scheduler, "late", errors, deadline=0.05)
+    patient = _start(scheduler, "patient", errors)
+    _wait_until(lambda: scheduler.stats["queued"] == 2)
+
+    late.join(5)
+    assert [type(e) for e in errors] == [DeadlineExceeded]
+    llm.gate.set()
+    blocker.join(5)
+    patient.join(5)
+
+    assert llm.sent == ["blocker", "patient"]
+    stats = scheduler.stats
+    assert (stats["expired"], stats["completed"], stats["queued"], stats["in_flight"]) == (1, 2, 0, 0)
+
+def test_latency_sheds_low_priority_only():
+    scheduler = Scheduler(GatedLLM(), shed_latency=0.5, min_samples=2)
+    for _ in range(3):
+        scheduler.tracker.add(1.0)
+    scheduler._last_sample = time.monotonic()
+
+    with pytest.raises(RequestShed):
+        scheduler.send_prompt("bulk", priority="batch")
+    assert scheduler.send_prompt("chat", priority="interactive") == "chat"
+    assert scheduler.stats["shed"] == {"latency": 1}
+
+def test_async_deadline_and_cancellation_free_their_places():
+    async def main():
+        scheduler = Scheduler(GatedLLM(), max_concurrency=1)
+        first = asyncio.ensure_future(scheduler.asend_prompt("first"))
+        late = asyncio.ensure_future(scheduler.asend_prompt("late", deadline=0.01))
+        cancelled = asyncio.ensure_future(scheduler.asend_prompt("cancelled"))
+        last = asyncio.ensure_future(scheduler.asend_prompt("last"))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        results = await asyncio.gather(first, late, cancelled, last, return_exceptions=True)
+        return scheduler, results
+
+    scheduler, results = asyncio.run(main())
+    assert results[0] == "first" and results[3] == "last"
+    assert isinstance(results[1], DeadlineExceeded)
+    assert isinstance(results[2], asyncio.CancelledError)
+    assert scheduler.llm.sent == ["first", "last"]
+    assert (scheduler.stats["queued"], scheduler.stats["in_flight"]) == (0, 0)
@@ -0,0 +1,73 @@
+import gc
+import weakref
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from grollm.semantic_cache import SemanticCache, VectorIndex, HashingEmbedder
+
+def _unit(embedder, text):
+    vector = embedder.embed([text])[0]
+    return vector / (vector ** 2).sum() ** 0.5
+
+def test_search_below_threshold_does_not_protect_slot():
+    embedder = HashingEmbedder(dim=64)
+    index = VectorIndex(embedder.dim, capacity=2)
+    index.add(_unit(embedder, "first prompt"), {"text": "first"})
+    index.add(_unit(embedder, "second prompt"), {"text": "second"})
+
+    # Near misses against slot 0 must not count as uses, so it is still the one evicted.
+    for _ in range(3):
+        index.search(_unit(embedder, "first prompt, reworded a lot"))
+    index.add(_unit(embedder, "third prompt"), {"text": "third"})
+
+    assert [entry["text"] for entry in index.entries] == ["third", "second"]
+
+def test_hit_protects_slot():
+    embedder = HashingEmbedder(dim=64)
+    cache = SemanticCache(embedder=embedder, threshold=0.99, capacity=2)
+    for i, text in enumerate(["alpha question", "beta question"]):
+        assert cache.lookup(str(i), "m", text, {}) is None
+        cache.store(str(i), {"text": text})
+
+    assert cache.lookup("hit", "m", "alpha question", {}) == {"text": "alpha question"}
+    assert cache.lookup("2", "m", "gamma question", {}) is None
+    cache.store("2", {"text": "gamma question"})
+
+    assert cache.lookup("again", "m", "alpha question", {}) == {"text": "alpha question"}
+    assert cache.lookup("gone", "m", "beta question", {}) is None
+
+def test_namespaces_are_capped_and_reloaded(tmp_path):
+    cache = SemanticCache(embedder=HashingEmbedder(dim=32), capacity=4, directory=str(tmp_path), max_namespaces=2)
+    for model in ["a", "b", "c"]:
+        assert cache.lookup(model, model, "same prompt", {}) is None
+        cache.store(model, {"text": model})
+
+    assert list(cache._indexes) == ["b", "c"]
+    assert cache.stats["evicted_namespaces"] == 1
+    # The closed namespace was flushed and comes back from disk.
+    assert cache.lookup("a2", "a", "same prompt", {}) == {"text": "a"}
+    assert len(cache._indexes) == 2
+
+    cache.clear()
+    assert cache.lookup("b2", "b", "same prompt", {}) is None
+    assert cache.lookup("a3", "a", "same prompt", {}) is None
+
+def test_persistent_cache_is_not_kept_alive_until_exit(tmp_path):
+    cache = SemanticCache(embedder=HashingEmbedder(dim=32), directory=str(tmp_path))
+    cache_ref = weakref.ref(cache)
+    del cache
+    gc.collect()
+    assert cache_ref() is None
+
+def test_close_flushes_and_reopens_on_use(tmp_path):
+    cache = SemanticCache(embedder=HashingEmbedder(dim=32), directory=str(tmp_path), flush_every=100)
+    assert cache.lookup("1", "m", "same prompt", {}) is None
+    cache.store("1", {"text": "kept"})
+    cache.close()
+    assert not cache._indexes
+
+    assert SemanticCache(embedder=HashingEmbedder(dim=32), directory=str(tmp_path)).lookup(
+        "2", "m", "same prompt", {}) == {"text": "kept"}
+    assert cache.lookup("3", "m", "same prompt", {}) == {"text": "kept"}
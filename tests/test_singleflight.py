@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from grollm.singleflight import SingleFlight
+
+def test_concurrent_identical_calls_make_one_call():
+    flight = SingleFlight()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and len(flight) == 0
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 5
+
+def test_different_keys_are_not_collapsed():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("a", lambda: 2) == (2, False)
+    assert flight.do("b", lambda: 3) == (3, False)
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    errors = []
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("upstream failed")
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 4 and len({id(e) for e in errors}) == 1
+    assert flight.do("key", lambda: "retried") == ("retried", False)
+
+def test_concurrent_identical_async_calls_make_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("key", fetch) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1 and len(flight) == 0
+    assert results == [("answer", False)] + [("answer", True)] * 4
+
+def test_async_error_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream failed")
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_cancelled_async_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    finished = []
+
+    async def fetch():
+        await asyncio.sleep(0.1)
+        finished.append(1)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("key", fetch))
+        follower = asyncio.ensure_future(flight.ado("key", fetch))
+        await asyncio.sleep(0.02)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ("answer", True)
+    assert finished == [1]
+
+def test_coalescing_wrapper_sends_one_request_and_charges_it_once():
+    from benchmarks.fake_server import FakeProviderServer
+    from grollm.openai_gro import OpenAI_Grollm
+
+    with FakeProviderServer(latency=0.2, prompt_tokens=10, completion_tokens=2) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1", coalesce=True)
+        threads = [threading.Thread(target=llm.send_prompt, args=("same question",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        async def main():
+            await asyncio.gather(*(llm.asend_prompt("async question") for _ in range(4)))
+
+        asyncio.run(main())
+
+    assert server.requests == 2
+    assert llm.cumulative_tokens["total_tokens"] == 24
+    assert llm.coalesce_info["requests"] == 8 and llm.coalesce_info["coalesced"] == 6
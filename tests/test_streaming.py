@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.openai_gro import OpenAI_Grollm
+from grollm.streaming import StreamTimer
+
+def test_timer_measures_first_token_and_gaps():
+    timer = StreamTimer()
+    assert timer.stats()["time_to_first_token"] is None and timer.stats()["chunks"] == 0
+
+    time.sleep(0.05)
+    timer.tick()
+    time.sleep(0.02)
+    timer.tick()
+    time.sleep(0.04)
+    timer.tick()
+
+    stats = timer.stats()
+    assert stats["chunks"] == 3
+    assert stats["time_to_first_token"] >= 0.05
+    assert stats["mean_inter_token_latency"] >= 0.03
+    assert stats["max_inter_token_latency"] >= max(0.04, stats["mean_inter_token_latency"])
+    assert stats["duration_seconds"] >= 0.11
+
+def test_wrapper_streams_report_latency_and_usage():
+    with FakeProviderServer(prompt_tokens=10, completion_tokens=4, token_interval=0.02) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1")
+        text = "".join(llm.stream_prompt("hi"))
+
+        async def main():
+            return [delta async for delta in llm.astream_prompt("hi")]
+
+        deltas = asyncio.run(main())
+
+    assert text and len(deltas) == 4
+    info = llm.stream_info
+    assert info["streams"] == 2 and info["last"]["chunks"] == 4
+    assert info["last"]["mean_inter_token_latency"] >= 0.015
+    assert llm.cumulative_tokens["completion_tokens"] == 8
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("mlflow")
+
+from mlflow.tracking import MlflowClient
+
+from grollm.telemetry import MLFLOW_MAX_BATCH, MLflowSink, get_mlflow_sink
+
+@pytest.fixture
+def tracking(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'mlflow.db'}"
+    client = MlflowClient(tracking_uri=uri)
+    run = client.create_run(client.create_experiment("grollm-test"))
+    return uri, client, run.info.run_id
+
+def test_queued_metrics_reach_the_run_on_flush(tracking):
+    uri, client, run_id = tracking
+    sink = MLflowSink(tracking_uri=uri, flush_interval=60.0)
+    sink.log_metrics(run_id, {"prompt_tokens": 10, "cost": 0.5, "model": "skipped"}, step=1)
+    sink.log_metrics(run_id, {"prompt_tokens": 12}, step=2)
+    assert sink.flush(timeout=10.0)
+
+    history = client.get_metric_history(run_id, "prompt_tokens")
+    assert [(metric.step, metric.value) for metric in history] == [(1, 10.0), (2, 12.0)]
+    assert [metric.value for metric in client.get_metric_history(run_id, "cost")] == [0.5]
+    assert sink.stats == {"sent": 3, "dropped": 0, "failed": 0, "queued": 0}
+    sink.close()
+
+def test_large_batches_are_split_to_the_mlflow_limit(tracking):
+    uri, client, run_id = tracking
+    sink = MLflowSink(tracking_uri=uri, batch_size=5000, flush_interval=60.0)
+    count = MLFLOW_MAX_BATCH + 200
+    for step in range(count):
+        sink.log_metrics(run_id, {"latency": step}, step=step)
+    assert sink.batch_size == MLFLOW_MAX_BATCH
+    assert sink.flush(timeout=30.0)
+
+    assert sink.sent == count and sink.failed == 0
+    assert len(client.get_metric_history(run_id, "latency")) == count
+    sink.close()
+
+def test_full_queue_drops_points_instead_of_blocking(tracking):
+    uri, _, run_id = tracking
+    sink = MLflowSink(tracking_uri=uri, max_queue=5, flush_interval=60.0)
+    for step in range(50):
+        sink.log_metrics(run_id, {"tokens": step}, step=step)
+    assert sink.flush(timeout=10.0)
+    assert sink.dropped > 0 and sink.sent + sink.dropped == 50
+    sink.close()
+
+def test_sinks_are_shared_per_tracking_uri(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'mlflow.db'}"
+    assert get_mlflow_sink(uri) is get_mlflow_sink(uri)
+    assert get_mlflow_sink(uri) is not get_mlflow_sink(f"sqlite:///{tmp_path / 'other.db'}")
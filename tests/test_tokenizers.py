@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks.fake_server import FakeProviderServer
+from grollm.openai_gro import OpenAI_Grollm
+from grollm.tokenizers import (ContextWindowExceededError, count_estimated_tokens, estimate_tokens, truncate_messages,
+                               truncate_text)
+
+def _count(messages) -> int:
+    return count_estimated_tokens(messages, chars_per_token=4.0)
+
+def test_truncate_text_keeps_the_end():
+    text = "".join(f"{i:04d}" for i in range(100))
+    trimmed = truncate_text(text, 10, lambda text: estimate_tokens(text, 4.0))
+    assert estimate_tokens(trimmed, 4.0) <= 10 and trimmed
+    assert text.endswith(trimmed)
+    assert truncate_text("short", 10, len) == "short"
+
+def test_truncate_messages_drops_the_oldest_turns_but_keeps_system_and_last():
+    messages = [{"role": "system", "content": "s" * 40}]
+    messages += [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "x" * 40} for i in range(6)]
+    kept = truncate_messages(messages, 50, _count)
+
+    assert _count(kept) <= 50
+    assert kept[0] == messages[0] and kept[-1] == messages[-1]
+    assert kept[1:] == messages[-len(kept) + 1:]
+
+def test_truncate_messages_trims_a_last_message_that_is_too_long_alone():
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "word " * 200}]
+    kept = truncate_messages(messages, 40, _count)
+
+    assert _count(kept) <= 40 and len(kept) == 2
+    assert kept[0] == messages[0]
+    assert messages[1]["content"].endswith(kept[1]["content"]) and kept[1]["content"]
+
+def test_wrapper_context_policies():
+    prompt = "tell me about " + "history " * 400
+    with FakeProviderServer() as server:
+        strict = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1", context_policy="error")
+        strict.max_context = 200
+        with pytest.raises(ContextWindowExceededError):
+            strict.send_prompt(prompt, max_tokens=50)
+        assert server.requests == 0
+
+        lenient = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1",
+                                context_policy="truncate")
+        lenient.max_context = 200
+        lenient.send_prompt(prompt, max_tokens=50)
+        assert server.requests == 1
+        assert lenient.cumulative_tokens["prompt_tokens"] < 200
@@ -0,0 +1,87 @@
+import threading
+
+from grollm.usage import UsageAccumulator, flatten_usage
+
+def test_flatten_usage_keeps_numeric_entries():
+    usage = {"prompt_tokens": 10, "prompt_tokens_details": {"cached_tokens": 4}, "model": "x", "cached": True}
+    assert flatten_usage(usage) == {"prompt_tokens": 10, "prompt_tokens_details.cached_tokens": 4}
+
+def test_costs_are_charged_per_request():
+    usage = UsageAccumulator()
+    usage.add({"prompt_tokens": 10, "completion_tokens": 5}, {"prompt_tokens": 0.5})
+    tokens, cost = usage.snapshot()
+    assert tokens == {"prompt_tokens": 10, "completion_tokens": 5}
+    assert cost == {"prompt_tokens": 5.0}
+
+def test_exited_threads_are_folded_into_the_base_shard():
+    usage = UsageAccumulator()
+    for _ in range(50):
+        threads = [threading.Thread(target=usage.add, args=({"total_tokens": 1}, {"total_tokens": 2}))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(usage._shards) <= 2
+    tokens, cost = usage.snapshot()
+    assert tokens["total_tokens"] == 400 and cost["total_tokens"] == 800
+
+def test_snapshot_is_a_copy():
+    usage = UsageAccumulator()
+    usage.add({"total_tokens": 3})
+    usage.snapshot()[0]["total_tokens"] = 100
+    assert usage.snapshot()[0]["total_tokens"] == 3
+
+def test_reset_usage_clears_wrapper_totals():
+    from grollm.base import LLM_Base
+
+    class Stub:
+        _usage = UsageAccumulator()
+        usage_scope = "local"
+        reset_usage = LLM_Base.reset_usage
+        cumulative_tokens = LLM_Base.cumulative_tokens
+        _usage_totals = LLM_Base._usage_totals
+
+    llm = Stub()
+    llm._usage.add({"total_tokens": 7})
+    assert llm.cumulative_tokens["total_tokens"] == 7
+    llm.reset_usage()
+    assert not llm.cumulative_tokens
+
+def test_batch_discount_applies_to_cached_prompt_price():
+    from grollm.base import LLM_Base
+
+    class Stub:
+        max_context = None
+        _validate_cost = LLM_Base._validate_cost
+
+    llm = Stub()
+    llm._validate_cost({"prompt_tokens": 4.0, "completion_tokens": 8.0, "cached_prompt_tokens": 0.4,
+                        "batch_prompt_tokens": 2.0, "batch_completion_tokens": 4.0})
+    assert llm._batch_prices == {"prompt_tokens": 2.0, "completion_tokens": 4.0,
+                                 "cached_prompt_tokens": 0.2, "cache_write_prompt_tokens": 2.0}
+    assert llm._prices["cached_prompt_tokens"] == 0.4
+
+def test_openai_cached_tokens_are_counted_once():
+    from benchmarks.fake_server import FakeProviderServer
+    from grollm.openai_gro import OpenAI_Grollm
+
+    with FakeProviderServer(prompt_tokens=10, completion_tokens=2, cached_tokens=4) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1")
+        llm.send_prompt("hi")
+
+    tokens = llm.cumulative_tokens
+    assert tokens["prompt_tokens"] == 6 and tokens["cached_prompt_tokens"] == 4
+    assert not any(key.startswith("prompt_tokens_details.cached") for key in tokens)
+
+def test_stream_keeps_caller_stream_options_and_still_reports_usage():
+    from benchmarks.fake_server import FakeProviderServer
+    from grollm.openai_gro import OpenAI_Grollm
+
+    with FakeProviderServer(prompt_tokens=10, completion_tokens=3) as server:
+        llm = OpenAI_Grollm(api_key="fake", model="gpt-4o-mini", base_url=server.url + "/v1")
+        parts = list(llm.stream_prompt("hi", stream_options={"include_usage": False}))
+
+    assert len(parts) == 3
+    assert llm.cumulative_tokens["prompt_tokens"] == 10 and llm.cumulative_tokens["completion_tokens"] == 3